@@ -0,0 +1,219 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from rules import resolve_rule
+
+
+class AttractorCache:
+    """
+    Detects when the cube re-enters a known state and replays the cached transitions.
+
+    The cube state is identified by a 64-bit Zobrist hash: every (face, cell) has a
+    random key and the hash is the XOR of the keys of the living cells, updated
+    incrementally from the cells that changed. Each deterministic transition is stored
+    under (hash before, faces stepped, compiled rules) in a bounded LRU table, so once
+    the cube falls into a cycle its steps are restored from the table instead of
+    recomputed. Rules are keyed by their lookup tables rather than their names, so a
+    rule registered again under the same name with another table misses the cache.
+
+    Perturbations, stochastic steps and updates made outside ``step`` invalidate the
+    cache (the cache registers itself as a listener of every face). The cache cannot
+    see a direct write to ``face.grid``: change cells through ``perturb`` (or notify
+    ``on_perturb`` with ``face._notify``), or call ``invalidate`` after writing them.
+    """
+
+    def __init__(self, faces: list, max_states: int = 4096, seed: int = 0):
+        """
+        Initializes the cache for a cube.
+
+        Args:
+            faces (list): The six faces of the cube (any engine).
+            max_states (int): Maximum number of cached transitions and remembered states.
+            seed (int): Seed of the Zobrist keys.
+        """
+        self.faces = faces
+        self.max_states = max_states
+        self.grid_size = faces[0].grid_size
+        key_shape = (len(faces), self.grid_size, self.grid_size)
+        self._keys = np.random.default_rng(seed).integers(0, 2**64, size=key_shape, dtype=np.uint64)
+        self._transitions = OrderedDict()  # (hash, face IDs, rule keys) -> cached successor
+        self._history = OrderedDict()  # (hash, face IDs, rule keys) -> tick of first visit
+        self._face_histories = [OrderedDict() for _ in faces]  # face hash -> face step of first visit
+        self._stepping = False
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidate()
+
+        for face in faces:
+            face.add_listener(self)
+
+    def invalidate(self):
+        """Forgets every cached transition and cycle measurement, and rehashes the cube."""
+        self._transitions.clear()
+        self._history.clear()
+        for history in self._face_histories:
+            history.clear()
+        self.face_hashes = [self._hash_face(face_id) for face_id in range(len(self.faces))]
+        for history, face_hash in zip(self._face_histories, self.face_hashes):
+            history[face_hash] = 0
+        self.tick = 0
+        self.face_steps = [0] * len(self.faces)
+        self.cycle_length = None
+        self.transient_length = None
+        self.face_cycle_lengths = [None] * len(self.faces)
+        self.face_transient_lengths = [None] * len(self.faces)
+        self._stale = False
+
+    @property
+    def cube_hash(self) -> int:
+        cube_hash = 0
+        for face_hash in self.face_hashes:
+            cube_hash ^= face_hash
+        return cube_hash
+
+    @property
+    def metrics(self) -> dict:
+        """dict: Cycle and transient lengths (None until detected) and cache statistics."""
+        return {
+            "cycle_length": self.cycle_length,
+            "transient_length": self.transient_length,
+            "face_cycle_lengths": list(self.face_cycle_lengths),
+            "face_transient_lengths": list(self.face_transient_lengths),
+            "hits": self.hits,
+            "misses": self.misses,
+            "cached_transitions": len(self._transitions),
+        }
+
+    def on_perturb(self, face, cells):
+        self._stale = True
+
+    def on_update(self, face, face_id, rule):
+        if not self._stepping:
+            self._stale = True
+
+    def close(self):
+        """Stops listening to the faces."""
+        for face in self.faces:
+            face.remove_listener(self)
+
+    def step(self, face_ids=None, use_stochastic_rule=False, rule=None):
+        """
+        Updates several faces in order, as ``main.update_faces`` does, replaying the
+        transition from the cache when it is known.
+
+        Args:
+            face_ids (list): IDs of the faces to update (all faces by default).
+            use_stochastic_rule (bool or list): Use ``rule_set_2`` instead of ``rule_set_1``,
+                either for every face or per face in ``face_ids``.
+            rule (Rule, str or list): Rule from the registry in ``rules.py``, either for
+                every face or per face in ``face_ids`` (overrides ``use_stochastic_rule``).
+        """
+        face_ids = list(range(len(self.faces))) if face_ids is None else [int(face_id) for face_id in face_ids]
+        stochastic = np.broadcast_to(np.asarray(use_stochastic_rule, dtype=bool), (len(face_ids),))
+        rules = rule if isinstance(rule, (list, tuple)) else [rule] * len(face_ids)
+        rules = [resolve_rule(face_rule, face_stochastic) for face_rule, face_stochastic in zip(rules, stochastic)]
+
+        if self._stale:
+            self.invalidate()
+
+        if any(face_rule.is_stochastic for face_rule in rules):
+            self._compute(face_ids, rules)
+            self.invalidate()
+            return
+
+        key = (self.cube_hash, tuple(face_ids), tuple(_rule_key(face_rule) for face_rule in rules))
+        self._record_visit(key)
+
+        cached = self._transitions.get(key)
+        if cached is not None:
+            self._transitions.move_to_end(key)
+            self.hits += 1
+            self._replay(face_ids, rules, cached)
+        else:
+            self.misses += 1
+            self._transitions[key] = self._compute(face_ids, rules)
+            if len(self._transitions) > self.max_states:
+                self._transitions.popitem(last=False)
+
+        for face_id in face_ids:
+            self._record_face_visit(face_id)
+        self.tick += 1
+
+    def _compute(self, face_ids: list, rules: list) -> list:
+        """Steps the faces and returns what is needed to replay the transition."""
+        self._stepping = True
+        try:
+            for face_id, face_rule in zip(face_ids, rules):
+                self.faces[face_id].update(face_id, self.faces, rule=face_rule)
+        finally:
+            self._stepping = False
+
+        successor = []
+        for face_id in face_ids:
+            face = self.faces[face_id]
+            grid = np.asarray(face.grid, dtype=np.uint8)
+            changed = grid != np.asarray(face.previous_grid, dtype=np.uint8)
+            self.face_hashes[face_id] ^= int(np.bitwise_xor.reduce(self._keys[face_id][changed]))
+            successor.append((np.packbits(grid), face.activity_count, self.face_hashes[face_id]))
+        return successor
+
+    def _replay(self, face_ids: list, rules: list, successor: list):
+        """Restores the faces to the cached successor state."""
+        size = self.grid_size
+        self._stepping = True
+        try:
+            for face_id, face_rule, (packed, activity_count, face_hash) in zip(face_ids, rules, successor):
+                face = self.faces[face_id]
+                grid = np.unpackbits(packed, count=size * size).reshape(size, size)
+                _assign_grid(face, "previous_grid", np.array(face.grid, dtype=np.uint8))
+                _assign_grid(face, "grid", grid)
+                face.activity_count = activity_count
+                self.face_hashes[face_id] = face_hash
+                face._notify("on_update", face_id, face_rule)
+        finally:
+            self._stepping = False
+
+    def _record_visit(self, key):
+        """Measures the cycle when the cube re-enters a state it visited since the last invalidation."""
+        first_visit = self._history.get(key)
+        if first_visit is None:
+            self._history[key] = self.tick
+            if len(self._history) > self.max_states:
+                self._history.popitem(last=False)
+        elif self.cycle_length is None:
+            self.cycle_length = self.tick - first_visit
+            self.transient_length = first_visit
+
+    def _record_face_visit(self, face_id: int):
+        """Measures the cycle of a single face, counted in steps of that face."""
+        history = self._face_histories[face_id]
+        face_hash = self.face_hashes[face_id]
+        self.face_steps[face_id] += 1
+        first_visit = history.get(face_hash)
+        if first_visit is None:
+            history[face_hash] = self.face_steps[face_id]
+            if len(history) > self.max_states:
+                history.popitem(last=False)
+        elif self.face_cycle_lengths[face_id] is None:
+            self.face_cycle_lengths[face_id] = self.face_steps[face_id] - first_visit
+            self.face_transient_lengths[face_id] = first_visit
+
+    def _hash_face(self, face_id: int) -> int:
+        """Computes the Zobrist hash of a face from scratch."""
+        alive = np.asarray(self.faces[face_id].grid, dtype=np.uint8) == 1
+        return int(np.bitwise_xor.reduce(self._keys[face_id][alive]))
+
+
+def _rule_key(rule) -> tuple:
+    """Identifies a deterministic rule by its compiled lookup table."""
+    return rule.neighborhood, rule.table.tobytes()
+
+
+def _assign_grid(face, attribute: str, grid: np.ndarray):
+    """Sets ``grid`` or ``previous_grid`` of a face, keeping list grids as lists."""
+    if isinstance(getattr(face, attribute), list):
+        setattr(face, attribute, grid.tolist())
+    else:
+        setattr(face, attribute, grid)
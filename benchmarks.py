@@ -0,0 +1,361 @@
+"""
+Benchmarks of the hot paths: face stepping, batched ensemble stepping, neighbor lookup,
+MIDI scan and rendering, and the timing jitter of the MIDI scheduler under load.
+
+Usage:
+    python -m liquiprism bench --output bench.json
+    python -m liquiprism bench --compare bench.json
+"""
+import contextlib
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import types
+
+import numpy as np
+
+import simulation
+
+DEFAULT_SIZES = [5, 32, 128, 512, 2048]
+DEFAULT_ENGINES = list(simulation.FACE_ENGINES)
+DEFAULT_RULES = ["rule_set_1", "rule_set_2"]
+PER_CELL_MAX_SIZE = 256  # Per-cell Python loops take minutes per call beyond this
+ENSEMBLE_BATCH = 1024  # Cubes stepped together by the ensemble benchmark
+ENSEMBLE_MAX_SIZE = 32  # Ensembles are meant for many small cubes
+
+
+class FakeOutputPort:
+    """Stand-in MIDI output port that counts the messages it receives."""
+
+    def __init__(self):
+        self.messages = 0
+
+    def send(self, message):
+        self.messages += 1
+
+    def close(self):
+        pass
+
+
+def time_call(function, min_time: float = 0.2, max_repeats: int = 1000) -> dict:
+    """
+    Times a function, repeating it until ``min_time`` seconds have been measured.
+
+    Args:
+        function (callable): Function to time, called without arguments.
+        min_time (float): Minimum total measured time in seconds.
+        max_repeats (int): Maximum number of measured calls.
+
+    Returns:
+        dict: Number of repeats and min/median/mean time per call, in seconds.
+    """
+    function()  # Warm up
+    timings = []
+    while len(timings) < max_repeats and sum(timings) < min_time:
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return {
+        "repeats": len(timings),
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.fmean(timings),
+    }
+
+
+def random_cube(grid_size: int, engine: str, seed: int = 0) -> list:
+    """Creates a cube whose faces hold random states, without per-cell Python calls."""
+    faces = simulation.create_faces(grid_size, engine)
+    rng = np.random.default_rng(seed)
+    for face in faces:
+        grid = rng.integers(0, 2, size=(grid_size, grid_size), dtype=np.uint8)
+        face.grid = grid.tolist() if isinstance(face.grid, list) else grid
+    return faces
+
+
+def bench_update(sizes, engines, rules, min_time) -> list:
+    """Benchmarks ``update`` of one face for every engine, rule and grid size."""
+    results = []
+    for engine in engines:
+        for rule in rules:
+            for grid_size in sizes:
+                case = {"name": "update", "engine": engine, "rule": rule, "grid_size": grid_size}
+                if engine == "list" and grid_size > PER_CELL_MAX_SIZE:
+                    results.append({**case, "skipped": f"per-cell loop limited to {PER_CELL_MAX_SIZE}"})
+                    continue
+                faces = random_cube(grid_size, engine)
+                timing = time_call(lambda: faces[0].update(0, faces, rule=rule), min_time)
+                results.append({**case, **timing, "cells_per_sec": grid_size * grid_size / timing["mean_s"]})
+    return results
+
+
+def bench_ensemble(sizes, rules, min_time) -> list:
+    """Benchmarks ``Ensemble.step`` of every face of ``ENSEMBLE_BATCH`` cubes."""
+    from ensemble import Ensemble
+
+    results = []
+    for rule in rules:
+        for grid_size in sizes:
+            case = {"name": "ensemble_step", "engine": "ensemble", "rule": rule, "grid_size": grid_size,
+                    "batch_size": ENSEMBLE_BATCH}
+            if grid_size > ENSEMBLE_MAX_SIZE:
+                results.append({**case, "skipped": f"ensembles limited to {ENSEMBLE_MAX_SIZE}"})
+                continue
+            ensemble = Ensemble(ENSEMBLE_BATCH, grid_size, rule=rule, low_activity_rule=rule)
+            ensemble.randomize()
+            timing = time_call(ensemble.step, min_time)
+            results.append({**case, **timing, "cube_steps_per_sec": ENSEMBLE_BATCH / timing["mean_s"]})
+    return results
+
+
+def bench_get_neighbors(sizes, min_time) -> list:
+    """Benchmarks ``CellularAutomata._get_neighbors`` over every cell of a face."""
+    results = []
+    for grid_size in sizes:
+        case = {"name": "get_neighbors", "engine": "list", "grid_size": grid_size}
+        if grid_size > PER_CELL_MAX_SIZE:
+            results.append({**case, "skipped": f"per-cell loop limited to {PER_CELL_MAX_SIZE}"})
+            continue
+        faces = random_cube(grid_size, "list")
+        face = faces[0]
+
+        def scan():
+            for x in range(grid_size):
+                for y in range(grid_size):
+                    face._get_neighbors(x, y, 0, faces)
+
+        timing = time_call(scan, min_time)
+        results.append({**case, **timing, "cells_per_sec": grid_size * grid_size / timing["mean_s"]})
+    return results
+
+
+def bench_sonification(sizes, engines, min_time) -> list:
+    """Benchmarks ``Sonification.generate_all_midi_events`` with a fake output port."""
+    try:
+        from sonification import Sonification
+    except ImportError as e:
+        return [{"name": "generate_all_midi_events", "skipped": f"sonification unavailable: {e}"}]
+
+    results = []
+    for engine in engines:
+        for grid_size in sizes:
+            case = {"name": "generate_all_midi_events", "engine": engine, "grid_size": grid_size}
+            if grid_size > PER_CELL_MAX_SIZE:
+                results.append({**case, "skipped": f"per-cell scan limited to {PER_CELL_MAX_SIZE}"})
+                continue
+            faces = random_cube(grid_size, engine)
+            for face_id, face in enumerate(faces):
+                face.update(face_id, faces)  # Give every face a previous state
+            sonification = Sonification("benchmark", list(range(6)), output_port=FakeOutputPort())
+
+            def scan():
+                for face in faces:
+                    face.generation += 1  # Scan every face, as if all of them had just stepped
+                sonification.generate_all_midi_events(faces)
+
+            timing = time_call(scan, min_time)
+            sonification.close()
+            results.append({**case, **timing, "cells_per_sec": 6 * grid_size * grid_size / timing["mean_s"]})
+    return results
+
+
+def bench_midi_jitter(min_time) -> list:
+    """
+    Measures the lateness of scheduled MIDI events while the main thread is busy
+    stepping a large face.
+    """
+    try:
+        from midi_scheduler import MidiScheduler
+    except ImportError as e:
+        return [{"name": "midi_jitter", "skipped": f"MIDI scheduler unavailable: {e}"}]
+
+    faces = random_cube(512, "numpy")
+    scheduler = MidiScheduler(FakeOutputPort(), max_voices=16)
+    deadline = time.perf_counter() + max(min_time, 0.5)
+    note = 0
+    while time.perf_counter() < deadline:
+        note = (note + 1) % 24
+        scheduler.play_many([(channel, 60 + note) for channel in range(6)], 80, 0.05, time.perf_counter() + 0.005)
+        faces[0].update(0, faces)  # Load
+    while scheduler.pending and time.perf_counter() < deadline + 1:
+        time.sleep(0.01)
+    jitter = scheduler.jitter()
+    scheduler.close()
+    return [{"name": "midi_jitter", "grid_size": 512, **jitter}]
+
+
+@contextlib.contextmanager
+def mock_gl(module):
+    """
+    Replaces the GL/GLU functions and the pygame display used by a module with no-ops.
+
+    Yields:
+        dict: Number of calls of each replaced function.
+    """
+    calls = {}
+
+    def no_op(name):
+        def call(*args, **kwargs):
+            calls[name] = calls.get(name, 0) + 1
+        return call
+
+    replaced = {
+        name: getattr(module, name)
+        for name in dir(module)
+        if name.startswith("gl") and callable(getattr(module, name))
+    }
+    replaced["pygame"] = module.pygame
+    try:
+        for name in replaced:
+            setattr(module, name, no_op(name))
+        module.pygame = types.SimpleNamespace(
+            init=no_op("pygame.init"),
+            display=types.SimpleNamespace(set_mode=no_op("set_mode"), flip=no_op("flip")),
+        )
+        yield calls
+    finally:
+        for name, value in replaced.items():
+            setattr(module, name, value)
+
+
+def bench_draw_cube(sizes, min_time) -> list:
+    """Benchmarks ``CubeVisualization.draw_cube`` against a mock GL context."""
+    try:
+        import cube_visualization
+    except ImportError as e:
+        return [{"name": "draw_cube", "skipped": f"visualization unavailable: {e}"}]
+
+    results = []
+    for grid_size in sizes:
+        case = {"name": "draw_cube", "engine": "numpy", "grid_size": grid_size}
+        if grid_size > PER_CELL_MAX_SIZE:
+            results.append({**case, "skipped": f"per-cell drawing limited to {PER_CELL_MAX_SIZE}"})
+            continue
+        faces = random_cube(grid_size, "numpy")
+        with mock_gl(cube_visualization) as calls:
+            visualization = cube_visualization.CubeVisualization(faces)
+            calls.clear()
+            visualization.draw_cube()
+            gl_calls = sum(calls.values())
+            timing = time_call(visualization.draw_cube, min_time)
+        results.append({**case, **timing, "gl_calls_per_frame": gl_calls})
+    return results
+
+
+def _git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def run_benchmarks(sizes=None, engines=None, rules=None, min_time: float = 0.2, only=None) -> dict:
+    """
+    Runs the benchmark suite.
+
+    Args:
+        sizes (list): Grid sizes (default ``DEFAULT_SIZES``).
+        engines (list): Face engines (default all of ``simulation.FACE_ENGINES``).
+        rules (list): Rules for the update benchmark (default ``DEFAULT_RULES``).
+        min_time (float): Minimum measured time per case, in seconds.
+        only (list): Benchmark names to run (default all).
+
+    Returns:
+        dict: Machine-readable report with the environment and one entry per case.
+    """
+    sizes = DEFAULT_SIZES if sizes is None else sizes
+    engines = DEFAULT_ENGINES if engines is None else engines
+    rules = DEFAULT_RULES if rules is None else rules
+    suites = {
+        "update": lambda: bench_update(sizes, engines, rules, min_time),
+        "ensemble_step": lambda: bench_ensemble(sizes, rules, min_time),
+        "get_neighbors": lambda: bench_get_neighbors(sizes, min_time),
+        "generate_all_midi_events": lambda: bench_sonification(sizes, engines, min_time),
+        "draw_cube": lambda: bench_draw_cube(sizes, min_time),
+        "midi_jitter": lambda: bench_midi_jitter(min_time),
+    }
+
+    results = []
+    for name, suite in suites.items():
+        if only is None or name in only:
+            results.extend(suite())
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def case_key(result: dict) -> tuple:
+    """Identifies a benchmark case across reports."""
+    return (result["name"], result.get("engine"), result.get("rule"), result.get("grid_size"))
+
+
+def compare(baseline: dict, current: dict, tolerance: float = 0.1) -> list:
+    """
+    Compares two reports case by case on the median time per call.
+
+    Args:
+        baseline (dict): Earlier report.
+        current (dict): New report.
+        tolerance (float): Relative slowdown above which a case counts as a regression.
+
+    Returns:
+        list: One dict per common case with the ratio current/baseline and a
+        ``regression`` flag.
+    """
+    baseline_cases = {case_key(result): result for result in baseline["results"] if "median_s" in result}
+    comparison = []
+    for result in current["results"]:
+        before = baseline_cases.get(case_key(result))
+        if before is None or "median_s" not in result:
+            continue
+        ratio = result["median_s"] / before["median_s"]
+        comparison.append({
+            "name": result["name"],
+            "engine": result.get("engine"),
+            "rule": result.get("rule"),
+            "grid_size": result.get("grid_size"),
+            "baseline_s": before["median_s"],
+            "current_s": result["median_s"],
+            "ratio": ratio,
+            "regression": ratio > 1 + tolerance,
+        })
+    return comparison
+
+
+def format_report(report: dict) -> str:
+    """Formats a report as a table for the console."""
+    lines = []
+    for result in report["results"]:
+        label = " ".join(
+            str(result[key]) for key in ("name", "engine", "rule", "grid_size") if result.get(key) is not None
+        )
+        if "skipped" in result:
+            lines.append(f"{label:<52} skipped ({result['skipped']})")
+        elif "p99_ms" in result:
+            lines.append(f"{label:<52} p99 lateness {result['p99_ms'] or 0:.3f} ms over {result['events']} events")
+        else:
+            lines.append(f"{label:<52} {result['median_s'] * 1e3:10.3f} ms  x{result['repeats']}")
+    return "\n".join(lines)
+
+
+def save_report(report: dict, path: str):
+    """Writes a report as JSON."""
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2)
+
+
+def load_report(path: str) -> dict:
+    """Reads a report written by ``save_report``."""
+    with open(path) as file:
+        return json.load(file)
@@ -0,0 +1,343 @@
+import random
+
+import numpy as np
+
+from cellular_automata import CUBE_NEIGHBORS, CellularAutomata
+from numpy_automata import apply_rule, pad_face
+from rules import resolve_rule
+
+WORD_BITS = 64
+
+# Number of set bits of every byte value, used to count cells without np.bitwise_count
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def pack_grid(grid, grid_size: int) -> np.ndarray:
+    """
+    Packs a grid of 0/1 values into rows of uint64 words (one bit per cell).
+
+    Args:
+        grid: (rows, N) grid as a list of lists or an array.
+        grid_size (int): Grid size (N).
+
+    Returns:
+        np.ndarray: (rows, ceil(N / 64)) array of uint64 words; cell (x, y) is bit
+        ``y % 64`` of word ``y // 64`` in row ``x``.
+    """
+    grid = np.asarray(grid, dtype=np.uint8)
+    words_per_row = -(-grid_size // WORD_BITS)
+    bits = np.zeros((grid.shape[0], words_per_row * WORD_BITS), dtype=np.uint8)
+    bits[:, :grid_size] = grid != 0
+    packed = np.packbits(bits, axis=1, bitorder="little")
+    return packed.view("<u8").astype(np.uint64)
+
+
+def unpack_grid(words: np.ndarray, grid_size: int) -> np.ndarray:
+    """
+    Unpacks rows of uint64 words into a (N, N) uint8 grid.
+
+    Args:
+        words (np.ndarray): Packed words as returned by ``pack_grid``.
+        grid_size (int): Grid size (N).
+
+    Returns:
+        np.ndarray: uint8 grid of 0/1 values.
+    """
+    as_bytes = np.ascontiguousarray(words, dtype="<u8").view(np.uint8)
+    return np.unpackbits(as_bytes, axis=-1, bitorder="little")[..., :grid_size]
+
+
+def popcount(words: np.ndarray) -> int:
+    """Returns the number of set bits in an array of uint64 words."""
+    return int(_POPCOUNT_TABLE[np.ascontiguousarray(words).view(np.uint8)].sum(dtype=np.int64))
+
+
+def shift_west(words: np.ndarray) -> np.ndarray:
+    """Moves every cell one column right, so each cell sees its left neighbor."""
+    shifted = words << np.uint64(1)
+    shifted[..., 1:] |= words[..., :-1] >> np.uint64(WORD_BITS - 1)
+    return shifted
+
+
+def shift_east(words: np.ndarray) -> np.ndarray:
+    """Moves every cell one column left, so each cell sees its right neighbor."""
+    shifted = words >> np.uint64(1)
+    shifted[..., :-1] |= words[..., 1:] << np.uint64(WORD_BITS - 1)
+    return shifted
+
+
+def shift_north(words: np.ndarray) -> np.ndarray:
+    """Moves every row one row down, so each cell sees the cell above it."""
+    shifted = np.zeros_like(words)
+    shifted[1:] = words[:-1]
+    return shifted
+
+
+def shift_south(words: np.ndarray) -> np.ndarray:
+    """Moves every row one row up, so each cell sees the cell below it."""
+    shifted = np.zeros_like(words)
+    shifted[:-1] = words[1:]
+    return shifted
+
+
+def add_to_counter(planes: list, addend: np.ndarray):
+    """
+    Adds a one-bit-per-cell addend to a bit-sliced counter in place.
+
+    Args:
+        planes (list): Bit planes of the counter, least significant first.
+        addend (np.ndarray): Words with a 1 for every cell to increment.
+    """
+    carry = addend
+    for k, plane in enumerate(planes):
+        planes[k] = plane ^ carry
+        carry = plane & carry
+
+
+def count_equals(planes: list, value: int) -> np.ndarray:
+    """
+    Returns the words with a 1 for every cell whose counter equals ``value``.
+
+    Args:
+        planes (list): Bit planes of the counter, least significant first.
+        value (int): Neighbor count to match.
+    """
+    mask = ~np.zeros_like(planes[0])
+    for k, plane in enumerate(planes):
+        mask &= plane if (value >> k) & 1 else ~plane
+    return mask
+
+
+def count_in(planes: list, values) -> np.ndarray:
+    """Returns the words with a 1 for every cell whose counter is one of ``values``."""
+    mask = np.zeros_like(planes[0])
+    for value in values:
+        if value < 2 ** len(planes):
+            mask |= count_equals(planes, value)
+    return mask
+
+
+class BitRowView:
+    """Row accessor of a bit-packed grid supporting ``row[y]`` reads and writes."""
+
+    def __init__(self, words: np.ndarray, grid_size: int):
+        self.words = words
+        self.grid_size = grid_size
+
+    def __len__(self):
+        return self.grid_size
+
+    def __getitem__(self, y):
+        if isinstance(y, slice):
+            return [self[i] for i in range(*y.indices(self.grid_size))]
+        y = range(self.grid_size)[y]  # Validates and normalizes negative indices
+        return int(self.words[y // WORD_BITS] >> np.uint64(y % WORD_BITS)) & 1
+
+    def __setitem__(self, y, value):
+        y = range(self.grid_size)[y]
+        bit = np.uint64(1 << (y % WORD_BITS))
+        if value:
+            self.words[y // WORD_BITS] |= bit
+        else:
+            self.words[y // WORD_BITS] &= ~bit
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        row = unpack_grid(self.words[np.newaxis], self.grid_size)[0]
+        return row if dtype is None else row.astype(dtype)
+
+    def tolist(self):
+        return np.asarray(self).tolist()
+
+
+class BitGridView:
+    """Grid accessor of a bit-packed face supporting ``grid[x][y]`` reads and writes."""
+
+    def __init__(self, words: np.ndarray, grid_size: int):
+        self.words = words
+        self.grid_size = grid_size
+
+    def __len__(self):
+        return self.grid_size
+
+    def __getitem__(self, x):
+        if isinstance(x, slice):
+            return [self[i] for i in range(*x.indices(self.grid_size))]
+        return BitRowView(self.words[x], self.grid_size)
+
+    def __iter__(self):
+        return (self[x] for x in range(self.grid_size))
+
+    def __array__(self, dtype=None, copy=None):
+        grid = unpack_grid(self.words, self.grid_size)
+        return grid if dtype is None else grid.astype(dtype)
+
+    def tolist(self):
+        return np.asarray(self).tolist()
+
+
+class BitboardCellularAutomata(CellularAutomata):
+    """
+    Cellular automaton face stored with one bit per cell in uint64 words.
+
+    ``grid`` and ``previous_grid`` are accessor views over the packed words, so code
+    written for list grids (``grid[x][y]``, ``perturb``, the visualization) keeps working.
+    """
+
+    def __init__(self, grid_size: int):
+        """
+        Initializes an empty cellular automaton grid.
+
+        Args:
+            grid_size (int): Grid size (e.g., 1024 for a 1024x1024 grid).
+        """
+        self.grid_size = grid_size
+        self.words_per_row = -(-grid_size // WORD_BITS)
+        self.words = np.zeros((grid_size, self.words_per_row), dtype=np.uint64)
+        self.previous_words = np.zeros_like(self.words)
+        self.activity_count = 0  # Counter for state changes per iteration
+
+        # Valid bits of each word of a row (the last word may be partially used)
+        self._row_mask = pack_grid(np.ones((1, grid_size)), grid_size)[0]
+
+    @property
+    def grid(self):
+        return BitGridView(self.words, self.grid_size)
+
+    @grid.setter
+    def grid(self, value):
+        self.words = pack_grid(value, self.grid_size)
+
+    @property
+    def previous_grid(self):
+        return BitGridView(self.previous_words, self.grid_size)
+
+    @previous_grid.setter
+    def previous_grid(self, value):
+        self.previous_words = pack_grid(value, self.grid_size)
+
+    def randomize(self):
+        """Fills the grid with random values (0 or 1), one random word at a time."""
+        if self.rng is not None:
+            # Same draws as the other engines, so a seeded cube matches them
+            self.grid = self.rng.integers(0, 2, size=(self.grid_size, self.grid_size))
+            return
+        random_words = [random.getrandbits(WORD_BITS) for _ in range(self.words.size)]
+        self.words = np.array(random_words, dtype=np.uint64).reshape(self.words.shape) & self._row_mask
+
+    def update(self, face_id: int, all_faces: list, use_stochastic_rule: bool = False, rule=None):
+        """
+        Updates the grid according to the rules, considering the connections with other faces.
+
+        Count rules are evaluated with bitwise masks; neighborhood rules fall back to
+        table lookups on the unpacked face.
+
+        Args:
+            face_id (int): ID of the current face.
+            all_faces (list): List of all cube faces.
+            use_stochastic_rule (bool): Use ``rule_set_2`` instead of ``rule_set_1``.
+            rule (Rule or str): Rule from the registry in ``rules.py`` (overrides
+                ``use_stochastic_rule``).
+        """
+        rule = resolve_rule(rule, use_stochastic_rule)
+        alive = self.words
+
+        if rule.neighborhood:
+            grid = unpack_grid(alive, self.grid_size)
+            rngs = None if self.rng is None else [self.rng]
+            new_words = pack_grid(apply_rule(rule, pad_face(grid, face_id, all_faces), rngs), self.grid_size)
+        else:
+            planes = self._count_neighbors(face_id, all_faces)
+            new_words = (alive & count_in(planes, rule.survive)) | (~alive & count_in(planes, rule.birth))
+            if rule.birth_chance is not None:
+                new_words |= self._stochastic_births(alive, rule.birth_chance)
+        new_words &= self._row_mask
+
+        self.activity_count = popcount(new_words ^ alive)
+        self.previous_words = alive
+        self.words = new_words
+        self._notify("on_update", face_id, rule)
+
+    def _write_cells(self, xs: np.ndarray, ys: np.ndarray, mode: str):
+        # Unbuffered ufuncs, since distinct cells may share a word
+        index = (xs, ys // WORD_BITS)
+        bits = np.left_shift(np.uint64(1), (ys % WORD_BITS).astype(np.uint64))
+        if mode == "flip":
+            np.bitwise_xor.at(self.words, index, bits)
+        elif mode == "set":
+            np.bitwise_or.at(self.words, index, bits)
+        else:
+            np.bitwise_and.at(self.words, index, ~bits)
+
+    def _count_neighbors(self, face_id: int, all_faces: list) -> list:
+        """
+        Counts the live neighbors of every cell with a bit-sliced adder.
+
+        Returns:
+            list: Four bit planes (least significant first) holding each cell's count.
+        """
+        if face_id not in CUBE_NEIGHBORS or not all_faces:
+            raise ValueError("CUBE_NEIGHBORS o all_faces están mal configurados.")
+
+        planes = [np.zeros_like(self.words) for _ in range(4)]  # Counts up to 15
+
+        # Neighbors within the same face
+        north = shift_north(self.words)
+        south = shift_south(self.words)
+        for row in (north, self.words, south):
+            add_to_counter(planes, shift_west(row))
+            add_to_counter(planes, shift_east(row))
+        add_to_counter(planes, north)
+        add_to_counter(planes, south)
+
+        # Neighbors from adjacent faces (orthogonal only, as in _get_neighbors)
+        neighbors = CUBE_NEIGHBORS[face_id]
+        up = np.zeros_like(self.words)
+        up[0] = self._edge_row(all_faces[neighbors["up"]], -1)  # Last row of the upper face
+        add_to_counter(planes, up)
+        down = np.zeros_like(self.words)
+        down[-1] = self._edge_row(all_faces[neighbors["down"]], 0)  # First row of the lower face
+        add_to_counter(planes, down)
+        left = np.zeros_like(self.words)
+        left[:, 0] = self._edge_column(all_faces[neighbors["left"]], -1)  # Last column of the left face
+        add_to_counter(planes, left)
+        last = self.grid_size - 1
+        right = np.zeros_like(self.words)
+        right[:, last // WORD_BITS] = self._edge_column(all_faces[neighbors["right"]], 0) << np.uint64(
+            last % WORD_BITS
+        )  # First column of the right face
+        add_to_counter(planes, right)
+
+        return planes
+
+    def _edge_row(self, face, x: int) -> np.ndarray:
+        """Returns row ``x`` of another face as packed words."""
+        if isinstance(face, BitboardCellularAutomata):
+            return face.words[x]
+        return pack_grid(np.asarray(face.grid, dtype=np.uint8)[x][np.newaxis], self.grid_size)[0]
+
+    def _edge_column(self, face, y: int) -> np.ndarray:
+        """Returns column ``y`` of another face as one uint64 0/1 value per row."""
+        if isinstance(face, BitboardCellularAutomata):
+            y = range(self.grid_size)[y]
+            return (face.words[:, y // WORD_BITS] >> np.uint64(y % WORD_BITS)) & np.uint64(1)
+        return np.asarray(face.grid, dtype=np.uint64)[:, y]
+
+    def _stochastic_births(self, alive: np.ndarray, birth_chance: float) -> np.ndarray:
+        """
+        Stochastic births: a dead cell whose lower neighbor is alive is born with
+        probability ``birth_chance``, drawing from the face's stream (a whole face in
+        one call) or else from ``random`` in row-major order.
+        """
+        candidates = unpack_grid(~alive & shift_south(alive), self.grid_size)
+        draws = self._birth_draws()
+        if draws is not None:
+            return pack_grid(candidates & (draws < birth_chance), self.grid_size)
+
+        candidates = np.flatnonzero(candidates)
+        draws = np.array([random.random() for _ in range(candidates.size)])
+        births = np.zeros(self.grid_size * self.grid_size, dtype=np.uint8)
+        births[candidates[draws < birth_chance]] = 1
+        return pack_grid(births.reshape(self.grid_size, self.grid_size), self.grid_size)
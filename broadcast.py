@@ -0,0 +1,332 @@
+"""
+Broadcast of the cube state to many viewers over TCP, with delta-encoded frames.
+
+Frame format (little-endian, back to back on the stream):
+    kind (u8), face ID (u8), grid size (u16), sequence (u32), simulated time (f64),
+    activity count (u32), payload length (u32), payload
+
+Payloads use the grid encoding of recording.py: a keyframe holds the packed grid of
+a face, a delta the XOR of the packed grid with the one of the previous frame of the
+face, either whole or as runs of changed 8-byte words. Each face numbers its frames;
+a delta applies to the frame just before it.
+
+Each change is encoded once, on the simulation thread, by a listener of the faces,
+and handed to the server's event loop; fanning it out to the clients only appends a
+reference to each client's bounded queue, so the cost of the simulation does not
+grow with the number of viewers. A client whose queue is full loses its queued
+deltas and gets a keyframe of the current state instead, so a slow connection skips
+frames without delaying the others. New clients get a keyframe of every face on
+connection, and every client gets one every ``keyframe_interval`` seconds.
+
+Usage:
+    python -m liquiprism serve --port 8765
+
+    async with BroadcastClient("127.0.0.1", 8765) as client:
+        async for face_id in client:
+            print(face_id, client.grids[face_id].sum())
+"""
+import asyncio
+import struct
+import threading
+
+import numpy as np
+
+from instrumentation import metrics
+from recording import KEYFRAME, RUN_DELTA, XOR_DELTA, decode_runs, encode_delta
+
+FRAME = struct.Struct("<BBHIdII")
+DEFAULT_PORT = 8765
+
+_RESYNC = object()  # Queue marker: send a keyframe of every face
+
+
+class _FaceEncoder:
+    """Listener of the faces, encoding each change as a delta on the thread that made it."""
+
+    def __init__(self, server, faces: list):
+        self.server = server
+        self._face_ids = {id(face): face_id for face_id, face in enumerate(faces)}
+        self.packed = [np.packbits(np.asarray(face.grid, dtype=np.uint8)) for face in faces]
+        self.sequences = [0] * len(faces)
+
+    def on_update(self, face, face_id, rule):
+        self._encode(self._face_ids[id(face)], face)
+
+    def on_perturb(self, face, cells):
+        self._encode(self._face_ids[id(face)], face)
+
+    def _encode(self, face_id: int, face):
+        packed = np.packbits(np.asarray(face.grid, dtype=np.uint8))
+        kind, payload = encode_delta(packed ^ self.packed[face_id])
+        self.packed[face_id] = packed
+        self.sequences[face_id] += 1
+        self.server.publish(face_id, self.sequences[face_id], packed, kind, payload, face.activity_count)
+
+
+class _Client:
+    """Connection of one viewer, with its bounded queue of frames."""
+
+    def __init__(self, writer, queue_size: int, face_count: int):
+        self.writer = writer
+        self.queue = asyncio.Queue(queue_size)
+        self.sent = [0] * face_count  # Sequence of the last frame sent for each face
+        self.dropped = 0
+        self.task = asyncio.current_task()
+
+
+class BroadcastServer:
+    """Asyncio TCP server publishing the changes of the faces, on its own thread."""
+
+    def __init__(self, faces: list, host: str = "127.0.0.1", port: int = DEFAULT_PORT, queue_size: int = 64,
+                 keyframe_interval: float = 5.0, clock=None):
+        """
+        Initializes the server (``start`` begins listening).
+
+        Args:
+            faces (list): The six faces of the cube (any engine).
+            host (str): Address to listen on.
+            port (int): TCP port (0: any free port, see ``port`` after ``start``).
+            queue_size (int): Frames queued per client before its backlog is replaced by
+                a keyframe.
+            keyframe_interval (float): Seconds between keyframes sent to every client
+                (0: only on connection and after a dropped backlog).
+            clock (callable): Simulated time of the frames (default 0).
+        """
+        if queue_size < 1:
+            raise ValueError("The client queue size must be at least 1.")
+        self.faces = faces
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.keyframe_interval = keyframe_interval
+        self.clock = clock
+        self.grid_size = faces[0].grid_size
+        self.clients = set()
+        self.frames_published = 0
+
+        self._state = None  # Latest frame of each face, read by the event loop to build keyframes
+        self._encoder = None
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """Starts the event loop thread, listens and subscribes to the faces."""
+        if self._thread is not None:
+            raise RuntimeError("The broadcast server is already running.")
+        self._encoder = _FaceEncoder(self, self.faces)
+        self._state = [(0, packed, face.activity_count, 0.0) for packed, face in zip(self._encoder.packed, self.faces)]
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name="liquiprism-broadcast", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            self._thread = None
+            raise RuntimeError(f"Could not start the broadcast server: {self._error}") from self._error
+
+        for face in self.faces:
+            face.add_listener(self._encoder)
+
+    def stop(self):
+        """Unsubscribes from the faces, closes every connection and stops the thread."""
+        if self._thread is None:
+            return
+        for face in self.faces:
+            face.remove_listener(self._encoder)
+        self._loop.call_soon_threadsafe(self._shutdown.set)
+        self._thread.join()
+        self._thread = None
+
+    def publish(self, face_id: int, sequence: int, packed: np.ndarray, kind: int, payload: bytes,
+                activity_count: int):
+        """
+        Hands a delta of a face to the event loop (called by the encoder on the thread
+        that changed the face).
+        """
+        timestamp = self.clock() if self.clock is not None else 0.0
+        frame = FRAME.pack(kind, face_id, self.grid_size, sequence, timestamp, activity_count, len(payload)) + payload
+        self.frames_published += 1
+        self._loop.call_soon_threadsafe(self._fan_out, face_id, sequence, packed, activity_count, timestamp, frame)
+
+    def _run(self):
+        try:
+            asyncio.run(self._serve())
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._shutdown = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+
+        keyframes = asyncio.create_task(self._send_keyframes()) if self.keyframe_interval > 0 else None
+        await self._shutdown.wait()
+        if keyframes is not None:
+            keyframes.cancel()
+        self._server.close()
+        for client in list(self.clients):
+            client.task.cancel()
+        await self._server.wait_closed()
+
+    def _fan_out(self, face_id, sequence, packed, activity_count, timestamp, frame):
+        self._state[face_id] = (sequence, packed, activity_count, timestamp)
+        for client in self.clients:
+            self._enqueue(client, (face_id, sequence, frame))
+
+    def _enqueue(self, client: _Client, item):
+        try:
+            client.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Replace the backlog with one keyframe of the state at the time it is sent
+            client.dropped += client.queue.qsize()
+            metrics.count("broadcast_dropped", client.queue.qsize())
+            while not client.queue.empty():
+                client.queue.get_nowait()
+            client.queue.put_nowait(_RESYNC)
+
+    async def _send_keyframes(self):
+        while True:
+            await asyncio.sleep(self.keyframe_interval)
+            for client in self.clients:
+                self._enqueue(client, _RESYNC)
+
+    def keyframes(self, client: _Client) -> bytes:
+        """Encodes the current state of every face for a client."""
+        frames = []
+        for face_id, (sequence, packed, activity_count, timestamp) in enumerate(self._state):
+            payload = packed.tobytes()
+            frames.append(FRAME.pack(KEYFRAME, face_id, self.grid_size, sequence, timestamp, activity_count,
+                                     len(payload)) + payload)
+            client.sent[face_id] = sequence
+        return b"".join(frames)
+
+    async def _handle_client(self, reader, writer):
+        client = _Client(writer, self.queue_size, len(self.faces))
+        self.clients.add(client)
+        client.queue.put_nowait(_RESYNC)
+        reading = asyncio.create_task(reader.read())  # Detects the client closing the connection
+        try:
+            while not reading.done():
+                item = await client.queue.get()
+                chunks = []
+                while True:
+                    if item is _RESYNC:
+                        chunks.append(self.keyframes(client))
+                    else:
+                        face_id, sequence, frame = item
+                        if sequence == client.sent[face_id] + 1:  # Older frames are in the keyframe sent since
+                            chunks.append(frame)
+                            client.sent[face_id] = sequence
+                    if client.queue.empty():
+                        break
+                    item = client.queue.get_nowait()
+                writer.write(b"".join(chunks))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(client)
+            reading.cancel()
+            writer.close()
+
+
+async def read_frame(reader) -> tuple:
+    """
+    Reads one frame from a stream.
+
+    Returns:
+        tuple: (kind, face ID, grid size, sequence, simulated time, activity count, payload).
+    """
+    header = await reader.readexactly(FRAME.size)
+    kind, face_id, grid_size, sequence, timestamp, activity_count, length = FRAME.unpack(header)
+    payload = await reader.readexactly(length)
+    return kind, face_id, grid_size, sequence, timestamp, activity_count, payload
+
+
+class BroadcastClient:
+    """Viewer that keeps a copy of the cube from the frames of a ``BroadcastServer``."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, face_count: int = 6):
+        """
+        Initializes the client (``connect`` opens the connection).
+
+        Args:
+            host (str): Address of the server.
+            port (int): TCP port of the server.
+            face_count (int): Number of faces of the cube.
+        """
+        self.host = host
+        self.port = port
+        self.grids = [None] * face_count
+        self.sequences = [None] * face_count
+        self.activity_counts = [0] * face_count
+        self.times = [0.0] * face_count
+        self._packed = [None] * face_count
+        self._reader = None
+        self._writer = None
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> int:
+        try:
+            return await self.receive()
+        except asyncio.IncompleteReadError:
+            raise StopAsyncIteration
+
+    async def receive(self) -> int:
+        """
+        Reads and applies the next frame.
+
+        Returns:
+            int: ID of the face that changed.
+        """
+        kind, face_id, grid_size, sequence, timestamp, activity_count, payload = await read_frame(self._reader)
+        size = (grid_size * grid_size + 7) // 8
+        if kind == KEYFRAME:
+            packed = np.frombuffer(payload, dtype=np.uint8, count=size).copy()
+        else:
+            if self.sequences[face_id] is None or sequence != self.sequences[face_id] + 1:
+                raise RuntimeError(f"Frame {sequence} of face {face_id} does not follow {self.sequences[face_id]}.")
+            if kind == XOR_DELTA:
+                xor = np.frombuffer(payload, dtype=np.uint8, count=size)
+            elif kind == RUN_DELTA:
+                xor = decode_runs(payload, size)
+            else:
+                raise ValueError(f"Unknown frame kind {kind}.")
+            packed = self._packed[face_id] ^ xor
+        self._packed[face_id] = packed
+        self.grids[face_id] = np.unpackbits(packed, count=grid_size * grid_size).reshape(grid_size, grid_size)
+        self.sequences[face_id] = sequence
+        self.activity_counts[face_id] = activity_count
+        self.times[face_id] = timestamp
+        return face_id
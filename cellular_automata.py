@@ -1,5 +1,9 @@
 import random
 
+import numpy as np
+
+from rules import resolve_rule
+
 CUBE_NEIGHBORS = {
     0: {"up": 4, "down": 5, "left": 3, "right": 1},
     1: {"up": 4, "down": 5, "left": 0, "right": 2},
@@ -9,10 +13,68 @@ CUBE_NEIGHBORS = {
     5: {"up": 0, "down": 2, "left": 3, "right": 1},
 }
 
+PERTURB_MODES = ("flip", "set", "clear")  # Writes of perturb_cells: invert, make alive, make dead
+
+
+def face_streams(seed, count: int = 6) -> list:
+    """
+    Derives independent random streams for the faces of a cube from one master seed.
+
+    Args:
+        seed (int): Master seed.
+        count (int): Number of streams.
+
+    Returns:
+        list: One ``numpy.random.Generator`` per face.
+    """
+    return [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(count)]
+
+
+def seed_faces(faces: list, seed):
+    """
+    Gives each face its own random stream derived from a master seed (see ``face_streams``).
+
+    A face only draws from its own stream (in ``randomize``, ``perturb`` and the
+    stochastic births of ``rule_set_2``), so the same seed gives the same run whether
+    the faces are stepped sequentially, in threads or in processes.
+
+    Args:
+        faces (list): Faces of the cube.
+        seed (int): Master seed.
+    """
+    for face, rng in zip(faces, face_streams(seed, len(faces))):
+        face.rng = rng
+
+
+def unique_cells(xs, ys, grid_size: int) -> tuple:
+    """
+    Validates cell coordinates and removes repeated cells.
+
+    Args:
+        xs (array-like): Rows of the cells.
+        ys (array-like): Columns of the cells, one per row.
+        grid_size (int): Grid size (N).
+
+    Returns:
+        tuple: (xs, ys) int64 arrays of distinct cells in row-major order.
+    """
+    xs = np.asarray(xs, dtype=np.int64).ravel()
+    ys = np.asarray(ys, dtype=np.int64).ravel()
+    if xs.shape != ys.shape:
+        raise ValueError("The cells need one column per row.")
+    if xs.size and (min(xs.min(), ys.min()) < 0 or max(xs.max(), ys.max()) >= grid_size):
+        raise ValueError(f"Cells must lie inside the {grid_size}x{grid_size} grid.")
+    index = np.unique(xs * grid_size + ys)
+    return index // grid_size, index % grid_size
+
 
 class CellularAutomata:
     """Class to model a cellular automaton grid."""
 
+    listeners = ()  # Objects notified after each update and perturbation
+    generation = 0  # Number of updates and perturbations, bumped on each notification
+    rng = None  # numpy Generator of this face (see seed_faces); None draws from the global random module
+
     def __init__(self, grid_size: int):
 
         """
@@ -30,34 +92,100 @@ class CellularAutomata:
 
     def randomize(self):
         """Fills the grid with random values (0 or 1)."""
+        if self.rng is not None:
+            self.grid = self.rng.integers(0, 2, size=(self.grid_size, self.grid_size)).tolist()
+            return
         self.grid = [[random.randint(0, 1) for _ in range(self.grid_size)] for _ in range(self.grid_size)]
 
+    def _birth_draws(self):
+        """
+        Draws the random numbers of one stochastic step from the face's stream, a whole
+        face in one call.
+
+        Returns:
+            np.ndarray: (N, N) uniform numbers, or None without a stream (the cells then
+            draw from ``random`` one by one).
+        """
+        if self.rng is None:
+            return None
+        return self.rng.random((self.grid_size, self.grid_size))
+
+    def _perturbed_cells(self, intensity: int) -> list:
+        """Draws the (x, y) cells of a perturbation, from the face's stream if it has one."""
+        if self.rng is not None:
+            return [tuple(cell) for cell in self.rng.integers(0, self.grid_size, size=(intensity, 2)).tolist()]
+        cells = []
+        for _ in range(intensity):
+            x = random.randint(0, self.grid_size - 1)
+            y = random.randint(0, self.grid_size - 1)
+            cells.append((x, y))
+        return cells
+
+    def add_listener(self, listener):
+        """
+        Registers an object notified of the changes of this face.
+
+        The listener may define ``on_update(face, face_id, rule)``, called after each
+        update, and ``on_perturb(face, cells)``, called after a perturbation with the
+        list of modified (x, y) cells.
+
+        Args:
+            listener: Object to notify.
+        """
+        self.listeners = (*self.listeners, listener)
+
+    def remove_listener(self, listener):
+        """Unregisters a listener added with ``add_listener``."""
+        self.listeners = tuple(other for other in self.listeners if other is not listener)
+
+    def _notify(self, event: str, *args):
+        """Counts a change of the grid in ``generation`` and calls ``event`` on every listener that defines it."""
+        self.generation += 1
+        for listener in self.listeners:
+            callback = getattr(listener, event, None)
+            if callback is not None:
+                callback(self, *args)
+
     def display(self):
         """Displays the grid in the console."""
         for row in self.grid:
             print(" ".join(str(cell) for cell in row))
 
-    def update(self, face_id: int, all_faces: list, use_stochastic_rule: bool = False):
+    def update(self, face_id: int, all_faces: list, use_stochastic_rule: bool = False, rule=None):
         """
         Updates the grid according to the rules, considering the connections with other faces.
 
         Args:
             face_id (int): ID of the current face.
             all_faces (list): List of all cube faces.
+            use_stochastic_rule (bool): Use ``rule_set_2`` instead of ``rule_set_1``.
+            rule (Rule or str): Rule from the registry in ``rules.py`` (overrides
+                ``use_stochastic_rule``).
         """
+        rule = resolve_rule(rule, use_stochastic_rule)
+        lookup = rule.lookup
+        draws = self._birth_draws() if rule.birth_chance is not None else None
+        draws = None if draws is None else draws.tolist()  # Lists index faster per cell
         new_grid = [[0 for _ in range(self.grid_size)] for _ in range(self.grid_size)]
         self.activity_count = 0
 
         for x in range(self.grid_size):
             for y in range(self.grid_size):
-                # Get neighbors, including connections between faces
-                neighbors = self._get_neighbors(x, y, face_id, all_faces)
                 current_state = self.grid[x][y]
 
-                if use_stochastic_rule:
-                    new_state = self.rule_set_2(current_state, x, y, neighbors)
+                if rule.neighborhood:
+                    new_state = lookup[self._get_neighborhood_index(x, y, face_id, all_faces)]
                 else:
-                    new_state = self.rule_set_1(current_state, neighbors)
+                    # Get neighbors, including connections between faces
+                    neighbors = self._get_neighbors(x, y, face_id, all_faces)
+                    new_state = lookup[current_state][sum(neighbors)]
+
+                if rule.birth_chance is not None and current_state == 0:
+                    below_neighbor = self.grid[x + 1][y] if x + 1 < self.grid_size else 0
+                    if below_neighbor == 1:
+                        draw = random.random() if draws is None else draws[x][y]
+                        if draw < rule.birth_chance:
+                            new_state = 1
 
                 if new_state != current_state:
                     self.activity_count += 1
@@ -66,6 +194,7 @@ class CellularAutomata:
         # Store the current state as the previous state before updating
         self.previous_grid = [row[:] for row in self.grid]
         self.grid = new_grid
+        self._notify("on_update", face_id, rule)
 
 
     def rule_set_1(self, current_state: int, neighbors: list) -> int:
@@ -104,7 +233,10 @@ class CellularAutomata:
         if current_state == 1:  # Living cell
             return 1 if alive_neighbors in (2, 3) else 0
         else:  # Dead cell  
-            return 1 if below_neighbor == 1 and random.random() < 0.33 else 0
+            if below_neighbor != 1:
+                return 0
+            draw = random.random() if self.rng is None else self.rng.random()
+            return 1 if draw < 0.33 else 0
         
     def _get_neighbors(self, x: int, y: int, face_id: int, all_faces: list) -> list:
         """
@@ -147,6 +279,40 @@ class CellularAutomata:
 
         return neighbors    
     
+    def _get_neighborhood_index(self, x: int, y: int, face_id: int, all_faces: list) -> int:
+        """
+        Packs the 3x3 neighborhood of a cell into the index used by neighborhood rules.
+
+        Args:
+            x (int): x-coordinate of the cell.
+            y (int): y-coordinate of the cell.
+            face_id (int): ID of the current face.
+            all_faces (list): List of all cube faces (instances of CellularAutomata).
+
+        Returns:
+            int: Bit (dx + 1) * 3 + (dy + 1) holds the cell at offset (dx, dy).
+        """
+        if face_id not in CUBE_NEIGHBORS or not all_faces:
+            raise ValueError("CUBE_NEIGHBORS o all_faces están mal configurados.")
+
+        index = 0
+        for i in range(x - 1, x + 2):
+            for j in range(y - 1, y + 2):
+                if 0 <= i < self.grid_size and 0 <= j < self.grid_size:
+                    index |= int(self.grid[i][j]) << ((i - x + 1) * 3 + (j - y + 1))
+
+        # Orthogonal neighbors from adjacent faces
+        neighbor_faces = CUBE_NEIGHBORS[face_id]
+        if x == 0:
+            index |= int(all_faces[neighbor_faces["up"]].grid[-1][y]) << 1
+        if x == self.grid_size - 1:
+            index |= int(all_faces[neighbor_faces["down"]].grid[0][y]) << 7
+        if y == 0:
+            index |= int(all_faces[neighbor_faces["left"]].grid[x][-1]) << 3
+        if y == self.grid_size - 1:
+            index |= int(all_faces[neighbor_faces["right"]].grid[x][0]) << 5
+        return index
+
     def perturb(self, intensity=3):
         """
         Applies a perturbation to the system by randomly altering some cells.
@@ -154,7 +320,34 @@ class CellularAutomata:
         Args:
             intensity (int): Number of cells to be modified.
         """
-        for _ in range(intensity):
-            x = random.randint(0, self.grid_size - 1)
-            y = random.randint(0, self.grid_size - 1)
-            self.grid[x][y] = 1 if self.grid[x][y] == 0 else 0  # Invert cell state
\ No newline at end of file
+        cells = self._perturbed_cells(intensity)
+        for x, y in cells:
+            self.grid[x][y] = 1 if self.grid[x][y] == 0 else 0  # Invert cell state
+        self._notify("on_perturb", cells)
+
+    def perturb_cells(self, xs, ys, mode: str = "flip") -> list:
+        """
+        Writes a set of cells in one operation and notifies the listeners, as ``perturb``
+        does. The cost grows with the number of cells, not with the grid size.
+
+        Args:
+            xs (array-like): Rows of the cells.
+            ys (array-like): Columns of the cells, one per row.
+            mode (str): One of ``PERTURB_MODES``. A cell listed twice is written once.
+
+        Returns:
+            list: The distinct (x, y) cells written, in row-major order.
+        """
+        if mode not in PERTURB_MODES:
+            raise ValueError(f"Unknown perturbation mode '{mode}'. Use one of: {', '.join(PERTURB_MODES)}.")
+        xs, ys = unique_cells(xs, ys, self.grid_size)
+        self._write_cells(xs, ys, mode)
+        cells = list(zip(xs.tolist(), ys.tolist()))
+        self._notify("on_perturb", cells)
+        return cells
+
+    def _write_cells(self, xs: np.ndarray, ys: np.ndarray, mode: str):
+        """Writes distinct cells of the grid (overridden by engines with array storage)."""
+        grid = self.grid
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            grid[x][y] = (1 - grid[x][y]) if mode == "flip" else int(mode == "set")
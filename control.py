@@ -0,0 +1,454 @@
+"""
+Control plane: timestamped commands changing a running cube, from the same process
+or over UDP.
+
+Commands ("perturb", "rule", "interval", "threshold", "mapping", see ``COMMANDS``)
+are validated where they are sent, queued, and applied by the simulation thread at
+the start of a tick (``Scheduler`` calls ``ControlPlane.apply_due``), so the faces
+and parameters are never changed while they are stepped and the hot path takes no
+lock: the only shared object is a ``queue.SimpleQueue``. A command with an ``at``
+time waits for the first tick at or after that simulated time.
+
+Each command carries the wall-clock time it was sent (``time.time()``, so senders in
+other processes can stamp it). The plane keeps rolling percentiles of the latency
+from sending to applying the command and to publishing the changed cube to the
+renderer and sonification.
+
+Datagrams of the UDP listener are either JSON objects or OSC messages:
+    {"command": "perturb", "face": 2, "intensity": 8, "region": [0, 0, 4, 4], "sent": 1718000000.0}
+    {"command": "interval", "face": 0, "interval": 0.25, "at": 30.0}
+    /liquiprism/perturb ,ii 2 8                 (face, intensity; face -1 for every face)
+    /liquiprism/perturb ,iiiiii 2 8 0 0 4 4     (face, intensity, region x, y, height, width)
+    /liquiprism/rule ,ss B3/S23 rule_set_2
+
+Usage:
+    python -m liquiprism control perturb face=2 intensity=8 --port 9000
+"""
+import heapq
+import itertools
+import json
+import math
+import queue
+import random
+import socket
+import struct
+import threading
+import time
+
+from instrumentation import RollingStats, metrics
+from note_mapping import PRIORITIES, SCALES
+from rules import get_rule
+
+DEFAULT_PORT = 9000
+OSC_PREFIX = "/liquiprism/"
+
+# Accepted arguments of each command, in the order of OSC arguments
+COMMANDS = {
+    "perturb": ("face", "intensity", "region"),
+    "rule": ("rule", "low_activity_rule"),
+    "interval": ("face", "interval"),
+    "threshold": ("threshold",),
+    "mapping": ("scale", "priority", "base_note", "transpositions"),
+}
+
+
+class Command:
+    """A validated command, with the times it was sent and applied."""
+
+    __slots__ = ("name", "arguments", "sent", "at", "applied", "published", "error")
+
+    def __init__(self, name: str, arguments: dict = None, sent: float = None, at: float = None):
+        """
+        Validates a command.
+
+        Args:
+            name (str): One of ``COMMANDS``.
+            arguments (dict): Arguments of the command.
+            sent (float): Wall-clock time it was sent (default now).
+            at (float): Simulated time from which to apply it (default the next tick).
+        """
+        arguments = dict(arguments or {})
+        if name not in COMMANDS:
+            raise ValueError(f"Unknown command '{name}'. Available commands: {', '.join(COMMANDS)}.")
+        unknown = set(arguments) - set(COMMANDS[name])
+        if unknown:
+            raise ValueError(f"Unknown arguments of '{name}': {', '.join(sorted(unknown))}.")
+        _validate(name, arguments)
+
+        self.name = name
+        self.arguments = arguments
+        self.sent = time.time() if sent is None else float(sent)
+        self.at = None if at is None else float(at)
+        self.applied = None
+        self.published = None
+        self.error = None  # Exception raised when it was applied, if it failed
+
+    def __repr__(self):
+        return f"Command({self.name!r}, {self.arguments!r}, sent={self.sent}, at={self.at})"
+
+
+def _validate(name: str, arguments: dict):
+    face = arguments.get("face")
+    if face is not None and not (isinstance(face, int) and 0 <= face < 6):
+        raise ValueError(f"Invalid face {face!r} (0 to 5, or None for every face).")
+    if name == "perturb":
+        intensity = arguments.get("intensity", 5)
+        if not _is_integer(intensity) or intensity < 0:
+            raise ValueError("The perturbation intensity must be a non-negative integer.")
+        region = arguments.get("region")
+        if region is not None and (not isinstance(region, (list, tuple)) or len(region) != 4
+                                   or not all(_is_integer(value) for value in region)
+                                   or min(region[2:]) < 1 or min(region[:2]) < 0):
+            raise ValueError("A region is [x, y, height, width] with a positive size.")
+    elif name == "rule":
+        for key in ("rule", "low_activity_rule"):
+            if key in arguments:
+                get_rule(arguments[key])
+    elif name == "interval":
+        interval = float(arguments.get("interval", 0))
+        if face is None or not 0 < interval < math.inf:
+            raise ValueError("An interval command needs a face and a positive interval.")
+    elif name == "threshold":
+        if "threshold" not in arguments:
+            raise ValueError("A threshold command needs a threshold.")
+        int(arguments["threshold"])
+    elif name == "mapping":
+        if "scale" in arguments and arguments["scale"] not in SCALES:
+            raise ValueError(f"Unknown scale '{arguments['scale']}'. Available scales: {', '.join(SCALES)}.")
+        if isinstance(arguments.get("priority"), str) and arguments["priority"] not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{arguments['priority']}'.")
+        # The channels and grid size are known to the ControlPlane, which builds the tables
+
+
+def _is_integer(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def perturb_region(face, x: int, y: int, height: int, width: int, intensity: int) -> list:
+    """
+    Inverts ``intensity`` random cells of a region of a face, like ``perturb`` does on
+    the whole face (drawing from the face's stream if it has one).
+
+    Returns:
+        list: The (x, y) cells inverted.
+    """
+    height = min(height, face.grid_size - x)
+    width = min(width, face.grid_size - y)
+    if height < 1 or width < 1:
+        return []
+    if face.rng is not None:
+        cells = [(x + dx, y + dy) for dx, dy in
+                 face.rng.integers(0, (height, width), size=(intensity, 2)).tolist()]
+    else:
+        cells = [(random.randint(x, x + height - 1), random.randint(y, y + width - 1)) for _ in range(intensity)]
+
+    grid = face.grid
+    for cx, cy in cells:
+        grid[cx][cy] = 1 if grid[cx][cy] == 0 else 0  # Invert cell state
+    if hasattr(face, "mark_dirty"):
+        face.mark_dirty(x, y, height, width)
+    face._notify("on_perturb", cells)
+    return cells
+
+
+class ControlPlane:
+    """Queue of commands applied to a running ``Scheduler`` between ticks."""
+
+    def __init__(self, sonification=None):
+        """
+        Initializes the control plane (pass it to the ``Scheduler`` as ``control``).
+
+        Args:
+            sonification (Sonification): Target of "mapping" commands.
+        """
+        self.scheduler = None  # Set by the scheduler that applies the commands
+        self.sonification = sonification
+        self.apply_latency = RollingStats()
+        self.effect_latency = RollingStats()
+        self.applied_commands = 0
+        self.rejected_commands = 0
+        self._queue = queue.SimpleQueue()
+        self._pending = []  # Heap of (at, order, command) owned by the simulation thread
+        self._order = itertools.count()
+        self._unpublished = []
+
+    def send(self, name: str, at: float = None, sent: float = None, **arguments) -> Command:
+        """
+        Validates a command and queues it (from any thread).
+
+        Args:
+            name (str): One of ``COMMANDS``.
+            at (float): Simulated time from which to apply it (default the next tick).
+            sent (float): Wall-clock time it was sent (default now).
+            **arguments: Arguments of the command.
+
+        Returns:
+            Command: The queued command, whose ``applied`` time is set once applied.
+        """
+        command = Command(name, arguments, sent, at)
+        self.submit(command)
+        return command
+
+    def submit(self, command: Command):
+        """Checks a command against the faces and sonification it changes and queues it."""
+        self.check(command)
+        self._queue.put(command)
+
+    def check(self, command: Command):
+        """
+        Checks what ``Command`` cannot on its own: the "mapping" tables are built for
+        the sonification's channels and the faces' size, and perturbations are bounded
+        by the face area, so that a command cannot fail on the simulation thread.
+
+        Raises:
+            ValueError: If the command cannot be applied.
+        """
+        scheduler = self.scheduler
+        grid_size = None if scheduler is None else scheduler.faces[0].grid_size
+        if command.name == "mapping":
+            if self.sonification is None:
+                raise ValueError("Mapping commands need a sonification.")
+            self.sonification.prepare_mapping(grid_size=grid_size, **command.arguments)
+        elif command.name == "perturb" and grid_size is not None:
+            if command.arguments.get("intensity", 5) > grid_size * grid_size:
+                raise ValueError(f"The perturbation intensity must be at most the face area ({grid_size * grid_size}).")
+
+    def apply_due(self, simulated_time: float) -> int:
+        """
+        Applies the commands due at a tick (called by the simulation thread before it
+        updates the faces).
+
+        Returns:
+            int: Number of commands applied.
+        """
+        while True:
+            try:
+                command = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            at = -float("inf") if command.at is None else command.at
+            heapq.heappush(self._pending, (at, next(self._order), command))
+
+        applied = 0
+        while self._pending and self._pending[0][0] <= simulated_time:
+            command = heapq.heappop(self._pending)[2]
+            try:
+                self.apply(command)
+            except Exception as e:  # A failing command is dropped, it must not stop the simulation
+                command.error = e
+                self.rejected_commands += 1
+                continue
+            command.applied = time.time()
+            latency = command.applied - command.sent
+            self.apply_latency.add(latency)
+            metrics.record("control_apply", latency)
+            self._unpublished.append(command)
+            applied += 1
+        self.applied_commands += applied
+        return applied
+
+    def published(self):
+        """Records the effect latency of the commands applied before the last published snapshot."""
+        now = time.time()
+        for command in self._unpublished:
+            command.published = now
+            self.effect_latency.add(now - command.sent)
+            metrics.record("control_effect", now - command.sent)
+        self._unpublished = []
+
+    def apply(self, command: Command):
+        """Applies a command to the scheduler's faces and parameters (on the simulation thread)."""
+        scheduler = self.scheduler
+        arguments = command.arguments
+        face_id = arguments.get("face")
+        if command.name == "perturb":
+            faces = scheduler.faces if face_id is None else [scheduler.faces[face_id]]
+            intensity = int(arguments.get("intensity", 5))
+            for face in faces:
+                if arguments.get("region") is None:
+                    face.perturb(intensity=intensity)
+                else:
+                    perturb_region(face, *(int(value) for value in arguments["region"]), intensity)
+        elif command.name == "rule":
+            scheduler.rule = arguments.get("rule", scheduler.rule)
+            scheduler.low_activity_rule = arguments.get("low_activity_rule", scheduler.low_activity_rule)
+        elif command.name == "interval":
+            intervals = list(scheduler.update_intervals)
+            intervals[face_id] = float(arguments["interval"])
+            scheduler.update_intervals = intervals  # A new list, so the scheduler recomputes its ticks
+        elif command.name == "threshold":
+            scheduler.activity_threshold = int(arguments["threshold"])
+        elif command.name == "mapping":
+            self.sonification.set_mapping(**arguments)
+
+    def latency(self) -> dict:
+        """
+        Returns the command latencies.
+
+        Returns:
+            dict: Summaries (see ``RollingStats.summary``) of the time from sending to
+            applying ("apply") and to publishing the changed cube ("effect").
+        """
+        return {"apply": self.apply_latency.summary(), "effect": self.effect_latency.summary()}
+
+
+def decode_osc(data: bytes) -> tuple:
+    """
+    Decodes an OSC message with int32, float32 and string arguments.
+
+    Returns:
+        tuple: (address, list of arguments).
+
+    Raises:
+        ValueError: If the message is malformed or truncated.
+    """
+    try:
+        return _decode_osc(data)
+    except (struct.error, IndexError) as e:
+        raise ValueError(f"Malformed OSC message: {e}") from e
+
+
+def _decode_osc(data: bytes) -> tuple:
+    def read_string(offset):
+        end = data.index(b"\0", offset)
+        return data[offset:end].decode("utf-8"), (end + 4) & ~3
+
+    address, offset = read_string(0)
+    tags, offset = read_string(offset) if offset < len(data) else (",", offset)
+    arguments = []
+    for tag in tags[1:]:
+        if tag == "i":
+            arguments.append(struct.unpack_from(">i", data, offset)[0])
+            offset += 4
+        elif tag == "f":
+            arguments.append(struct.unpack_from(">f", data, offset)[0])
+            offset += 4
+        elif tag == "s":
+            value, offset = read_string(offset)
+            arguments.append(value)
+        else:
+            raise ValueError(f"Unsupported OSC argument type '{tag}'.")
+    return address, arguments
+
+
+def encode_osc(address: str, *arguments) -> bytes:
+    """Encodes an OSC message with int, float and string arguments."""
+    def pad(value: bytes) -> bytes:
+        return value + b"\0" * (4 - len(value) % 4)
+
+    tags = ","
+    payload = b""
+    for argument in arguments:
+        if isinstance(argument, int):
+            tags += "i"
+            payload += struct.pack(">i", argument)
+        elif isinstance(argument, float):
+            tags += "f"
+            payload += struct.pack(">f", argument)
+        else:
+            tags += "s"
+            payload += pad(str(argument).encode("utf-8"))
+    return pad(address.encode("utf-8")) + pad(tags.encode("utf-8")) + payload
+
+
+def parse_datagram(data: bytes) -> Command:
+    """Builds a command from a JSON or OSC datagram."""
+    if data.startswith(b"/"):
+        address, values = decode_osc(data)
+        if not address.startswith(OSC_PREFIX):
+            raise ValueError(f"OSC addresses start with '{OSC_PREFIX}'.")
+        name = address[len(OSC_PREFIX):]
+        names = COMMANDS.get(name, ())
+        if name == "perturb" and len(values) > 2:
+            values = [*values[:2], values[2:]]  # x, y, height, width of the region
+        if name == "mapping" and len(values) > 3:
+            values = [*values[:3], values[3:]]  # One transposition per face
+        arguments = dict(zip(names, values))
+        if arguments.get("face") == -1:
+            arguments["face"] = None
+        return Command(name, arguments)
+
+    message = json.loads(data.decode("utf-8"))
+    if not isinstance(message, dict) or "command" not in message:
+        raise ValueError("A JSON command is an object with a 'command' field.")
+    name = message.pop("command")
+    sent = message.pop("sent", None)
+    at = message.pop("at", None)
+    return Command(name, message, sent, at)
+
+
+class UdpListener:
+    """Thread receiving commands as UDP datagrams and queuing them on a ``ControlPlane``."""
+
+    def __init__(self, control: ControlPlane, host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+        """
+        Binds the socket.
+
+        Args:
+            control (ControlPlane): Plane the commands are queued on.
+            host (str): Address to listen on.
+            port (int): UDP port (0: any free port, see ``port``).
+        """
+        self.control = control
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host, port))
+        self.port = self.socket.getsockname()[1]
+        self.rejected = 0
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="liquiprism-control", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Closes the socket, which ends the thread."""
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                data, sender = self.socket.recvfrom(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            try:
+                self.control.submit(parse_datagram(data))
+            except Exception as e:  # One bad datagram must not stop the listener
+                self.rejected += 1
+                try:
+                    self.socket.sendto(json.dumps({"error": str(e)}).encode("utf-8"), sender)
+                except OSError:
+                    pass
+
+
+def send_command(name: str, host: str = "127.0.0.1", port: int = DEFAULT_PORT, at: float = None, **arguments):
+    """
+    Sends a JSON command to a ``UdpListener``, stamped with the current time.
+
+    Args:
+        name (str): One of ``COMMANDS``.
+        host (str): Address of the listener.
+        port (int): UDP port of the listener.
+        at (float): Simulated time from which to apply it.
+        **arguments: Arguments of the command.
+    """
+    message = {"command": name, "sent": time.time(), **arguments}
+    if at is not None:
+        message["at"] = at
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+        sender.sendto(json.dumps(message).encode("utf-8"), (host, port))
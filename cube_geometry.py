@@ -0,0 +1,126 @@
+import numpy as np
+
+# Position (x, y, z) and rotation (rx, ry, rz) in degrees of each face of the cube
+FACE_PLACEMENTS = [
+    ((0, 0, 0.5), (0, 0, 0)),       # Front
+    ((0, 0, -0.5), (0, 180, 0)),    # Back
+    ((0, 0.5, 0), (-90, 0, 0)),     # Top
+    ((0, -0.5, 0), (90, 0, 0)),     # Bottom
+    ((-0.5, 0, 0), (0, 90, 0)),     # Left
+    ((0.5, 0, 0), (0, -90, 0)),     # Right
+]
+
+# Colors for each face of the cube
+FACE_COLORS = [
+    (1, 0, 0),  # Red
+    (0, 1, 0),  # Green
+    (0, 0, 1),  # Blue
+    (1, 1, 0),  # Yellow
+    (1, 0, 1),  # Magenta
+    (0, 1, 1),  # Cyan
+]
+
+DEAD_COLOR = (1, 1, 1)  # White
+
+
+def _rotation(angle: float, axis: int) -> np.ndarray:
+    """Returns the 3x3 matrix of a rotation of ``angle`` degrees about an axis, as glRotatef."""
+    radians = np.radians(angle)
+    cos, sin = np.cos(radians), np.sin(radians)
+    i, j = [k for k in range(3) if k != axis]
+    matrix = np.eye(3)
+    matrix[i, i] = matrix[j, j] = cos
+    matrix[i, j] = -sin
+    matrix[j, i] = sin
+    if axis == 1:
+        matrix = matrix.T  # The y rotation is oriented from z to x
+    return matrix
+
+
+def face_transform(position, rotation):
+    """
+    Returns the transform applied to a face by ``CubeVisualization.draw_face``
+    (glTranslatef, then glRotatef about x, y and z).
+
+    Args:
+        position (tuple): Coordinates (x, y, z) of the face.
+        rotation (tuple): Rotation (rx, ry, rz) of the face, in degrees.
+
+    Returns:
+        tuple: (3x3 rotation matrix, translation vector).
+    """
+    rx, ry, rz = rotation
+    matrix = _rotation(rx, 0) @ _rotation(ry, 1) @ _rotation(rz, 2)
+    return matrix, np.asarray(position, dtype=float)
+
+
+def cell_quads(grid_size: int) -> np.ndarray:
+    """
+    Builds the vertices of the cell quads of the whole cube, in the same layout as
+    ``CubeVisualization.draw_face`` (cell (i, j) spans x from i * size - 0.5).
+
+    Args:
+        grid_size (int): Size of each face.
+
+    Returns:
+        np.ndarray: float32 array of shape (6 * N * N * 4, 3); face by face, cells in
+        row-major order, four vertices per cell.
+    """
+    size = 1 / grid_size
+    i, j = np.meshgrid(np.arange(grid_size), np.arange(grid_size), indexing="ij")
+    x0, y0 = i * size - 0.5, j * size - 0.5
+    corners = np.stack([
+        np.stack([x0, y0], axis=-1),
+        np.stack([x0 + size, y0], axis=-1),
+        np.stack([x0 + size, y0 + size], axis=-1),
+        np.stack([x0, y0 + size], axis=-1),
+    ], axis=2).reshape(-1, 2)
+    local = np.column_stack([corners, np.zeros(len(corners))])
+    return _place_faces(local)
+
+
+def grid_lines(grid_size: int) -> np.ndarray:
+    """
+    Builds the segments of the black cell borders of the whole cube.
+
+    Args:
+        grid_size (int): Size of each face.
+
+    Returns:
+        np.ndarray: float32 array of shape (6 * 2 * (N + 1) * 2, 3), two vertices per
+        segment, for drawing with GL_LINES.
+    """
+    ticks = np.linspace(-0.5, 0.5, grid_size + 1)
+    ends = np.full_like(ticks, -0.5), np.full_like(ticks, 0.5)
+    vertical = np.stack([np.column_stack([ticks, ends[0]]), np.column_stack([ticks, ends[1]])], axis=1)
+    horizontal = np.stack([np.column_stack([ends[0], ticks]), np.column_stack([ends[1], ticks])], axis=1)
+    segments = np.concatenate([vertical, horizontal]).reshape(-1, 2)
+    local = np.column_stack([segments, np.zeros(len(segments))])
+    return _place_faces(local)
+
+
+def _place_faces(local: np.ndarray) -> np.ndarray:
+    """Transforms face-local vertices onto each of the six faces of the cube."""
+    placed = []
+    for position, rotation in FACE_PLACEMENTS:
+        matrix, translation = face_transform(position, rotation)
+        placed.append(local @ matrix.T + translation)
+    return np.concatenate(placed).astype(np.float32)
+
+
+def cell_colors(grid, color) -> np.ndarray:
+    """
+    Builds the per-vertex colors of the cell quads of one face.
+
+    Args:
+        grid: (N, N) grid of the face.
+        color (tuple): RGB color of living cells (components from 0 to 1).
+
+    Returns:
+        np.ndarray: uint8 array of shape (N * N * 4, 3).
+    """
+    alive = np.asarray(grid, dtype=np.uint8).reshape(-1, 1) == 1
+    live = np.asarray(color) * 255
+    dead = np.asarray(DEAD_COLOR) * 255
+    colors = np.where(alive, live, dead).astype(np.uint8)
+    return np.repeat(colors, 4, axis=0)
@@ -0,0 +1,211 @@
+import numpy as np
+
+from cellular_automata import CUBE_NEIGHBORS
+from numpy_automata import NumpyCellularAutomata, apply_rule
+from rules import resolve_rule
+
+
+def build_halo_indices(grid_size: int):
+    """
+    Builds the gather map that refills the halo of a (6, N + 2, N + 2) padded cube.
+
+    Args:
+        grid_size (int): Size of each face (N).
+
+    Returns:
+        tuple: (destination, source) flat indices into the padded tensor, such that
+        ``flat[destination] = flat[source]`` copies every border row/column of the
+        neighboring faces into the halo, following ``CUBE_NEIGHBORS``.
+    """
+    side = grid_size + 2
+    interior = np.arange(1, grid_size + 1)
+    index = np.arange(6 * side * side).reshape(6, side, side)
+
+    destination = []
+    source = []
+    for face_id, neighbors in CUBE_NEIGHBORS.items():
+        destination.append(index[face_id, 0, interior])  # Top halo row
+        source.append(index[neighbors["up"], grid_size, interior])  # Last row of the upper face
+        destination.append(index[face_id, side - 1, interior])  # Bottom halo row
+        source.append(index[neighbors["down"], 1, interior])  # First row of the lower face
+        destination.append(index[face_id, interior, 0])  # Left halo column
+        source.append(index[neighbors["left"], interior, grid_size])  # Last column of the left face
+        destination.append(index[face_id, interior, side - 1])  # Right halo column
+        source.append(index[neighbors["right"], interior, 1])  # First column of the right face
+
+    return np.concatenate(destination), np.concatenate(source)
+
+
+class CubeTensor:
+    """All six faces of the cube stored as one padded (6, N + 2, N + 2) uint8 tensor."""
+
+    def __init__(self, grid_size: int):
+        """
+        Initializes an empty cube.
+
+        Args:
+            grid_size (int): Size of each face (e.g., 10 for 10x10 faces).
+        """
+        self.grid_size = grid_size
+        self.padded = np.zeros((6, grid_size + 2, grid_size + 2), dtype=np.uint8)
+        self.previous = np.zeros((6, grid_size, grid_size), dtype=np.uint8)
+        self.activity_counts = np.zeros(6, dtype=np.int64)
+        self._halo_destination, self._halo_source = build_halo_indices(grid_size)
+
+        # Face objects compatible with the CellularAutomata interface
+        self.faces = [CubeTensorFace(self, face_id) for face_id in range(6)]
+
+    @property
+    def grids(self):
+        """np.ndarray: (6, N, N) view of the interior of every face."""
+        return self.padded[:, 1:-1, 1:-1]
+
+    def fill_halo(self):
+        """Refills every border of the padded tensor from its neighboring faces with one gather."""
+        flat = self.padded.reshape(-1)
+        flat[self._halo_destination] = flat[self._halo_source]
+
+    def step(self, face_ids=None, use_stochastic_rule=False, rule=None):
+        """
+        Advances several faces in a single batched operation.
+
+        All faces advanced together read the neighbor borders as they were before the
+        step, whatever their order.
+
+        Args:
+            face_ids (list): IDs of the faces to update (all six by default).
+            use_stochastic_rule (bool or list): Use ``rule_set_2`` instead of ``rule_set_1``,
+                either for every face or per face in ``face_ids``.
+            rule (Rule, str or list): Rule from the registry in ``rules.py``, either for
+                every face or per face in ``face_ids`` (overrides ``use_stochastic_rule``).
+        """
+        self.fill_halo()
+        step_by_rule(self, face_ids, use_stochastic_rule, rule,
+                     lambda face_rule, group, rngs: apply_rule(face_rule, self.padded[group], rngs))
+
+
+def step_by_rule(cube, face_ids, use_stochastic_rule, rule, kernel):
+    """
+    Advances faces of a cube that stores them as arrays, one kernel call per group of
+    faces sharing a rule, and keeps the previous grids, activity counts and listeners
+    up to date.
+
+    Args:
+        cube: Cube with ``grids`` (faces, N, N), ``previous``, ``activity_counts`` and
+            ``faces`` (see ``CubeTensor``).
+        face_ids (list): IDs of the faces to update (all faces by default).
+        use_stochastic_rule (bool or list): As in ``CubeTensor.step``.
+        rule (Rule, str or list): As in ``CubeTensor.step``.
+        kernel (callable): ``kernel(rule, face_ids, rngs)`` returning the new
+            (len(face_ids), N, N) grids of a group from the state before the step;
+            ``rngs`` are the faces' streams, or None if a face has none.
+    """
+    face_ids = np.arange(len(cube.faces)) if face_ids is None else np.asarray(face_ids, dtype=np.intp)
+    if face_ids.size == 0:
+        return
+
+    stochastic = np.broadcast_to(np.asarray(use_stochastic_rule, dtype=bool), face_ids.shape)
+    rules = rule if isinstance(rule, (list, tuple)) else [rule] * face_ids.size
+    rules = [resolve_rule(face_rule, face_stochastic) for face_rule, face_stochastic in zip(rules, stochastic)]
+
+    # Faces sharing a rule are advanced together
+    groups = {}
+    for position, face_rule in enumerate(rules):
+        groups.setdefault(id(face_rule), (face_rule, []))[1].append(position)
+
+    grids = cube.grids[face_ids]  # Copy of the current state
+    new_grids = np.empty_like(grids)
+    for face_rule, positions in groups.values():
+        group = face_ids[positions]
+        rngs = [cube.faces[face_id].rng for face_id in group]
+        rngs = None if any(rng is None for rng in rngs) else rngs
+        new_grids[positions] = kernel(face_rule, group, rngs)
+
+    cube.activity_counts[face_ids] = np.count_nonzero(new_grids != grids, axis=(1, 2))
+    cube.previous[face_ids] = grids
+    cube.grids[face_ids] = new_grids
+
+    for position, face_id in enumerate(face_ids):
+        cube.faces[face_id]._notify("on_update", int(face_id), rules[position])
+
+
+class FaceView(NumpyCellularAutomata):
+    """
+    View of one face of a cube that owns the data of all its faces, with the
+    ``CellularAutomata`` interface. Subclasses give the arrays of the face's grid and
+    previous grid; the cube (``self.cube``) has ``activity_counts`` and a batched
+    ``step(face_ids, use_stochastic_rule, rule)``, which ``FaceStepper`` calls for
+    all the due faces of the same cube at once.
+    """
+
+    def __init__(self, cube, face_id: int):
+        """
+        Initializes the view of a face.
+
+        Args:
+            cube: Cube that owns the data.
+            face_id (int): ID of the face in the cube.
+        """
+        self.cube = cube
+        self.face_id = face_id
+        self.grid_size = cube.grid_size
+
+    def _grid_array(self) -> np.ndarray:
+        """Returns the (N, N) array of the current state of the face."""
+        raise NotImplementedError
+
+    def _previous_array(self) -> np.ndarray:
+        """Returns the (N, N) array of the previous state of the face."""
+        raise NotImplementedError
+
+    @property
+    def grid(self):
+        return self._grid_array()
+
+    @grid.setter
+    def grid(self, value):
+        self._grid_array()[...] = value
+
+    @property
+    def previous_grid(self):
+        return self._previous_array()
+
+    @previous_grid.setter
+    def previous_grid(self, value):
+        self._previous_array()[...] = value
+
+    @property
+    def activity_count(self):
+        return int(self.cube.activity_counts[self.face_id])
+
+    @activity_count.setter
+    def activity_count(self, value):
+        self.cube.activity_counts[self.face_id] = value
+
+    def update(self, face_id: int, all_faces: list, use_stochastic_rule: bool = False, rule=None):
+        """
+        Updates this face alone, reading the current state of its neighbors.
+
+        Args:
+            face_id (int): ID of the current face (must match the view).
+            all_faces (list): List of all cube faces (must be the faces of the same cube).
+            use_stochastic_rule (bool): Use ``rule_set_2`` instead of ``rule_set_1``.
+            rule (Rule or str): Rule from the registry in ``rules.py`` (overrides
+                ``use_stochastic_rule``).
+        """
+        if face_id != self.face_id or not all_faces or any(
+            getattr(face, "cube", None) is not self.cube for face in all_faces
+        ):
+            raise ValueError("CUBE_NEIGHBORS o all_faces están mal configurados.")
+
+        self.cube.step([face_id], use_stochastic_rule, rule)
+
+
+class CubeTensorFace(FaceView):
+    """View of one face of a ``CubeTensor`` with the ``CellularAutomata`` interface."""
+
+    def _grid_array(self) -> np.ndarray:
+        return self.cube.padded[self.face_id, 1:-1, 1:-1]
+
+    def _previous_array(self) -> np.ndarray:
+        return self.cube.previous[self.face_id]
@@ -3,37 +3,41 @@ from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
 
+from cube_geometry import FACE_COLORS, FACE_PLACEMENTS
+
 class CubeVisualization:
     """Class to visualize a 3D cube using PyOpenGL."""
 
-    def __init__(self, cellular_automata_list):
+    overlay = None  # Optional object whose draw() is called over the cube on every frame (see hud.py)
+
+    def __init__(self, cellular_automata_list, size=(800, 600), window=True):
         """
         Initializes the 3D visualization of the cube.
 
         Args:
             cellular_automata_list (list): List of CellularAutomata instances (one for each face).
+            size (tuple): Width and height of the image, in pixels.
+            window (bool): Open a pygame window. Without it, an OpenGL context (e.g. the
+                offscreen context of offscreen.py) must already be current.
         """
         self.cellular_automata_list = cellular_automata_list
         self.grid_size = cellular_automata_list[0].grid_size
+        self.size = tuple(size)
+        self.window = window
 
         # Colors for each face of the cube
-        self.face_colors = [
-            (1, 0, 0),  # Red
-            (0, 1, 0),  # Green
-            (0, 0, 1),  # Blue
-            (1, 1, 0),  # Yellow
-            (1, 0, 1),  # Magenta
-            (0, 1, 1),  # Cyan
-        ]
+        self.face_colors = list(FACE_COLORS)
 
         # Rotation variables
         self.rotation_x = 0
         self.rotation_y = 0
         
         # Initial configuration for PyGame and OpenGL
-        pygame.init()
-        pygame.display.set_mode((800, 600), DOUBLEBUF | OPENGL)
-        gluPerspective(45, (800 / 600), 0.1, 50.0)
+        width, height = self.size
+        if window:
+            pygame.init()
+            pygame.display.set_mode(self.size, DOUBLEBUF | OPENGL)
+        gluPerspective(45, (width / height), 0.1, 50.0)
         glTranslatef(0.0, 0.0, -4)
 
         # OpenGL configuration
@@ -86,23 +90,23 @@ class CubeVisualization:
 
     def draw_cube(self):
         """Draws the complete cube."""
-        positions_rotations = [
-            ((0, 0, 0.5), (0, 0, 0)),       # Front
-            ((0, 0, -0.5), (0, 180, 0)),    # Back
-            ((0, 0.5, 0), (-90, 0, 0)),     # Top
-            ((0, -0.5, 0), (90, 0, 0)),     # Bottom
-            ((-0.5, 0, 0), (0, 90, 0)),     # Left
-            ((0.5, 0, 0), (0, -90, 0)),     # Right
-        ]
-
-        for face_idx, (position, rotation) in enumerate(positions_rotations):
+        for face_idx, (position, rotation) in enumerate(FACE_PLACEMENTS):
             grid = self.cellular_automata_list[face_idx].grid
             color = self.face_colors[face_idx]
             self.draw_face(grid, position, rotation, color)
 
     def render(self):
         """
-        Renders the cube, applying automatic rotation.
+        Renders the cube, applying automatic rotation, and shows it in the window.
+        """
+        self.draw_frame()
+        if self.overlay is not None:
+            self.overlay.draw()
+        pygame.display.flip()
+
+    def draw_frame(self):
+        """
+        Draws one frame of the cube into the current framebuffer, advancing the rotation.
         """
         # Increment cumulative rotation
         self.rotation_x = (self.rotation_x + 0.1) % 360
@@ -115,4 +119,3 @@ class CubeVisualization:
         glRotatef(self.rotation_y, 0, 1, 0)
         self.draw_cube()
         glPopMatrix()
-        pygame.display.flip()
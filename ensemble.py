@@ -0,0 +1,303 @@
+import math
+
+import numpy as np
+
+import main
+from cube_tensor import build_halo_indices
+from numpy_automata import NumpyCellularAutomata, apply_rule
+from rules import Rule, resolve_rule
+
+# Constants of the SplitMix64 generator
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+def splitmix64(keys, counters):
+    """
+    Counter-based random numbers: the SplitMix64 output number ``counter`` of the
+    stream seeded with ``key``, for every element at once.
+
+    Args:
+        keys (np.ndarray): uint64 stream keys.
+        counters (np.ndarray): uint64 positions in the streams (broadcast with ``keys``).
+
+    Returns:
+        np.ndarray: float64 uniform numbers in [0, 1).
+    """
+    z = keys + (counters + np.uint64(1)) * _GOLDEN_GAMMA
+    z = (z ^ (z >> np.uint64(30))) * _MIX_1
+    z = (z ^ (z >> np.uint64(27))) * _MIX_2
+    z ^= z >> np.uint64(31)
+    return (z >> np.uint64(11)) * (1.0 / (1 << 53))
+
+
+_DETERMINISTIC_PARTS = {}
+
+
+def _deterministic_part(rule: Rule) -> Rule:
+    """Returns a stochastic rule without its random births (compiled once per rule)."""
+    if id(rule) not in _DETERMINISTIC_PARTS:
+        _DETERMINISTIC_PARTS[id(rule)] = (rule, Rule(rule.name, rule.table, rule.neighborhood))
+    return _DETERMINISTIC_PARTS[id(rule)][1]
+
+
+class Ensemble:
+    """
+    B independent cubes stored as one padded (B, 6, N + 2, N + 2) uint8 tensor and
+    stepped together with whole-array operations.
+
+    Each cube has its own random stream (a SplitMix64 stream keyed by its seed, so the
+    draws of every cube are generated together), its own rule switch
+    (faces whose ``activity_count`` is below the threshold use the low activity rule,
+    as in ``main.update_faces``) and its own perturbation schedule. As in
+    ``CubeTensor.step``, the faces updated together read the neighbor borders as they
+    were before the step. A cube's trajectory depends only on its own seed and
+    parameters, not on the other cubes of the batch.
+    """
+
+    def __init__(self, batch_size: int, grid_size: int, seeds=None, update_intervals=None,
+                 activity_threshold=None, rule=None, low_activity_rule=None, perturb_intensity=0,
+                 perturb_interval=None):
+        """
+        Initializes B empty cubes.
+
+        Args:
+            batch_size (int): Number of cubes (B).
+            grid_size (int): Size of each face (N).
+            seeds (list): Seed of each cube's random stream (default 0 to B - 1).
+            update_intervals (array-like): Update interval of each face, shape (6,) or
+                (B, 6) (default ``main.UPDATE_INTERVALS``).
+            activity_threshold (int or array-like): Rule switch threshold, scalar or (B,)
+                (default ``main.ACTIVITY_THRESHOLD``).
+            rule (Rule or str): Rule of active faces (default ``main.RULE``).
+            low_activity_rule (Rule or str): Rule of quiet faces (default ``main.LOW_ACTIVITY_RULE``).
+            perturb_intensity (int or array-like): Cells flipped on every face at each
+                perturbation, scalar or (B,) (0: none).
+            perturb_interval (float or array-like): Simulated seconds between
+                perturbations, scalar or (B,) (None: never).
+        """
+        seeds = range(batch_size) if seeds is None else seeds
+        if len(seeds) != batch_size:
+            raise ValueError(f"Expected {batch_size} seeds, got {len(seeds)}.")
+
+        self.batch_size = batch_size
+        self.grid_size = grid_size
+        self.seeds = list(seeds)
+        self.stream_keys = np.array(
+            [np.random.SeedSequence(seed).generate_state(1, np.uint64)[0] for seed in self.seeds], dtype=np.uint64
+        )
+        self.stream_positions = np.zeros(batch_size, dtype=np.uint64)  # Numbers drawn from each stream
+
+        self.padded = np.zeros((batch_size, 6, grid_size + 2, grid_size + 2), dtype=np.uint8)
+        self.previous = np.zeros((batch_size, 6, grid_size, grid_size), dtype=np.uint8)
+        self.activity_counts = np.zeros((batch_size, 6), dtype=np.int64)
+        self.updated = np.zeros((batch_size, 6), dtype=bool)  # Faces advanced by the last step
+        self._halo_destination, self._halo_source = build_halo_indices(grid_size)
+
+        update_intervals = main.UPDATE_INTERVALS if update_intervals is None else update_intervals
+        activity_threshold = main.ACTIVITY_THRESHOLD if activity_threshold is None else activity_threshold
+        self.update_intervals = np.broadcast_to(np.asarray(update_intervals, dtype=float), (batch_size, 6)).copy()
+        self.activity_threshold = np.broadcast_to(np.asarray(activity_threshold), (batch_size,)).copy()
+        self.rule = resolve_rule(main.RULE if rule is None else rule)
+        self.low_activity_rule = resolve_rule(main.LOW_ACTIVITY_RULE if low_activity_rule is None else low_activity_rule)
+
+        self.current_time = 0.0
+        self.last_update_times = np.zeros((batch_size, 6))
+        self.perturb_intensity = np.broadcast_to(np.asarray(perturb_intensity, dtype=np.int64), (batch_size,)).copy()
+        interval = math.inf if perturb_interval is None else perturb_interval
+        self.perturb_interval = np.broadcast_to(np.asarray(interval, dtype=float), (batch_size,)).copy()
+        self.perturb_interval[self.perturb_intensity <= 0] = math.inf
+        self.next_perturbation = self.perturb_interval.copy()
+
+    @property
+    def grids(self):
+        """np.ndarray: (B, 6, N, N) view of the interior of every face."""
+        return self.padded[..., 1:-1, 1:-1]
+
+    @property
+    def onsets(self):
+        """np.ndarray: (B, 6, N, N) bool mask of the cells born (0 -> 1) by the last step."""
+        return (self.grids > self.previous) & self.updated[:, :, None, None]
+
+    @property
+    def live_cells(self):
+        """np.ndarray: (B, 6) number of living cells of each face."""
+        return np.count_nonzero(self.grids, axis=(2, 3))
+
+    def randomize(self, density: float = 0.5):
+        """
+        Fills every face with random cells, from each cube's own stream.
+
+        Args:
+            density (float): Probability of a cell being alive.
+        """
+        cubes = np.arange(self.batch_size)
+        self.grids[...] = self._random(cubes, 6 * self.grid_size ** 2).reshape(self.grids.shape) < density
+
+    def _random(self, cubes, count) -> np.ndarray:
+        """
+        Draws ``count`` numbers from the stream of each of ``cubes``.
+
+        Args:
+            cubes (np.ndarray): Sorted cube indices; the draws of a repeated cube follow
+                each other in its stream.
+            count (int or np.ndarray): Numbers drawn per entry of ``cubes``.
+
+        Returns:
+            np.ndarray: Flat float64 array of the draws, entry after entry.
+        """
+        first = np.searchsorted(cubes, cubes)  # First entry of the same cube
+        if np.ndim(count) == 0:
+            # Same count for every entry: one (entries, count) block
+            offsets = ((np.arange(cubes.size) - first) * count)[:, None] + np.arange(count)
+            positions = self.stream_positions[cubes][:, None] + offsets.astype(np.uint64)
+            self.stream_positions += np.bincount(cubes, minlength=self.batch_size).astype(np.uint64) * np.uint64(count)
+            return splitmix64(self.stream_keys[cubes][:, None], positions).reshape(-1)
+
+        counts = np.asarray(count, dtype=np.int64)
+        starts = np.cumsum(counts) - counts  # First draw of each entry in the output
+        entries = np.repeat(np.arange(cubes.size), counts)
+
+        # Position in the cube's stream: numbers drawn before, then earlier entries of the cube
+        offsets = np.arange(entries.size) - starts[first][entries]
+        positions = self.stream_positions[cubes[entries]] + offsets.astype(np.uint64)
+        self.stream_positions += np.bincount(cubes, weights=counts, minlength=self.batch_size).astype(np.uint64)
+        return splitmix64(self.stream_keys[cubes[entries]], positions)
+
+    def fill_halo(self):
+        """Refills the borders of every cube from its neighboring faces with one gather."""
+        flat = self.padded.reshape(self.batch_size, -1)
+        flat[:, self._halo_destination] = flat[:, self._halo_source]
+
+    def step(self, due=None) -> np.ndarray:
+        """
+        Advances the due faces of every cube in one batched operation.
+
+        Args:
+            due (np.ndarray): (B, 6) or (6,) bool mask of the faces to update (all by default).
+
+        Returns:
+            np.ndarray: (B, 6) bool mask of the updated faces.
+        """
+        due = np.ones((self.batch_size, 6), dtype=bool) if due is None else np.asarray(due, dtype=bool)
+        due = np.broadcast_to(due, (self.batch_size, 6))
+        cubes, faces = np.nonzero(due)  # Faces of each cube in face order
+
+        self.fill_halo()
+        padded = self.padded[cubes, faces]  # Copy of the current state with its halo
+        grids = padded[:, 1:-1, 1:-1]
+        new_grids = np.empty_like(grids)
+
+        quiet = self.activity_counts[cubes, faces] < self.activity_threshold[cubes]
+        for rule, selected in ((self.rule, ~quiet), (self.low_activity_rule, quiet)):
+            if selected.any():
+                new_grids[selected] = self._apply_rule(rule, padded[selected], cubes[selected])
+
+        self.activity_counts[cubes, faces] = np.count_nonzero(new_grids != grids, axis=(1, 2))
+        self.previous[cubes, faces] = grids
+        self.grids[cubes, faces] = new_grids
+        self.updated = due.copy()
+        return self.updated
+
+    def _apply_rule(self, rule, padded, cubes):
+        """Applies a rule to K padded faces, drawing the stochastic births from each cube's stream."""
+        if rule.birth_chance is None:
+            return apply_rule(rule, padded)
+
+        # The deterministic part of the rule, then the births of the stochastic part
+        new_grid = apply_rule(_deterministic_part(rule), padded)
+        alive = padded[:, 1:-1, 1:-1] == 1
+        below = np.zeros_like(alive)
+        below[:, :-1, :] = alive[:, 1:, :]  # Cell below, 0 on the last row
+
+        draws = self._random(cubes, alive[0].size).reshape(alive.shape)
+        new_grid[~alive & below & (draws < rule.birth_chance)] = 1
+        return new_grid
+
+    def perturb(self, intensity, cubes=None):
+        """
+        Flips ``intensity`` random cells on every face of some cubes, as
+        ``CellularAutomata.perturb`` does, drawing the cells from each cube's stream.
+
+        Args:
+            intensity (int or array-like): Cells flipped per face, scalar or one per cube.
+            cubes (array-like): Indices of the cubes to perturb (all by default).
+        """
+        cubes = np.arange(self.batch_size) if cubes is None else np.asarray(cubes, dtype=np.intp)
+        intensity = np.broadcast_to(np.asarray(intensity, dtype=np.int64), cubes.shape)
+        order = np.argsort(cubes, kind="stable")
+        cubes, intensity = cubes[order], intensity[order]
+
+        # Row and column of each flipped cell, face after face
+        cells = np.floor(self._random(cubes, 12 * intensity) * self.grid_size).astype(np.intp).reshape(-1, 2)
+        cell_cubes = np.repeat(cubes, 6 * intensity)
+        cell_faces = np.concatenate([np.repeat(np.arange(6), count) for count in intensity.tolist()] or [[]])
+        # A cell drawn twice is flipped twice, as with successive flips
+        np.bitwise_xor.at(self.grids, (cell_cubes, cell_faces.astype(np.intp), cells[:, 0], cells[:, 1]), 1)
+
+    def next_update_time(self) -> float:
+        """Returns the earliest time at which a face of any cube is due (see ``SimulatedClock``)."""
+        next_time = float((self.last_update_times + self.update_intervals).min())
+        while not (next_time - self.last_update_times >= self.update_intervals).any():
+            next_time = math.nextafter(next_time, math.inf)
+        return next_time
+
+    def advance(self) -> np.ndarray:
+        """
+        Jumps to the next time a face is due, updates the due faces of every cube with
+        the cadence of ``main.update_faces``, then applies the perturbations scheduled
+        up to that time.
+
+        Returns:
+            np.ndarray: (B, 6) bool mask of the updated faces.
+        """
+        self.current_time = self.next_update_time()
+        due = self.current_time - self.last_update_times >= self.update_intervals
+        self.last_update_times[due] = self.current_time
+        self.step(due)
+
+        perturbed = np.flatnonzero(self.next_perturbation <= self.current_time)
+        if perturbed.size:
+            self.perturb(self.perturb_intensity[perturbed], perturbed)
+            self.next_perturbation[perturbed] += self.perturb_interval[perturbed]
+        return due
+
+    def run(self, until: float, on_step=None) -> int:
+        """
+        Advances every cube up to a simulated time.
+
+        Args:
+            until (float): Simulated time at which to stop (updates after it are not run).
+            on_step (callable): Optional ``on_step(ensemble, due)`` called after each step.
+
+        Returns:
+            int: Number of steps run.
+        """
+        steps = 0
+        while self.next_update_time() <= until:
+            due = self.advance()
+            steps += 1
+            if on_step is not None:
+                on_step(self, due)
+        return steps
+
+    def cube_faces(self, cube: int) -> list:
+        """
+        Copies one cube into six ``NumpyCellularAutomata`` faces, e.g. to render or
+        sonify it.
+
+        Args:
+            cube (int): Index of the cube.
+
+        Returns:
+            list: The six faces, with the ``CellularAutomata`` interface.
+        """
+        faces = []
+        for face_id in range(6):
+            face = NumpyCellularAutomata(self.grid_size)
+            face.grid = self.grids[cube, face_id].copy()
+            face.previous_grid = self.previous[cube, face_id].copy()
+            face.activity_count = int(self.activity_counts[cube, face_id])
+            faces.append(face)
+        return faces
@@ -0,0 +1,70 @@
+"""
+On-screen overlay of the instrumentation statistics, drawn over the cube.
+"""
+import time
+
+import pygame
+from OpenGL.GL import *
+
+from instrumentation import format_hud, metrics
+
+
+class HudOverlay:
+    """Text overlay with the rolling percentiles of every timer, refreshed a few times per second."""
+
+    def __init__(self, instrumentation=metrics, visible: bool = False, refresh_interval: float = 0.5,
+                 font_size: int = 14):
+        """
+        Initializes the overlay (after the OpenGL window is created).
+
+        Args:
+            instrumentation (Instrumentation): Statistics to show.
+            visible (bool): Whether the overlay is drawn at first.
+            refresh_interval (float): Seconds between redraws of the text, so the
+                overlay costs little on the frames in between.
+            font_size (int): Size of the font, in pixels.
+        """
+        self.instrumentation = instrumentation
+        self.visible = visible
+        self.refresh_interval = refresh_interval
+        pygame.font.init()
+        self.font = pygame.font.SysFont("monospace", font_size)
+        self._pixels = None
+        self._size = (0, 0)
+        self._refreshed = 0.0
+
+    def toggle(self):
+        """Shows or hides the overlay."""
+        self.visible = not self.visible
+        self._refreshed = 0.0
+
+    def refresh(self):
+        """Renders the current statistics to the RGBA pixels drawn by ``draw``."""
+        lines = format_hud(self.instrumentation.snapshot())
+        line_height = self.font.get_linesize()
+        width = max(self.font.size(line)[0] for line in lines) + 8
+        surface = pygame.Surface((width, line_height * len(lines) + 8), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 160))
+        for index, line in enumerate(lines):
+            surface.blit(self.font.render(line, True, (255, 255, 255)), (4, 4 + index * line_height))
+        self._pixels = pygame.image.tostring(surface, "RGBA", True)  # Flipped: OpenGL rows go upwards
+        self._size = surface.get_size()
+
+    def draw(self):
+        """Draws the overlay in the top left corner of the window (before the buffers are flipped)."""
+        if not self.visible:
+            return
+        now = time.perf_counter()
+        if self._pixels is None or now - self._refreshed >= self.refresh_interval:
+            self.refresh()
+            self._refreshed = now
+
+        width, height = self._size
+        window_height = pygame.display.get_surface().get_height()
+        glPushAttrib(GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT)
+        glDisable(GL_DEPTH_TEST)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glWindowPos2d(0, window_height - height)
+        glDrawPixels(width, height, GL_RGBA, GL_UNSIGNED_BYTE, self._pixels)
+        glPopAttrib()
@@ -0,0 +1,368 @@
+"""
+Low-overhead timers and counters for the hot paths, with rolling percentiles.
+
+The module-level ``metrics`` is disabled by default: its timers are then a shared
+no-op context manager, so the instrumented code costs a method call. ``main.main``
+enables it and exposes it three ways: the HUD overlay (see hud.py), JSON lines
+written periodically by ``JsonLinesReporter`` and a profiler toggled with a key
+(``ProfilerToggle``).
+"""
+import collections
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_WINDOW = 1024  # Samples kept by each timer for its percentiles
+
+
+class RollingStats:
+    """Durations of the last ``window`` calls of a code path, in a ring buffer."""
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        """
+        Initializes empty statistics.
+
+        Args:
+            window (int): Number of samples kept for the percentiles.
+        """
+        self.window = window
+        self.samples = [0.0] * window
+        self.count = 0  # Samples ever added
+        self.total = 0.0
+
+    def add(self, seconds: float):
+        self.samples[self.count % self.window] = seconds
+        self.count += 1
+        self.total += seconds
+
+    def summary(self) -> dict:
+        """
+        Returns the rolling percentiles of the kept samples.
+
+        Returns:
+            dict: Call count, mean, p50, p95, p99 and max in milliseconds.
+        """
+        kept = np.array(self.samples[:min(self.count, self.window)]) * 1e3
+        if kept.size == 0:
+            return {"count": 0, "mean_ms": None, "p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+        p50, p95, p99 = np.percentile(kept, [50, 95, 99])
+        return {
+            "count": self.count,
+            "mean_ms": float(kept.mean()),
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+            "max_ms": float(kept.max()),
+        }
+
+
+class _Timer:
+    """Context manager adding the duration of its block to a ``RollingStats``."""
+
+    __slots__ = ("stats", "start")
+
+    def __init__(self, stats: RollingStats):
+        self.stats = stats
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.add(time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    """Timer of disabled instrumentation."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Instrumentation:
+    """Named timers and counters of the running system."""
+
+    def __init__(self, enabled: bool = False, window: int = DEFAULT_WINDOW):
+        """
+        Initializes the instrumentation.
+
+        Args:
+            enabled (bool): Whether timers and counters record anything.
+            window (int): Number of samples kept by each timer.
+        """
+        self.enabled = enabled
+        self.window = window
+        self.timers = {}
+        self.counters = collections.Counter()
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def _stats(self, name: str) -> RollingStats:
+        stats = self.timers.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self.timers.setdefault(name, RollingStats(self.window))
+        return stats
+
+    def timer(self, name: str):
+        """
+        Returns a context manager timing its block under ``name``.
+
+        Each name should be timed from one thread at a time (e.g. one name per face).
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self._stats(name))
+
+    def record(self, name: str, seconds: float):
+        """Adds a duration measured elsewhere to the timer ``name``."""
+        if self.enabled:
+            self._stats(name).add(seconds)
+
+    def count(self, name: str, amount: int = 1):
+        """Adds ``amount`` to the counter ``name``."""
+        if self.enabled:
+            self.counters[name] += amount
+
+    def instrument(self, obj, method: str, name: str = None):
+        """
+        Times every call of a method of one object, by shadowing it with a wrapper on
+        the instance.
+
+        Args:
+            obj: Object whose method is timed (e.g. a face or a MIDI port).
+            method (str): Name of the method.
+            name (str): Name of the timer (default the method name).
+        """
+        function = getattr(obj, method)
+        name = method if name is None else name
+
+        def timed(*args, **kwargs):
+            if not self.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._stats(name).add(time.perf_counter() - start)
+
+        timed.__wrapped__ = function
+        setattr(obj, method, timed)
+
+    def reset(self):
+        """Drops every sample and counter."""
+        with self._lock:
+            self.timers = {}
+            self.counters = collections.Counter()
+            self._started = time.perf_counter()
+
+    def snapshot(self) -> dict:
+        """
+        Returns the current statistics.
+
+        Returns:
+            dict: Wall-clock timestamp, seconds since the start or last reset, timer
+            summaries and counters.
+        """
+        with self._lock:
+            timers = dict(self.timers)
+        return {
+            "time": time.time(),
+            "uptime": time.perf_counter() - self._started,
+            "timers": {name: stats.summary() for name, stats in sorted(timers.items())},
+            "counters": dict(self.counters),
+        }
+
+
+metrics = Instrumentation()
+
+
+def format_hud(snapshot: dict) -> list:
+    """
+    Formats a snapshot as the text lines of the HUD.
+
+    Args:
+        snapshot (dict): Result of ``Instrumentation.snapshot``.
+
+    Returns:
+        list: One line per timer (p50/p95/p99 in milliseconds and calls per second),
+        then the counters.
+    """
+    uptime = max(snapshot["uptime"], 1e-9)
+    lines = [f"{'':<28}{'p50':>8}{'p95':>8}{'p99':>8}{'calls/s':>9}"]
+    for name, summary in snapshot["timers"].items():
+        if summary["count"]:
+            lines.append(
+                f"{name:<28}{summary['p50_ms']:8.2f}{summary['p95_ms']:8.2f}{summary['p99_ms']:8.2f}"
+                f"{summary['count'] / uptime:9.1f}"
+            )
+    for name, value in sorted(snapshot["counters"].items()):
+        lines.append(f"{name:<28}{value:>33}")
+    return lines
+
+
+class JsonLinesReporter:
+    """Appends a snapshot of the instrumentation to a file every ``interval`` seconds, on its own thread."""
+
+    def __init__(self, instrumentation: Instrumentation, path: str, interval: float = 1.0):
+        """
+        Initializes the reporter.
+
+        Args:
+            instrumentation (Instrumentation): Statistics to report.
+            path (str): Path of the JSON-lines file (appended to).
+            interval (float): Seconds between lines.
+        """
+        self.instrumentation = instrumentation
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="liquiprism-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the thread, writing a last line."""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def write(self, file):
+        file.write(json.dumps(self.instrumentation.snapshot()) + "\n")
+        file.flush()
+
+    def _run(self):
+        with open(self.path, "a") as file:
+            while not self._stop_event.wait(self.interval):
+                self.write(file)
+            self.write(file)
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of every other thread every ``interval`` seconds and counts the
+    stacks, so the simulation and MIDI threads are profiled too (cProfile only sees
+    the thread that enabled it).
+    """
+
+    def __init__(self, interval: float = 0.005):
+        """
+        Initializes the profiler.
+
+        Args:
+            interval (float): Seconds between samples.
+        """
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="liquiprism-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop_event.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def save(self, path: str):
+        """Writes the stacks in the folded format read by flame graph tools ("a;b;c count")."""
+        with open(path, "w") as file:
+            for stack, samples in self.stacks.most_common():
+                file.write(f"{stack} {samples}\n")
+
+
+class ProfilerToggle:
+    """Starts and stops a profiler, e.g. from a key, saving each profile to a file."""
+
+    MODES = ("sampling", "cprofile")
+
+    def __init__(self, mode: str = "sampling", path: str = "liquiprism-profile"):
+        """
+        Initializes the toggle.
+
+        Args:
+            mode (str): "sampling" (every thread, folded stacks in ``<path>.folded``) or
+                "cprofile" (the toggling thread, pstats in ``<path>.prof``).
+            path (str): Path of the profiles, without extension.
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown profiler mode '{mode}'. Available modes: {', '.join(self.MODES)}.")
+        self.mode = mode
+        self.path = path
+        self._profiler = None
+
+    @property
+    def running(self) -> bool:
+        return self._profiler is not None
+
+    def toggle(self) -> str:
+        """
+        Starts the profiler, or stops it and saves the profile.
+
+        Returns:
+            str: Message describing what happened.
+        """
+        if self._profiler is None:
+            if self.mode == "cprofile":
+                self._profiler = cProfile.Profile()
+                self._profiler.enable()
+            else:
+                self._profiler = SamplingProfiler()
+                self._profiler.start()
+            return f"Profiling ({self.mode})..."
+
+        profiler, self._profiler = self._profiler, None
+        if self.mode == "cprofile":
+            profiler.disable()
+            path = self.path + ".prof"
+            profiler.dump_stats(path)
+        else:
+            profiler.stop()
+            path = self.path + ".folded"
+            profiler.save(path)
+        return f"Profile saved to {path}"
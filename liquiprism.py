@@ -0,0 +1,368 @@
+"""
+Command line interface of Liquiprism.
+
+Usage:
+    python -m liquiprism run
+    python -m liquiprism simulate --grid-size 256 --engine numpy --steps 600
+    python -m liquiprism simulate --steps 600 --record session.lqp
+    python -m liquiprism replay session.lqp --speed 4
+    python -m liquiprism serve --port 8765 --grid-size 64 --engine numpy --control-port 9000
+    python -m liquiprism control perturb face=2 intensity=8 --port 9000
+    python -m liquiprism render session.mid --duration 3600 --seed 1
+    python -m liquiprism video session.mp4 --duration 60 --fps 30 --size 1280 720
+    python -m liquiprism sweep --output results/sweep --grid-size 5 8 --seeds 0 1 2
+    python -m liquiprism bench --output bench.json
+"""
+import argparse
+import json
+import sys
+import time
+
+import main
+import simulation
+
+
+def _run_interactive(args):
+    main.main()
+
+
+def _run_simulate(args):
+    summary = simulation.run(
+        grid_size=args.grid_size,
+        engine=args.engine,
+        seed=args.seed,
+        steps=args.steps,
+        duration=args.duration,
+        update_intervals=args.intervals,
+        activity_threshold=args.threshold,
+        rule=args.rule,
+        low_activity_rule=args.low_activity_rule,
+        record=args.record,
+        update_mode=args.update_mode,
+        threads=args.threads,
+    )
+
+    if args.json:
+        print(json.dumps(summary))
+        return
+
+    print(f"Engine: {summary['engine']}, grid {summary['grid_size']}x{summary['grid_size']}, seed {summary['seed']}, "
+          f"{summary['update_mode']} updates")
+    print(f"Ticks: {summary['ticks']}, face updates: {summary['face_updates']}, "
+          f"simulated time: {summary['simulated_time']:.1f} s, wall time: {summary['wall_time']:.3f} s")
+    print(f"Steps/sec: {summary['steps_per_sec']:.1f}")
+    print(f"Cells/sec: {summary['cells_per_sec']:.3e}")
+    if args.record:
+        print(f"Recorded to {args.record} ({summary['record_bytes']} bytes)")
+
+
+def _run_replay(args):
+    import pygame
+
+    from cube_visualization import CubeVisualization
+    from recording import LogPlayer
+
+    with LogPlayer(args.log) as player:
+        start = player.step_at_time(args.start) if args.start is not None else 0
+        faces = player.faces_at(start)
+        visualization = CubeVisualization(faces)
+        sonification = None
+        if args.midi:
+            from sonification import Sonification
+            sonification = Sonification(midi_port_name=main.MIDI_PORT, midi_channels=main.MIDI_CHANNELS)
+        try:
+            player.play(visualization, sonification, start=start, speed=args.speed)
+        except KeyboardInterrupt:
+            print("Replay stopped by user.")
+        finally:
+            if sonification is not None:
+                sonification.close()
+            pygame.quit()
+
+
+def _run_serve(args):
+    from broadcast import BroadcastServer
+    from control import ControlPlane, UdpListener
+    from scheduler import Scheduler
+
+    faces = simulation.create_faces(args.grid_size, args.engine, args.seed)
+    for face in faces:
+        face.randomize()
+    control = ControlPlane()
+    scheduler = Scheduler(faces, control=control)
+    server = BroadcastServer(faces, args.host, args.port, queue_size=args.queue_size,
+                             keyframe_interval=args.keyframe_interval, clock=lambda: scheduler.simulated_time)
+    server.start()
+    print(f"Broadcasting a {args.grid_size}x{args.grid_size} cube on {args.host}:{server.port}. "
+          f"Press Ctrl + C to exit.")
+    listener = None
+    if args.control_port is not None:
+        listener = UdpListener(control, args.host, args.control_port)
+        listener.start()
+        print(f"Listening for commands on UDP {args.host}:{listener.port}.")
+    try:
+        with scheduler:
+            while scheduler.running:
+                time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("Server stopped by user.")
+    finally:
+        server.stop()
+        if listener is not None:
+            listener.stop()
+        if control.applied_commands:
+            effect = control.latency()["effect"]
+            print(f"{control.applied_commands} command(s), effect latency p50 {effect['p50_ms']:.2f} ms, "
+                  f"p99 {effect['p99_ms']:.2f} ms")
+
+
+def _run_control(args):
+    import control
+
+    arguments = {}
+    for assignment in args.arguments:
+        key, separator, value = assignment.partition("=")
+        if not separator:
+            raise SystemExit(f"Arguments are key=value, got '{assignment}'.")
+        try:
+            arguments[key] = json.loads(value)
+        except json.JSONDecodeError:
+            arguments[key] = value  # Plain strings, e.g. rule=B3/S23
+    try:
+        control.Command(args.name, arguments)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    control.send_command(args.name, args.host, args.port, at=args.at, **arguments)
+
+
+def _run_render(args):
+    import offline_render
+
+    summary = offline_render.render_file(
+        args.output,
+        args.duration,
+        grid_size=args.grid_size,
+        engine=args.engine,
+        seed=args.seed,
+        update_intervals=args.intervals,
+        midi_interval=args.midi_interval,
+        note_duration=args.note_duration,
+        scale=args.scale,
+    )
+    print(f"Rendered {summary['duration']:.1f} s of music ({summary['messages']} MIDI messages, "
+          f"{summary['face_updates']} face updates) to {summary['path']} in {summary['wall_time']:.2f} s")
+
+
+def _run_video(args):
+    import offscreen
+
+    summary = offscreen.render_video(
+        args.output,
+        duration=args.duration,
+        fps=args.fps,
+        size=args.size,
+        log=args.log,
+        start=args.start,
+        grid_size=args.grid_size,
+        engine=args.engine,
+        seed=args.seed,
+        renderer=args.renderer,
+        backend=args.backend,
+        realtime=args.realtime,
+    )
+    print(f"Rendered {summary['frames']} frames ({summary['duration']:.1f} s) to {summary['output']} "
+          f"in {summary['wall_time']:.2f} s ({summary['speed']:.1f}x real time)")
+
+
+def _run_sweep(args):
+    import sweep
+
+    parameters = {
+        "grid_size": args.grid_size,
+        "activity_threshold": args.threshold,
+        "update_intervals": [[float(value) for value in intervals.split()] for intervals in args.intervals],
+        "perturb_intensity": args.perturb_intensity,
+        "perturb_interval": args.perturb_interval,
+        "rule": args.rule,
+        "low_activity_rule": args.low_activity_rule,
+        "engine": args.engine,
+        "duration": args.duration,
+    }
+    for intervals in parameters["update_intervals"]:
+        if len(intervals) != 6:
+            raise SystemExit(f"--intervals needs 6 values per set, got {len(intervals)}.")
+    runs = sweep.parameter_grid(parameters, args.seeds)
+
+    def report(run_id, run_parameters, statistics):
+        print(f"{run_id}: activity {statistics['mean_activity']:.1f}, MIDI {statistics['midi_rate']:.2f} notes/s, "
+              f"quiescence {statistics['quiescence_time']}, cycle {statistics['cycle_length']}")
+
+    executed = sweep.run_sweep(runs, args.output, workers=args.workers, on_result=report)
+    print(f"{executed} run(s) executed, {len(runs) - executed} already in {args.output}.csv")
+
+
+def _run_bench(args):
+    import benchmarks
+
+    report = benchmarks.run_benchmarks(
+        sizes=args.sizes, engines=args.engines, rules=args.rules, min_time=args.min_time, only=args.only
+    )
+    print(benchmarks.format_report(report))
+    if args.output:
+        benchmarks.save_report(report, args.output)
+        print(f"Report written to {args.output}")
+
+    if args.compare:
+        comparison = benchmarks.compare(benchmarks.load_report(args.compare), report, args.tolerance)
+        regressions = [case for case in comparison if case["regression"]]
+        for case in regressions:
+            print(f"Regression: {case['name']} {case['engine']} {case['rule']} {case['grid_size']}: "
+                  f"{case['baseline_s'] * 1e3:.3f} ms -> {case['current_s'] * 1e3:.3f} ms (x{case['ratio']:.2f})")
+        print(f"{len(regressions)} regression(s) in {len(comparison)} compared case(s).")
+        if regressions:
+            sys.exit(1)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Builds the argument parser with one subcommand per mode."""
+    parser = argparse.ArgumentParser(prog="liquiprism", description="Liquiprism cellular automata cube.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    interactive = subcommands.add_parser("run", help="Run the interactive system (window and MIDI).")
+    interactive.set_defaults(handler=_run_interactive)
+
+    simulate = subcommands.add_parser(
+        "simulate", help="Advance the cube headless (no pygame, OpenGL or MIDI) and report throughput."
+    )
+    limit = simulate.add_mutually_exclusive_group()
+    limit.add_argument("--steps", type=int, help="Number of face updates to run (default 1000).")
+    limit.add_argument("--duration", type=float, help="Wall-clock time to run, in seconds.")
+    simulate.add_argument("--grid-size", type=int, default=main.GRID_SIZE, help="Size of each face.")
+    simulate.add_argument("--engine", default="list",
+                          choices=list(simulation.FACE_ENGINES), help="Stepping engine.")
+    simulate.add_argument("--rule", default=main.RULE, help="Rule of active faces (name or 'B4/S23').")
+    simulate.add_argument("--low-activity-rule", default=main.LOW_ACTIVITY_RULE,
+                          help="Rule of faces below the activity threshold.")
+    simulate.add_argument("--threshold", type=int, default=main.ACTIVITY_THRESHOLD,
+                          help="Activity threshold for switching rules.")
+    simulate.add_argument("--intervals", type=float, nargs=6, default=main.UPDATE_INTERVALS,
+                          metavar="SECONDS", help="Update interval of each face.")
+    simulate.add_argument("--seed", type=int, help="Seed of the initial state and stochastic rule.")
+    simulate.add_argument("--update-mode", default=main.UPDATE_MODE, choices=["sequential", "synchronous"],
+                          help="Whether faces due on the same tick see each other's new state (sequential) "
+                               "or the state before the tick (synchronous).")
+    simulate.add_argument("--threads", type=int, default=main.UPDATE_THREADS,
+                          help="Threads stepping the faces due together (synchronous mode).")
+    simulate.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+    simulate.add_argument("--record", metavar="LOG", help="Record the run to a log for replay.")
+    simulate.set_defaults(handler=_run_simulate)
+
+    replay = subcommands.add_parser("replay", help="Play a recorded log in the window, without running the rules.")
+    replay.add_argument("log", help="Log written by --record or main.RECORD_PATH.")
+    replay.add_argument("--start", type=float, help="Recorded time to start from, in seconds.")
+    replay.add_argument("--speed", type=float, default=1.0, help="Playback speed.")
+    replay.add_argument("--midi", action="store_true", help="Also send the notes to main.MIDI_PORT.")
+    replay.set_defaults(handler=_run_replay)
+
+    serve = subcommands.add_parser("serve", help="Run the simulation headless and stream it to viewers over TCP.")
+    serve.add_argument("--host", default="127.0.0.1", help="Address to listen on.")
+    serve.add_argument("--port", type=int, default=8765, help="TCP port.")
+    serve.add_argument("--grid-size", type=int, default=main.GRID_SIZE, help="Size of each face.")
+    serve.add_argument("--engine", default="numpy", choices=list(simulation.FACE_ENGINES), help="Stepping engine.")
+    serve.add_argument("--seed", type=int, help="Seed of the initial state and stochastic rule.")
+    serve.add_argument("--queue-size", type=int, default=64, help="Frames queued per viewer before it is resynced.")
+    serve.add_argument("--keyframe-interval", type=float, default=5.0, help="Seconds between keyframes.")
+    serve.add_argument("--control-port", type=int, help="UDP port receiving commands (see the control subcommand).")
+    serve.set_defaults(handler=_run_serve)
+
+    control = subcommands.add_parser("control", help="Send a command to a running cube with a control port.")
+    control.add_argument("name", help="Command: perturb, rule, interval, threshold or mapping.")
+    control.add_argument("arguments", nargs="*", help="Arguments as key=value (values parsed as JSON when possible).")
+    control.add_argument("--host", default="127.0.0.1", help="Address of the cube.")
+    control.add_argument("--port", type=int, default=9000, help="UDP control port.")
+    control.add_argument("--at", type=float, help="Simulated time from which to apply the command.")
+    control.set_defaults(handler=_run_control)
+
+    render = subcommands.add_parser(
+        "render", help="Render the sonification to a MIDI file on a simulated clock (no MIDI port needed)."
+    )
+    render.add_argument("output", help="Path of the MIDI file.")
+    render.add_argument("--duration", type=float, default=60.0, help="Length of the music, in seconds.")
+    render.add_argument("--grid-size", type=int, default=main.GRID_SIZE, help="Size of each face.")
+    render.add_argument("--engine", default="list", choices=list(simulation.FACE_ENGINES), help="Stepping engine.")
+    render.add_argument("--intervals", type=float, nargs=6, default=main.UPDATE_INTERVALS,
+                        metavar="SECONDS", help="Update interval of each face.")
+    render.add_argument("--midi-interval", type=float, default=main.MIDI_EVENT_INTERVAL,
+                        help="Interval between MIDI scans, in seconds.")
+    render.add_argument("--note-duration", type=float, default=main.NOTE_DURATION, help="Length of each note.")
+    render.add_argument("--scale", default=main.SCALE, help="Scale of the pitches.")
+    render.add_argument("--seed", type=int, help="Seed of the initial state and stochastic rule.")
+    render.set_defaults(handler=_run_render)
+
+    video = subcommands.add_parser(
+        "video", help="Render a simulation or a log to a video or PNG sequence, without a window."
+    )
+    video.add_argument("output", help="Video path (encoded by ffmpeg) or PNG pattern such as frames/frame_%%06d.png.")
+    video.add_argument("--duration", type=float, help="Seconds to render (default 60, or the rest of the log).")
+    video.add_argument("--fps", type=float, default=30.0, help="Frame rate.")
+    video.add_argument("--size", type=int, nargs=2, default=[1280, 720], metavar=("WIDTH", "HEIGHT"),
+                       help="Resolution of the frames.")
+    video.add_argument("--log", help="Log to render instead of a new simulation.")
+    video.add_argument("--start", type=float, default=0.0, help="Recorded time of the first frame of the log.")
+    video.add_argument("--grid-size", type=int, default=main.GRID_SIZE, help="Size of each face.")
+    video.add_argument("--engine", default="numpy", choices=list(simulation.FACE_ENGINES), help="Stepping engine.")
+    video.add_argument("--seed", type=int, help="Seed of the initial state and stochastic rule.")
+    video.add_argument("--renderer", default="vbo", choices=["vbo", "immediate"], help="Cube renderer.")
+    video.add_argument("--backend", default="egl", choices=["egl", "osmesa"], help="Windowless OpenGL context.")
+    video.add_argument("--realtime", action="store_true", help="Pace the frames to the wall clock.")
+    video.set_defaults(handler=_run_video)
+
+    sweep = subcommands.add_parser(
+        "sweep", help="Run every combination of parameters and seeds headless over a process pool (resumable)."
+    )
+    sweep.add_argument("--output", required=True, help="Path prefix of the results (.csv and _series/).")
+    sweep.add_argument("--grid-size", type=int, nargs="+", default=[main.GRID_SIZE], help="Face sizes.")
+    sweep.add_argument("--threshold", type=int, nargs="+", default=[main.ACTIVITY_THRESHOLD],
+                       help="Activity thresholds.")
+    sweep.add_argument("--intervals", nargs="+", default=[" ".join(str(value) for value in main.UPDATE_INTERVALS)],
+                       metavar="'S S S S S S'", help="Sets of 6 update intervals, each one quoted.")
+    sweep.add_argument("--perturb-intensity", type=int, nargs="+", default=[0],
+                       help="Cells flipped per face at each perturbation.")
+    sweep.add_argument("--perturb-interval", type=float, nargs="+", default=[30.0],
+                       help="Simulated seconds between perturbations.")
+    sweep.add_argument("--rule", nargs="+", default=[main.RULE], help="Rules of active faces.")
+    sweep.add_argument("--low-activity-rule", nargs="+", default=[main.LOW_ACTIVITY_RULE],
+                       help="Rules of faces below the activity threshold.")
+    sweep.add_argument("--engine", nargs="+", default=["numpy"], choices=list(simulation.FACE_ENGINES),
+                       help="Stepping engines.")
+    sweep.add_argument("--duration", type=float, nargs="+", default=[300.0], help="Simulated seconds per run.")
+    sweep.add_argument("--seeds", type=int, nargs="+", default=[0], help="Seeds run for every combination.")
+    sweep.add_argument("--workers", type=int, help="Worker processes (default all cores).")
+    sweep.set_defaults(handler=_run_sweep)
+
+    bench = subcommands.add_parser("bench", help="Benchmark the hot paths and write a JSON report.")
+    bench.add_argument("--sizes", type=int, nargs="+", help="Grid sizes (default 5 32 128 512 2048).")
+    bench.add_argument("--engines", nargs="+", choices=list(simulation.FACE_ENGINES), help="Engines to benchmark.")
+    bench.add_argument("--rules", nargs="+", help="Rules for the update benchmark (default rule_set_1 rule_set_2).")
+    bench.add_argument("--only", nargs="+", choices=["update", "ensemble_step", "get_neighbors", "generate_all_midi_events",
+                                                    "draw_cube", "midi_jitter"],
+                       help="Benchmarks to run (default all).")
+    bench.add_argument("--min-time", type=float, default=0.2, help="Minimum measured time per case, in seconds.")
+    bench.add_argument("--output", help="Path of the JSON report.")
+    bench.add_argument("--compare", metavar="BASELINE", help="JSON report to compare against; exits 1 on regressions.")
+    bench.add_argument("--tolerance", type=float, default=0.1, help="Relative slowdown counted as a regression.")
+    bench.set_defaults(handler=_run_bench)
+
+    return parser
+
+
+def cli(argv=None):
+    """Parses the command line and runs the chosen subcommand."""
+    args = build_parser().parse_args(argv)
+    if args.command == "simulate" and args.steps is None and args.duration is None:
+        args.steps = 1000
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    cli(sys.argv[1:])
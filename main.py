@@ -1,19 +1,39 @@
-from cellular_automata import CellularAutomata
-from cube_visualization import CubeVisualization
-from sonification import Sonification
-import pygame
-from pygame.locals import *
-from OpenGL.GL import *
-from OpenGL.GLU import *
+from cellular_automata import CellularAutomata, seed_faces
 import time
 
+# pygame, OpenGL and mido are imported where they are used, so the simulation
+# can be imported and run headless (see simulation.py)
+
 # Global configuration
 MIDI_PORT = "MIDI_OUT 1"  # Virtual MIDI port created with loopMIDI
 MIDI_CHANNELS = [0, 1, 2, 3, 4, 5]  # MIDI channels for the cube faces
 GRID_SIZE = 5  # Size of each grid (5x5)
 UPDATE_INTERVALS = [0.5, 1, 1.5, 2, 2.5, 3]  # Independent update speeds for each face
 ACTIVITY_THRESHOLD = 10  # Threshold for switching between rule sets
+RULE = "rule_set_1"  # Rule used while the face is active (name or "B4/S23" string, see rules.py)
+LOW_ACTIVITY_RULE = "rule_set_2"  # Rule used when the activity falls below ACTIVITY_THRESHOLD
 MIDI_EVENT_INTERVAL = 0.2  # Minimum interval between MIDI events
+NOTE_DURATION = 0.25  # Length of each note in seconds
+MAX_VOICES = 8  # Maximum number of sounding notes per MIDI channel
+SCALE = "chromatic"  # Scale of the pitches (see note_mapping.SCALES); cell (x, y) plays degree x + y from C4
+TRANSPOSITIONS = [0, 0, 0, 0, 0, 0]  # Semitones added to the pitches of each face
+NOTE_PRIORITY = "row_major"  # Onsets played first when a face has too many (see note_mapping.PRIORITIES)
+SIMULATION_TIMESTEP = 0.05  # Duration of a simulation tick; face intervals are rounded to whole ticks
+MAX_CATCH_UP = 5  # Late ticks run back to back before the simulation clock skips ahead
+FRAME_RATE = 60  # Maximum frames per second of the visualization
+SEED = None  # Master seed of the per-face random streams, to replay a session exactly (None: unseeded)
+RECORD_PATH = None  # Path of a log to record the session to (replay with: python -m liquiprism replay PATH)
+UPDATE_MODE = "sequential"  # "sequential" (faces due together update in order) or "synchronous" (see stepping.py)
+UPDATE_THREADS = 0  # Threads stepping the faces due together (synchronous mode only; 0: main simulation thread)
+RENDERER = "immediate"  # "immediate" (glBegin/glEnd per cell) or "vbo" (vertex buffers, see vbo_visualization.py)
+INSTRUMENTATION = True  # Time the hot paths (see instrumentation.py); key 'H' shows the timings over the cube
+SHOW_HUD = False  # Show the timings from the start
+METRICS_PATH = None  # JSON-lines file the timings are appended to every METRICS_INTERVAL seconds (None: off)
+METRICS_INTERVAL = 1.0  # Seconds between lines of METRICS_PATH
+PROFILE_MODE = "sampling"  # Profiler toggled with F9: "sampling" (every thread) or "cprofile" (main thread)
+PROFILE_PATH = "liquiprism-profile"  # Path of the saved profiles, without extension
+BROADCAST_PORT = None  # TCP port streaming the cube to remote viewers (see broadcast.py; None: off)
+CONTROL_PORT = None  # UDP port receiving perturbation and parameter commands (see control.py; None: off)
 
 def initialize_system():
     """
@@ -22,40 +42,94 @@ def initialize_system():
     - 3D visualization
     - MIDI sonification
     """
+    from sonification import Sonification
+    if RENDERER == "vbo":
+        from vbo_visualization import VBOCubeVisualization as CubeVisualization
+    elif RENDERER == "immediate":
+        from cube_visualization import CubeVisualization
+    else:
+        raise ValueError(f"Unknown renderer '{RENDERER}'. Use 'immediate' or 'vbo'.")
+
     faces = [CellularAutomata(grid_size=GRID_SIZE) for _ in range(6)]
+    if SEED is not None:
+        seed_faces(faces, SEED)
     for face in faces:
         face.randomize()
 
     visualization = CubeVisualization(faces)
-    sonification = Sonification(midi_port_name=MIDI_PORT, midi_channels=MIDI_CHANNELS)
+    sonification = Sonification(midi_port_name=MIDI_PORT, midi_channels=MIDI_CHANNELS,
+                                note_duration=NOTE_DURATION, max_voices=MAX_VOICES, scale=SCALE,
+                                transpositions=TRANSPOSITIONS, priority=NOTE_PRIORITY)
 
     return faces, visualization, sonification
 
-def handle_events(faces):
+def handle_events(faces, scheduler=None, key_actions=None, control=None):
     """
     Handles user input events:
     - Detects quit events
     - Detects perturbation trigger (key 'P')
+    - Calls the function of any other key in ``key_actions`` (key -> function)
+
+    If a scheduler is given, the perturbation runs on its simulation thread; if a
+    control plane is given, it is sent as a "perturb" command.
     """
+    import pygame
+
     events = pygame.event.get()
     for event in events:
         if event.type == pygame.QUIT:
             return False  # Signal to stop the system
         if event.type == pygame.KEYDOWN and event.key == pygame.K_p:
             print("Shake!")
-            for face in faces:
-                face.perturb(intensity=5)  # Perturb all faces
+            if control is not None:
+                control.send("perturb", intensity=5)
+            elif scheduler is not None:
+                scheduler.submit(lambda: perturb_faces(faces))
+            else:
+                perturb_faces(faces)
+        elif event.type == pygame.KEYDOWN and key_actions and event.key in key_actions:
+            key_actions[event.key]()
     return True
 
-def update_faces(faces, last_update_times, current_time):
+def perturb_faces(faces, intensity=5):
+    """Perturbs all faces."""
+    for face in faces:
+        face.perturb(intensity=intensity)
+
+def update_faces(faces, last_update_times, current_time, update_intervals=None, activity_threshold=None,
+                 rule=None, low_activity_rule=None, stepper=None):
     """
     Updates the state of the cube faces based on their individual timers and rules.
+
+    The optional arguments override the global configuration. Without a ``stepper``
+    (see stepping.py), due faces update in order, each one seeing the faces updated
+    before it on the same tick.
+
+    Returns:
+        int: Number of faces updated.
     """
+    update_intervals = UPDATE_INTERVALS if update_intervals is None else update_intervals
+    activity_threshold = ACTIVITY_THRESHOLD if activity_threshold is None else activity_threshold
+    rule = RULE if rule is None else rule
+    low_activity_rule = LOW_ACTIVITY_RULE if low_activity_rule is None else low_activity_rule
+
+    if stepper is not None:
+        due = [face_id for face_id in range(len(faces))
+               if current_time - last_update_times[face_id] >= update_intervals[face_id]]
+        for face_id in due:
+            last_update_times[face_id] = current_time  # Reset the timer for the face
+        rules = [low_activity_rule if faces[face_id].activity_count < activity_threshold else rule for face_id in due]
+        stepper.step(due, rules)
+        return len(due)
+
+    updated = 0
     for face_id, face in enumerate(faces):
-        if current_time - last_update_times[face_id] >= UPDATE_INTERVALS[face_id]:
+        if current_time - last_update_times[face_id] >= update_intervals[face_id]:
             last_update_times[face_id] = current_time  # Reset the timer for the face
-            use_stochastic_rule = face.activity_count < ACTIVITY_THRESHOLD
-            face.update(face_id, faces, use_stochastic_rule)
+            face_rule = low_activity_rule if face.activity_count < activity_threshold else rule
+            face.update(face_id, faces, rule=face_rule)
+            updated += 1
+    return updated
 
 def generate_midi_events(sonification, faces, last_midi_time, current_time):
     """
@@ -66,39 +140,110 @@ def generate_midi_events(sonification, faces, last_midi_time, current_time):
         return current_time
     return last_midi_time
 
+def instrument_system(faces, visualization, sonification):
+    """
+    Times the per-call hot paths of the running system with ``instrumentation.metrics``:
+    the update of each face, the MIDI scans and sends and the frames. ``handle_events``
+    is timed by ``main`` and ``update_faces`` by the scheduler.
+    """
+    from instrumentation import metrics
+
+    for face_id, face in enumerate(faces):
+        metrics.instrument(face, "update", f"update[{face_id}]")
+    metrics.instrument(sonification, "generate_all_midi_events")
+    metrics.instrument(sonification.output_port, "send", "midi_send")  # Shared with the MIDI scheduler
+    metrics.instrument(visualization, "render")
+
 def main():
     """
     Main entry point of the Liquiprism system.
+
+    The simulation and the MIDI output run on their own threads (see scheduler.py);
+    this thread handles the window events and renders the latest snapshot of the
+    faces at up to FRAME_RATE frames per second.
     """
+    import pygame
+    from control import ControlPlane
+    from instrumentation import JsonLinesReporter, ProfilerToggle, metrics
+    from scheduler import Scheduler, wait_for_next_frame
+    from stepping import FaceStepper
+
     faces, visualization, sonification = initialize_system()
-    last_update_times = [time.time()] * len(faces)
-    last_midi_time = time.time()
+    metrics.enabled = INSTRUMENTATION
+    key_actions = {}
+    reporter = None
+    if INSTRUMENTATION:
+        from hud import HudOverlay
+        instrument_system(faces, visualization, sonification)
+        visualization.overlay = HudOverlay(metrics, visible=SHOW_HUD)
+        key_actions[pygame.K_h] = visualization.overlay.toggle
+        if METRICS_PATH is not None:
+            reporter = JsonLinesReporter(metrics, METRICS_PATH, METRICS_INTERVAL)
+            reporter.start()
+    profiler = ProfilerToggle(PROFILE_MODE, PROFILE_PATH)
+    key_actions[pygame.K_F9] = lambda: print(profiler.toggle())
+    stepper = FaceStepper(faces, UPDATE_MODE, UPDATE_THREADS)
+    control = ControlPlane(sonification)
+    scheduler = Scheduler(faces, sonification, stepper=stepper, control=control)
+    broadcast = None
+    if BROADCAST_PORT is not None:
+        from broadcast import BroadcastServer
+        broadcast = BroadcastServer(faces, port=BROADCAST_PORT, clock=lambda: scheduler.simulated_time)
+        broadcast.start()
+    listener = None
+    if CONTROL_PORT is not None:
+        from control import UdpListener
+        listener = UdpListener(control, port=CONTROL_PORT)
+        listener.start()
+    recorder = None
+    if RECORD_PATH is not None:
+        from recording import LogRecorder
+        recorder = LogRecorder(faces, RECORD_PATH, metadata={"grid_size": GRID_SIZE, "rule": RULE})
+    frame_interval = 1 / FRAME_RATE
 
     try:
         print("System started. Press Ctrl + C to exit.")
+        scheduler.start()
 
         running = True
-        while running:
-            current_time = time.time()
-
+        next_frame = time.perf_counter()
+        while running and scheduler.running:
             # 1. Process user input events
-            running = handle_events(faces)
-
-            # 2. Update the state of the faces
-            update_faces(faces, last_update_times, current_time)
+            with metrics.timer("handle_events"):
+                running = handle_events(faces, scheduler, key_actions, control)
 
-            # 3. Generate MIDI events
-            last_midi_time = generate_midi_events(sonification, faces, last_midi_time, current_time)
-
-            # 4. Render the visualization
+            # 2. Render the latest snapshot of the faces
+            visualization.cellular_automata_list = list(scheduler.latest_snapshot().faces)
             visualization.render()
 
+            # 3. Sleep until the next frame is due
+            next_frame = wait_for_next_frame(next_frame, frame_interval)
+
     except KeyboardInterrupt:
         print("System stopped by user.")
     finally:
-        sonification.close()
-        pygame.quit()
-        print("Resources released. Goodbye.")
+        try:
+            scheduler.stop()
+        finally:
+            stepper.close()
+            if broadcast is not None:
+                broadcast.stop()
+            if listener is not None:
+                listener.stop()
+            if profiler.running:
+                print(profiler.toggle())
+            if reporter is not None:
+                reporter.stop()
+            if recorder is not None:
+                recorder.close()
+            if sonification.scheduler is not None:
+                jitter = sonification.scheduler.jitter()
+                if jitter["events"]:
+                    print(f"MIDI timing: {jitter['events']} events, p99 lateness {jitter['p99_ms']:.2f} ms, "
+                          f"max {jitter['max_ms']:.2f} ms")
+            sonification.close()
+            pygame.quit()
+            print("Resources released. Goodbye.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,222 @@
+import heapq
+import itertools
+import statistics
+import threading
+import time
+from collections import OrderedDict, deque
+
+from mido import Message
+
+# Order of events due at the same time: note-offs first, so they free their voices
+NOTE_OFF = 0
+NOTE_ON = 1
+
+
+class MidiScheduler:
+    """
+    Sends MIDI notes at exact times from a priority queue.
+
+    Each note is queued as a note-on and a note-off event ordered by due time. A
+    dispatch thread sleeps until the earliest event is due and sends every event due
+    at that instant as one batch. The number of sounding notes per channel is limited
+    to ``max_voices`` (the oldest note is cut when a new one starts on a full channel),
+    and a pitch already sounding on a channel is extended instead of retriggered.
+
+    The lateness of every event (send time minus due time) is recorded, and
+    ``jitter`` summarizes it.
+    """
+
+    def __init__(self, output_port, max_voices: int = 8, clock=time.perf_counter, threaded: bool = True,
+                 jitter_window: int = 10000):
+        """
+        Initializes the scheduler.
+
+        Args:
+            output_port: Open MIDI output port (any object with ``send``).
+            max_voices (int): Maximum number of sounding notes per channel.
+            clock (callable): Time source in seconds.
+            threaded (bool): Start a dispatch thread. If False, events are only sent by
+                calling ``dispatch`` (e.g. with a simulated clock).
+            jitter_window (int): Number of recent events kept for ``jitter``.
+        """
+        if max_voices < 1:
+            raise ValueError("max_voices must be at least 1.")
+
+        self.output_port = output_port
+        self.max_voices = max_voices
+        self.clock = clock
+
+        self._queue = []  # Heap of (due time, kind, sequence, channel, note, velocity, voice token)
+        self._sequence = itertools.count()
+        self._voices = {}  # channel -> OrderedDict(note -> voice token), oldest first
+        self._condition = threading.Condition()
+        self._lateness = deque(maxlen=jitter_window)
+        self._closed = False
+
+        self.sent = 0
+        self.batches = 0
+        self.stolen = 0
+        self.deduplicated = 0
+
+        self._thread = None
+        if threaded:
+            self._thread = threading.Thread(target=self._run, name="liquiprism-midi-out", daemon=True)
+            self._thread.start()
+
+    def play(self, channel: int, note: int, velocity: int, duration: float, start: float = None):
+        """
+        Schedules a note.
+
+        Args:
+            channel (int): MIDI channel.
+            note (int): MIDI pitch.
+            velocity (int): Note-on velocity.
+            duration (float): Note length in seconds.
+            start (float): Time of the note-on on ``clock`` (default now).
+        """
+        self.play_many([(channel, note)], velocity, duration, start)
+
+    def play_many(self, notes, velocity: int, duration: float, start: float = None):
+        """
+        Schedules several notes starting at the same time, so they are sent as one batch.
+
+        Args:
+            notes (iterable): (channel, note) pairs.
+            velocity (int): Note-on velocity.
+            duration (float): Note length in seconds.
+            start (float): Time of the note-ons on ``clock`` (default now).
+        """
+        if duration < 0:
+            raise ValueError("The note duration cannot be negative.")
+
+        start = self.clock() if start is None else start
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The MIDI scheduler is closed.")
+            for channel, note in notes:
+                token = next(self._sequence)
+                heapq.heappush(self._queue, (start, NOTE_ON, token, channel, note, velocity, token))
+                heapq.heappush(self._queue, (start + duration, NOTE_OFF, token, channel, note, 0, token))
+            self._condition.notify()
+
+    @property
+    def pending(self) -> int:
+        """int: Number of queued events."""
+        with self._condition:
+            return len(self._queue)
+
+    def next_due_time(self):
+        """Returns the due time of the earliest queued event, or None if the queue is empty."""
+        with self._condition:
+            return self._queue[0][0] if self._queue else None
+
+    def dispatch(self, now: float = None) -> int:
+        """
+        Sends the events due at ``now``.
+
+        Args:
+            now (float): Current time on ``clock`` (default ``clock()``).
+
+        Returns:
+            int: Number of messages sent.
+        """
+        now = self.clock() if now is None else now
+        with self._condition:
+            due = []
+            while self._queue and self._queue[0][0] <= now:
+                due.append(heapq.heappop(self._queue))
+        return self._send_batch(due, now)
+
+    def jitter(self) -> dict:
+        """
+        Summarizes the lateness of the recent events.
+
+        Returns:
+            dict: Number of events and mean, median, 99th percentile and maximum
+            lateness in milliseconds (None without events).
+        """
+        lateness = sorted(self._lateness)
+        if not lateness:
+            return {"events": 0, "mean_ms": None, "p50_ms": None, "p99_ms": None, "max_ms": None}
+        return {
+            "events": len(lateness),
+            "mean_ms": statistics.fmean(lateness) * 1e3,
+            "p50_ms": lateness[len(lateness) // 2] * 1e3,
+            "p99_ms": lateness[min(len(lateness) - 1, int(len(lateness) * 0.99))] * 1e3,
+            "max_ms": lateness[-1] * 1e3,
+        }
+
+    def close(self):
+        """Stops the dispatch thread, drops the queued notes and silences the sounding ones."""
+        with self._condition:
+            self._closed = True
+            self._queue.clear()
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        for channel, voices in self._voices.items():
+            for note in voices:
+                self._send(Message("note_off", channel=channel, note=note, velocity=0))
+        self._voices.clear()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if not self._queue:
+                        self._condition.wait()
+                        continue
+                    delay = self._queue[0][0] - self.clock()
+                    if delay <= 0:
+                        break
+                    self._condition.wait(delay)
+                if self._closed:
+                    return
+                now = self.clock()
+                due = []
+                while self._queue and self._queue[0][0] <= now:
+                    due.append(heapq.heappop(self._queue))
+            self._send_batch(due, None)
+
+    def _send_batch(self, events: list, now) -> int:
+        """Applies voice management to due events and sends the resulting messages back to back."""
+        if not events:
+            return 0
+
+        messages = []
+        for due_time, kind, _, channel, note, velocity, token in events:
+            voices = self._voices.setdefault(channel, OrderedDict())
+            if kind == NOTE_OFF:
+                if voices.get(note) == token:  # Otherwise the voice was stolen or extended
+                    del voices[note]
+                    messages.append((due_time, Message("note_off", channel=channel, note=note, velocity=0)))
+                continue
+
+            if note in voices:
+                # Same pitch already sounding: keep it and let this note's note-off end it
+                voices[note] = token
+                voices.move_to_end(note)
+                self.deduplicated += 1
+                continue
+            if len(voices) >= self.max_voices:
+                oldest, _ = voices.popitem(last=False)
+                messages.append((due_time, Message("note_off", channel=channel, note=oldest, velocity=0)))
+                self.stolen += 1
+            voices[note] = token
+            messages.append((due_time, Message("note_on", channel=channel, note=note, velocity=velocity)))
+
+        for due_time, message in messages:
+            self._send(message)
+            sent_time = self.clock() if now is None else now
+            self._lateness.append(max(0.0, sent_time - due_time))
+        self.batches += 1
+        return len(messages)
+
+    def _send(self, message):
+        try:
+            self.output_port.send(message)
+            self.sent += 1
+        except Exception as e:
+            print(f"Error sending MIDI message: {e}")
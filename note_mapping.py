@@ -0,0 +1,130 @@
+import numpy as np
+
+# Semitone offsets of each scale within an octave
+SCALES = {
+    "chromatic": [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11],
+    "major": [0, 2, 4, 5, 7, 9, 11],
+    "minor": [0, 2, 3, 5, 7, 8, 10],
+    "pentatonic": [0, 2, 4, 7, 9],
+    "whole_tone": [0, 2, 4, 6, 8, 10],
+}
+
+
+def _row_major(grid_size: int) -> np.ndarray:
+    return -np.arange(grid_size * grid_size, dtype=float).reshape(grid_size, grid_size)
+
+
+def _low_pitch(grid_size: int) -> np.ndarray:
+    return -np.add.outer(np.arange(grid_size), np.arange(grid_size)).astype(float)
+
+
+def _high_pitch(grid_size: int) -> np.ndarray:
+    return -_low_pitch(grid_size)
+
+
+def _center(grid_size: int) -> np.ndarray:
+    center = (grid_size - 1) / 2
+    offsets = np.arange(grid_size) - center
+    return -np.add.outer(offsets ** 2, offsets ** 2)
+
+
+# Priority of each cell of a face when more onsets than ``max_notes`` happen at once
+# (higher plays first; ties are broken in row-major order)
+PRIORITIES = {
+    "row_major": _row_major,  # First cells of the grid, as the original list scan
+    "low_pitch": _low_pitch,
+    "high_pitch": _high_pitch,
+    "center": _center,  # Cells closest to the center of the face
+}
+
+
+def register_scale(name: str, steps):
+    """
+    Adds a scale to ``SCALES``.
+
+    Args:
+        name (str): Name of the scale.
+        steps (list): Semitone offsets within an octave, starting at 0.
+    """
+    steps = [int(step) for step in steps]
+    if not steps or steps[0] != 0 or any(b <= a for a, b in zip(steps, steps[1:])) or steps[-1] >= 12:
+        raise ValueError(f"Scale '{name}' must be increasing semitone offsets from 0 to 11.")
+    SCALES[name] = steps
+
+
+def pitch_lookup(degrees: int, scale: str = "chromatic", base_note: int = 60, transpose: int = 0) -> np.ndarray:
+    """
+    Builds the pitch of each scale degree. A cell (x, y) plays degree x + y, so the
+    chromatic scale from C4 gives the original mapping ``60 + x + y``.
+
+    Args:
+        degrees (int): Number of degrees (2 * grid_size - 1 covers a face).
+        scale (str): Name of the scale in ``SCALES``.
+        base_note (int): MIDI pitch of degree 0.
+        transpose (int): Semitones added to every pitch.
+
+    Returns:
+        np.ndarray: int array of MIDI pitches, clipped to 0-127.
+    """
+    if scale not in SCALES:
+        raise ValueError(f"Unknown scale '{scale}'. Available scales: {', '.join(SCALES)}.")
+
+    steps = np.asarray(SCALES[scale])
+    octaves, positions = np.divmod(np.arange(degrees), len(steps))
+    return np.clip(base_note + transpose + 12 * octaves + steps[positions], 0, 127)
+
+
+def cell_priorities(grid_size: int, priority="row_major") -> np.ndarray:
+    """
+    Returns the (N, N) priority of each cell.
+
+    Args:
+        grid_size (int): Size of the face.
+        priority (str or array-like): Name in ``PRIORITIES`` or an (N, N) array.
+    """
+    if isinstance(priority, str):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'. Available priorities: {', '.join(PRIORITIES)}.")
+        return PRIORITIES[priority](grid_size)
+
+    priority = np.asarray(priority, dtype=float)
+    if priority.shape != (grid_size, grid_size):
+        raise ValueError(f"The priority array must have shape {(grid_size, grid_size)}, got {priority.shape}.")
+    return priority
+
+
+def select_onsets(previous_grid, grid, max_cells: int = None, priorities=None) -> list:
+    """
+    Finds the cells that changed from OFF to ON and keeps the ``max_cells`` with the
+    highest priority, without sorting all of them.
+
+    Args:
+        previous_grid: (N, N) grid of 0/1 values before the step.
+        grid: (N, N) grid of 0/1 values after the step.
+        max_cells (int): Maximum number of cells returned (all if None).
+        priorities (np.ndarray): (N, N) priority of each cell (row-major order if None).
+
+    Returns:
+        list: (x, y) cells, highest priority first.
+    """
+    grid = np.asarray(grid)
+    onsets = np.flatnonzero(grid > np.asarray(previous_grid))  # 0 -> 1
+
+    if priorities is None:
+        onsets = onsets[:max_cells]  # Already in row-major order
+    else:
+        scores = np.asarray(priorities).ravel()[onsets]
+        if max_cells is not None and len(onsets) > max_cells:
+            if max_cells <= 0:
+                onsets, scores = onsets[:0], scores[:0]
+            else:
+                # Everything above the k-th best score, then the first ties in row-major order
+                threshold = np.partition(scores, len(scores) - max_cells)[len(scores) - max_cells]
+                above = scores > threshold
+                ties = np.flatnonzero(scores == threshold)[: max_cells - np.count_nonzero(above)]
+                kept = np.sort(np.concatenate([np.flatnonzero(above), ties]))
+                onsets, scores = onsets[kept], scores[kept]
+        onsets = onsets[np.lexsort((onsets, -scores))]
+
+    rows, columns = np.divmod(onsets, grid.shape[1])
+    return list(zip(rows.tolist(), columns.tolist()))
@@ -0,0 +1,210 @@
+import random
+
+import numpy as np
+
+from cellular_automata import CUBE_NEIGHBORS, CellularAutomata
+from rules import resolve_rule
+
+
+def count_neighbors(padded):
+    """
+    Counts live neighbors for every cell of one or more padded faces.
+
+    The outer ring of ``padded`` holds the cross-face halo: the row/column of the
+    adjacent face that touches each border. Halo cells are only counted as
+    orthogonal neighbors, so border cells never see diagonal neighbors across
+    faces (the halo corners are ignored entirely), matching
+    ``CellularAutomata._get_neighbors``.
+
+    Args:
+        padded (np.ndarray): Array of shape (..., N + 2, N + 2).
+
+    Returns:
+        np.ndarray: uint8 array of shape (..., N, N) with the neighbor counts.
+    """
+    padded = padded.astype(np.uint8, copy=False)
+    grid = padded[..., 1:-1, 1:-1]
+
+    # Orthogonal neighbors, including the halo
+    counts = padded[..., :-2, 1:-1] + padded[..., 2:, 1:-1]
+    counts += padded[..., 1:-1, :-2]
+    counts += padded[..., 1:-1, 2:]
+
+    # Diagonal neighbors, restricted to the face itself
+    counts[..., 1:, 1:] += grid[..., :-1, :-1]
+    counts[..., 1:, :-1] += grid[..., :-1, 1:]
+    counts[..., :-1, 1:] += grid[..., 1:, :-1]
+    counts[..., :-1, :-1] += grid[..., 1:, 1:]
+    return counts
+
+
+def face_halo(face_id, all_faces):
+    """
+    Returns the cross-face neighbors of the four borders of a face.
+
+    Args:
+        face_id (int): ID of the face.
+        all_faces (list): List of all cube faces.
+
+    Returns:
+        dict: uint8 arrays keyed by "up" (last row of the upper face), "down" (first
+        row of the lower face), "left" (last column of the left face) and "right"
+        (first column of the right face).
+    """
+    if face_id not in CUBE_NEIGHBORS or not all_faces:
+        raise ValueError("CUBE_NEIGHBORS o all_faces están mal configurados.")
+
+    neighbors = CUBE_NEIGHBORS[face_id]
+    return {
+        "up": np.asarray(all_faces[neighbors["up"]].grid, dtype=np.uint8)[-1],
+        "down": np.asarray(all_faces[neighbors["down"]].grid, dtype=np.uint8)[0],
+        "left": np.asarray(all_faces[neighbors["left"]].grid, dtype=np.uint8)[:, -1],
+        "right": np.asarray(all_faces[neighbors["right"]].grid, dtype=np.uint8)[:, 0],
+    }
+
+
+def pad_face(grid, face_id, all_faces):
+    """
+    Builds the padded array of a face, filling the halo from its neighboring faces.
+
+    Args:
+        grid (np.ndarray): (N, N) grid of the face.
+        face_id (int): ID of the face.
+        all_faces (list): List of all cube faces.
+
+    Returns:
+        np.ndarray: uint8 array of shape (N + 2, N + 2).
+    """
+    halo = face_halo(face_id, all_faces)
+    padded = np.zeros((grid.shape[0] + 2, grid.shape[1] + 2), dtype=np.uint8)
+    padded[1:-1, 1:-1] = grid
+    padded[0, 1:-1] = halo["up"]
+    padded[-1, 1:-1] = halo["down"]
+    padded[1:-1, 0] = halo["left"]
+    padded[1:-1, -1] = halo["right"]
+    return padded
+
+
+def pack_neighborhoods(padded):
+    """
+    Packs the 3x3 neighborhood of every cell into the index used by neighborhood rules.
+
+    Bit (dx + 1) * 3 + (dy + 1) holds the cell at offset (dx, dy). As in
+    ``count_neighbors``, halo cells only appear in the orthogonal positions.
+
+    Args:
+        padded (np.ndarray): Array of shape (..., N + 2, N + 2).
+
+    Returns:
+        np.ndarray: uint16 array of shape (..., N, N).
+    """
+    padded = padded.astype(np.uint16)
+    grid = padded[..., 1:-1, 1:-1]
+
+    index = grid << 4
+    index |= padded[..., :-2, 1:-1] << 1  # Up
+    index |= padded[..., 1:-1, :-2] << 3  # Left
+    index |= padded[..., 1:-1, 2:] << 5  # Right
+    index |= padded[..., 2:, 1:-1] << 7  # Down
+
+    index[..., 1:, 1:] |= grid[..., :-1, :-1]  # Up-left
+    index[..., 1:, :-1] |= grid[..., :-1, 1:] << 2  # Up-right
+    index[..., :-1, 1:] |= grid[..., 1:, :-1] << 6  # Down-left
+    index[..., :-1, :-1] |= grid[..., 1:, 1:] << 8  # Down-right
+    return index
+
+
+def apply_rule(rule, padded, rngs=None, draws=None):
+    """
+    Applies a compiled rule to one or more padded faces with table lookups.
+
+    For stochastic rules with ``rngs``, each face draws all its random numbers from its
+    own stream in one call. Without them, random numbers are drawn from the global
+    ``random`` module only for dead cells whose lower neighbor is alive, in row-major
+    order, exactly as the per-cell engine does. Either way both engines produce the
+    same grids from the same seed.
+
+    Args:
+        rule (Rule): Compiled rule (see ``rules.py``).
+        padded (np.ndarray): Array of shape (..., N + 2, N + 2).
+        rngs (list): Optional ``numpy.random.Generator`` of each face, in the order of
+            the flattened leading dimensions of ``padded``.
+        draws (np.ndarray): Optional uniform numbers already drawn, shaped like the
+            output (used instead of ``rngs``).
+
+    Returns:
+        np.ndarray: uint8 array of shape (..., N, N) with the new states.
+    """
+    grid = padded[..., 1:-1, 1:-1]
+    if rule.neighborhood:
+        new_grid = rule.table[pack_neighborhoods(padded)]
+    else:
+        new_grid = rule.table[grid, count_neighbors(padded)]
+
+    if rule.birth_chance is not None:
+        alive = grid == 1
+        below = np.zeros_like(alive)
+        below[..., :-1, :] = alive[..., 1:, :]  # Cell below, 0 on the last row
+        if rngs is not None or draws is not None:
+            if draws is None:
+                face_shape = grid.shape[-2:]
+                draws = np.stack([rng.random(face_shape) for rng in rngs]).reshape(grid.shape)
+            new_grid[~alive & below & (draws < rule.birth_chance)] = 1
+        else:
+            candidates = np.flatnonzero(~alive & below)
+            draws = np.array([random.random() for _ in range(candidates.size)])
+            new_grid.flat[candidates[draws < rule.birth_chance]] = 1
+    return new_grid
+
+
+class NumpyCellularAutomata(CellularAutomata):
+    """Cellular automaton face stored as a uint8 NumPy array and stepped with whole-array operations."""
+
+    def __init__(self, grid_size: int):
+        """
+        Initializes an empty cellular automaton grid.
+
+        Args:
+            grid_size (int): Grid size (e.g., 10 for a 10x10 grid).
+        """
+        self.grid_size = grid_size
+        self.grid = np.zeros((grid_size, grid_size), dtype=np.uint8)
+        self.previous_grid = np.zeros((grid_size, grid_size), dtype=np.uint8)
+        self.activity_count = 0  # Counter for state changes per iteration
+
+    def randomize(self):
+        """Fills the grid with random values (0 or 1), drawing the same sequence as the list engine."""
+        if self.rng is not None:
+            self.grid = self.rng.integers(0, 2, size=(self.grid_size, self.grid_size)).astype(np.uint8)
+            return
+        super().randomize()
+        self.grid = np.array(self.grid, dtype=np.uint8)
+
+    def update(self, face_id: int, all_faces: list, use_stochastic_rule: bool = False, rule=None):
+        """
+        Updates the grid according to the rules, considering the connections with other faces.
+
+        Args:
+            face_id (int): ID of the current face.
+            all_faces (list): List of all cube faces.
+            use_stochastic_rule (bool): Use ``rule_set_2`` instead of ``rule_set_1``.
+            rule (Rule or str): Rule from the registry in ``rules.py`` (overrides
+                ``use_stochastic_rule``).
+        """
+        rule = resolve_rule(rule, use_stochastic_rule)
+        grid = np.asarray(self.grid, dtype=np.uint8)
+        new_grid = apply_rule(rule, pad_face(grid, face_id, all_faces), None if self.rng is None else [self.rng])
+
+        self.activity_count = int(np.count_nonzero(new_grid != grid))
+
+        # The new grid is a fresh array, so the current one becomes the previous state
+        self.previous_grid = grid
+        self.grid = new_grid
+        self._notify("on_update", face_id, rule)
+
+    def _write_cells(self, xs: np.ndarray, ys: np.ndarray, mode: str):
+        grid = self.grid
+        if mode == "flip":
+            grid[xs, ys] ^= 1
+        else:
+            grid[xs, ys] = mode == "set"
@@ -0,0 +1,165 @@
+import math
+import time
+
+from mido import MetaMessage, MidiFile, MidiTrack, bpm2tempo, second2tick
+
+import main
+import simulation
+
+
+class MidiFilePort:
+    """
+    Stand-in MIDI output port that timestamps the messages it receives with a clock
+    and writes them to a Standard MIDI File.
+    """
+
+    def __init__(self, clock, ticks_per_beat: int = 480, bpm: float = 120):
+        """
+        Initializes the port.
+
+        Args:
+            clock (callable): Time source in seconds (e.g. a simulated clock).
+            ticks_per_beat (int): Resolution of the MIDI file.
+            bpm (float): Tempo of the MIDI file; only changes how seconds map to ticks.
+        """
+        self.clock = clock
+        self.ticks_per_beat = ticks_per_beat
+        self.tempo = bpm2tempo(bpm)
+        self.messages = []  # (time in seconds, message)
+
+    def send(self, message):
+        self.messages.append((self.clock(), message))
+
+    def close(self):
+        pass
+
+    def to_midi_file(self, end: float = None) -> MidiFile:
+        """
+        Builds a type 1 MIDI file with a tempo track and one track per MIDI channel.
+
+        Delta times are computed from the absolute tick of each message, so rounding
+        to ticks does not accumulate over long renders.
+
+        Args:
+            end (float): Time of the end of the tracks in seconds (default the last message).
+        """
+        end_tick = 0 if end is None else round(second2tick(end, self.ticks_per_beat, self.tempo))
+        midi_file = MidiFile(type=1, ticks_per_beat=self.ticks_per_beat)
+        tempo_track = MidiTrack()
+        tempo_track.append(MetaMessage("set_tempo", tempo=self.tempo, time=0))
+        tempo_track.append(MetaMessage("end_of_track", time=end_tick))
+        midi_file.tracks.append(tempo_track)
+
+        channels = sorted({message.channel for _, message in self.messages})
+        for channel in channels:
+            track = MidiTrack()
+            track.append(MetaMessage("track_name", name=f"Face channel {channel}", time=0))
+            last_tick = 0
+            for seconds, message in self.messages:
+                if message.channel != channel:
+                    continue
+                tick = round(second2tick(seconds, self.ticks_per_beat, self.tempo))
+                track.append(message.copy(time=tick - last_tick))
+                last_tick = tick
+            track.append(MetaMessage("end_of_track", time=max(0, end_tick - last_tick)))
+            midi_file.tracks.append(track)
+        return midi_file
+
+    def save(self, path: str, end: float = None):
+        """Writes the messages to a MIDI file (see ``to_midi_file``)."""
+        self.to_midi_file(end).save(path)
+
+
+def render(faces: list, port: MidiFilePort, duration: float, update_intervals=None, midi_interval: float = None,
+           clock: simulation.SimulatedClock = None, **sonification_kwargs) -> dict:
+    """
+    Plays the cube into a ``MidiFilePort`` on a simulated clock, as fast as possible.
+
+    The faces update with the cadence of ``main.update_faces``, the sonification scans
+    them every ``midi_interval`` seconds and the note scheduler sends each note-on and
+    note-off at its simulated time.
+
+    Args:
+        faces (list): The six faces of the cube.
+        port (MidiFilePort): Port receiving the messages; its clock must return
+            ``clock.current_time``.
+        duration (float): Simulated time to render, in seconds.
+        update_intervals (list): Update interval of each face (default ``main.UPDATE_INTERVALS``).
+        midi_interval (float): Interval between MIDI scans (default ``main.MIDI_EVENT_INTERVAL``).
+        clock (SimulatedClock): Clock to advance (default a new one from ``update_intervals``).
+        **sonification_kwargs: Arguments of ``Sonification`` (e.g. ``scale``, ``note_duration``).
+
+    Returns:
+        dict: Rendered and wall-clock times and number of face updates and messages.
+    """
+    from sonification import Sonification
+
+    update_intervals = main.UPDATE_INTERVALS if update_intervals is None else update_intervals
+    midi_interval = main.MIDI_EVENT_INTERVAL if midi_interval is None else midi_interval
+    clock = simulation.SimulatedClock(update_intervals) if clock is None else clock
+    sonification_kwargs.setdefault("midi_channels", main.MIDI_CHANNELS)
+    sonification_kwargs.setdefault("note_duration", main.NOTE_DURATION)
+    sonification_kwargs.setdefault("latency", 0.0)
+    if sonification_kwargs["note_duration"] is None:
+        raise ValueError("Offline rendering needs a note duration.")
+
+    sonification = Sonification("offline", output_port=port, clock=lambda: clock.current_time, **sonification_kwargs)
+    scheduler = sonification.scheduler
+
+    start = time.perf_counter()
+    face_updates = 0
+    next_scan = clock.current_time + midi_interval
+    while True:
+        next_update = clock.next_update_time()
+        next_note = scheduler.next_due_time()
+        now = min(next_update, next_scan, math.inf if next_note is None else next_note)
+        if now > duration:
+            break
+        clock.current_time = now
+
+        if now >= next_update:
+            face_updates += main.update_faces(faces, clock.last_update_times, now, update_intervals)
+        scheduler.dispatch(now)
+        if now >= next_scan:
+            sonification.generate_all_midi_events(faces)
+            scheduler.dispatch(now)
+            next_scan += midi_interval
+
+    clock.current_time = max(clock.current_time, duration)
+    sonification.close()  # Sends the note-offs of the notes still sounding
+
+    return {
+        "duration": duration,
+        "wall_time": time.perf_counter() - start,
+        "face_updates": face_updates,
+        "messages": len(port.messages),
+    }
+
+
+def render_file(path: str, duration: float, grid_size: int = None, engine: str = "list", seed: int = None,
+                **kwargs) -> dict:
+    """
+    Creates a randomized cube and renders its sonification to a MIDI file.
+
+    Args:
+        path (str): Path of the MIDI file.
+        duration (float): Simulated time to render, in seconds.
+        grid_size (int): Size of each face (default ``main.GRID_SIZE``).
+        engine (str): Name of the engine in ``simulation.FACE_ENGINES``.
+        seed (int): Master seed of the per-face random streams.
+        **kwargs: Arguments of ``render``.
+
+    Returns:
+        dict: Summary returned by ``render``, with the run configuration.
+    """
+    grid_size = main.GRID_SIZE if grid_size is None else grid_size
+    faces = simulation.create_faces(grid_size, engine, seed)
+    for face in faces:
+        face.randomize()
+
+    clock = simulation.SimulatedClock(kwargs.pop("update_intervals", None) or main.UPDATE_INTERVALS)
+    port = MidiFilePort(lambda: clock.current_time)
+    summary = render(faces, port, duration, update_intervals=clock.update_intervals, clock=clock, **kwargs)
+    port.save(path, end=duration)
+    summary.update(path=path, grid_size=grid_size, engine=engine, seed=seed)
+    return summary
@@ -0,0 +1,383 @@
+"""
+Offscreen rendering of the cube to a video file or a numbered PNG sequence, without
+a window or a display server.
+
+Frames of ``draw_frame`` are drawn at a fixed resolution into a framebuffer object
+of a windowless OpenGL context (EGL, or OSMesa for software rendering), read back
+through a ring of pixel buffer objects (see ``offscreen_gl.PixelReadback``) and
+streamed to an ``ffmpeg`` subprocess or to PNG files written by a thread pool. The
+states come from a live simulation on a simulated clock or from a recorded log, so
+rendering runs as fast as the machine allows unless ``realtime`` is set.
+
+Usage:
+    python -m liquiprism video session.mp4 --duration 60 --fps 30 --size 1280 720
+    python -m liquiprism video frames/frame_%06d.png --log session.lqp
+"""
+import os
+import struct
+import subprocess
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import main
+import simulation
+
+BACKENDS = ("egl", "osmesa")
+
+
+def select_platform(backend: str = "egl"):
+    """
+    Selects the PyOpenGL platform of a windowless context. Must run before OpenGL is
+    first imported, since PyOpenGL binds its platform on import.
+
+    Args:
+        backend (str): "egl" or "osmesa".
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown offscreen backend '{backend}'. Use 'egl' or 'osmesa'.")
+    platform = os.environ.get("PYOPENGL_PLATFORM")
+    if "OpenGL.GL" in sys.modules and platform != backend:
+        raise RuntimeError(
+            f"OpenGL was already imported with the '{platform}' platform; offscreen rendering must be set up first."
+        )
+    os.environ["PYOPENGL_PLATFORM"] = backend
+    if backend == "egl" and not os.environ.get("DISPLAY") and not os.environ.get("WAYLAND_DISPLAY"):
+        os.environ.setdefault("EGL_PLATFORM", "surfaceless")  # Mesa: no display server to connect to
+
+
+def write_png(path: str, pixels: np.ndarray, compression: int = 3):
+    """
+    Writes an 8-bit RGBA image to a PNG file.
+
+    Args:
+        path (str): Path of the file.
+        pixels (np.ndarray): (height, width, 4) uint8 rows from top to bottom.
+        compression (int): zlib level (0 to 9).
+    """
+    height, width, channels = pixels.shape
+    if channels != 4:
+        raise ValueError("write_png expects RGBA pixels.")
+    # Filter type 0 (none) in front of every row
+    rows = np.concatenate([np.zeros((height, 1), dtype=np.uint8), pixels.reshape(height, -1)], axis=1)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    with open(path, "wb") as file:
+        file.write(b"\x89PNG\r\n\x1a\n")
+        file.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+        file.write(chunk(b"IDAT", zlib.compress(rows.tobytes(), compression)))
+        file.write(chunk(b"IEND", b""))
+
+
+class PngSequenceWriter:
+    """Writes frames to numbered PNG files, compressing them on a pool of threads (zlib releases the GIL)."""
+
+    def __init__(self, pattern: str, workers: int = 2, compression: int = 3):
+        """
+        Initializes the writer.
+
+        Args:
+            pattern (str): Path of the files with a %d field for the frame number
+                (e.g. "frames/frame_%06d.png"); the directory is created.
+            workers (int): Threads compressing frames; at most twice as many frames wait.
+            compression (int): zlib level (0 to 9).
+        """
+        if "%" not in pattern:
+            raise ValueError("The PNG pattern needs a frame number field, e.g. 'frame_%06d.png'.")
+        if os.path.dirname(pattern):
+            os.makedirs(os.path.dirname(pattern), exist_ok=True)
+        self.pattern = pattern
+        self.compression = compression
+        self.frames = 0
+        self._limit = 2 * workers
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="liquiprism-png")
+        self._pending = []
+
+    def write(self, pixels: np.ndarray):
+        while len(self._pending) >= self._limit:
+            self._pending.pop(0).result()
+        self._pending.append(
+            self._executor.submit(write_png, self.pattern % self.frames, pixels, self.compression)
+        )
+        self.frames += 1
+
+    def close(self):
+        """Waits for the files still being written."""
+        for future in self._pending:
+            future.result()
+        self._pending = []
+        self._executor.shutdown()
+
+
+class FfmpegWriter:
+    """Streams raw RGBA frames into an ``ffmpeg`` subprocess through a pipe."""
+
+    def __init__(self, path: str, width: int, height: int, fps: float, codec: str = "libx264",
+                 extra_arguments=("-pix_fmt", "yuv420p"), executable: str = "ffmpeg"):
+        """
+        Starts the encoder.
+
+        Args:
+            path (str): Path of the video file.
+            width (int): Width of the frames.
+            height (int): Height of the frames.
+            fps (float): Frame rate of the video.
+            codec (str): ffmpeg video codec.
+            extra_arguments (tuple): ffmpeg output arguments placed before the path.
+            executable (str): ffmpeg command.
+        """
+        command = [
+            executable, "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+            "-c:v", codec, *extra_arguments, path,
+        ]
+        try:
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        except OSError as e:
+            raise RuntimeError(f"Could not start the video encoder '{executable}': {e}")
+        self.path = path
+        self.frames = 0
+
+    def write(self, pixels: np.ndarray):
+        # A full pipe blocks here, which paces rendering to the encoder
+        self.process.stdin.write(np.ascontiguousarray(pixels).data)
+        self.frames += 1
+
+    def close(self):
+        """Closes the pipe and waits for the encoder to finish the file."""
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"The video encoder failed with status {self.process.returncode}.")
+
+
+def open_writer(output: str, width: int, height: int, fps: float):
+    """
+    Returns a ``PngSequenceWriter`` for a path ending in ".png" and an ``FfmpegWriter``
+    for any other path.
+    """
+    if output.lower().endswith(".png"):
+        return PngSequenceWriter(output)
+    return FfmpegWriter(output, width, height, fps)
+
+
+class OffscreenRenderer:
+    """Draws the cube into a framebuffer object of a windowless context and reads the frames back."""
+
+    def __init__(self, faces: list, width: int = 1280, height: int = 720, renderer: str = "vbo",
+                 backend: str = "egl", readback_depth: int = 3):
+        """
+        Creates the context, the framebuffer and the visualization.
+
+        Args:
+            faces (list): Faces of the first frame (sets the grid size).
+            width (int): Width of the frames.
+            height (int): Height of the frames.
+            renderer (str): "vbo" or "immediate" (see ``main.RENDERER``).
+            backend (str): "egl" or "osmesa".
+            readback_depth (int): Pixel buffers in the readback ring.
+        """
+        select_platform(backend)
+        import offscreen_gl
+
+        if renderer == "vbo":
+            from vbo_visualization import VBOCubeVisualization as CubeVisualization
+        elif renderer == "immediate":
+            from cube_visualization import CubeVisualization
+        else:
+            raise ValueError(f"Unknown renderer '{renderer}'. Use 'immediate' or 'vbo'.")
+
+        self.width = width
+        self.height = height
+        self.context = offscreen_gl.create_context(backend, width, height)
+        self.framebuffer = offscreen_gl.Framebuffer(width, height)
+        self.framebuffer.bind()
+        self.visualization = CubeVisualization(faces, size=(width, height), window=False)
+        self.readback = offscreen_gl.PixelReadback(width, height, readback_depth)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def render(self, faces: list):
+        """
+        Draws a frame and queues its readback.
+
+        Args:
+            faces (list): Faces to draw.
+
+        Returns:
+            np.ndarray: A frame drawn ``readback_depth - 1`` calls earlier, as
+            (height, width, 4) RGBA rows, or None while the readback ring fills.
+        """
+        self.visualization.cellular_automata_list = faces
+        self.framebuffer.bind()
+        self.visualization.draw_frame()
+        return self.readback.read()
+
+    def flush(self) -> list:
+        """Returns the frames still being read back."""
+        return self.readback.flush()
+
+    def close(self):
+        self.readback.close()
+        if hasattr(self.visualization, "close"):
+            self.visualization.close()
+        self.framebuffer.close()
+        self.context.close()
+
+
+def simulation_frames(faces: list, duration: float, fps: float, update_intervals=None, realtime: bool = False,
+                      **update_kwargs):
+    """
+    Advances a cube on a simulated clock and yields it at every frame time.
+
+    Args:
+        faces (list): The six faces of the cube.
+        duration (float): Simulated time to render, in seconds.
+        fps (float): Frames per simulated second.
+        update_intervals (list): Update interval of each face (default ``main.UPDATE_INTERVALS``).
+        realtime (bool): Wait for the wall clock to reach each frame time instead of
+            running as fast as possible.
+        **update_kwargs: Rule arguments of ``main.update_faces``.
+
+    Yields:
+        list: The faces (the same list, advanced in place) at times 0, 1 / fps, ...
+    """
+    update_intervals = main.UPDATE_INTERVALS if update_intervals is None else update_intervals
+    clock = simulation.SimulatedClock(update_intervals)
+    start = time.perf_counter()
+    for frame in range(int(round(duration * fps))):
+        frame_time = frame / fps
+        while clock.next_update_time() <= frame_time:
+            clock.current_time = clock.next_update_time()
+            main.update_faces(faces, clock.last_update_times, clock.current_time, update_intervals,
+                              **update_kwargs)
+        if realtime:
+            delay = start + frame_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        yield faces
+
+
+def log_frames(player, fps: float, start: float = 0.0, duration: float = None, realtime: bool = False):
+    """
+    Replays a recorded log and yields the cube at every frame time.
+
+    Args:
+        player (LogPlayer): Open log.
+        fps (float): Frames per recorded second.
+        start (float): Recorded time of the first frame.
+        duration (float): Recorded time to render (default up to the end of the log).
+        realtime (bool): Wait for the wall clock to reach each frame time.
+
+    Yields:
+        list: ``ReplayFace`` objects at times start, start + 1 / fps, ...
+    """
+    duration = max(player.duration - start, 0.0) if duration is None else duration
+    step = player.step_at_time(start)
+    faces = player.faces_at(step)
+    records = player.replay(step)
+    origin = time.perf_counter()
+    for frame in range(int(round(duration * fps))):
+        frame_time = frame / fps
+        target = player.step_at_time(start + frame_time)
+        while step < target:
+            faces = next(records)[4]
+            step += 1
+        if realtime:
+            delay = origin + frame_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        yield faces
+
+
+def render_frames(renderer: OffscreenRenderer, states, writer) -> int:
+    """
+    Renders a sequence of cube states and writes every frame.
+
+    Args:
+        renderer (OffscreenRenderer): Renderer drawing the states.
+        states (iterable): Face lists, e.g. from ``simulation_frames`` or ``log_frames``.
+        writer: Object with ``write(pixels)`` (e.g. ``FfmpegWriter``).
+
+    Returns:
+        int: Number of frames written.
+    """
+    frames = 0
+    for faces in states:
+        pixels = renderer.render(faces)
+        if pixels is not None:
+            writer.write(pixels)
+            frames += 1
+    for pixels in renderer.flush():
+        writer.write(pixels)
+        frames += 1
+    return frames
+
+
+def render_video(output: str, duration: float = None, fps: float = 30.0, size=(1280, 720), log: str = None,
+                 start: float = 0.0, grid_size: int = None, engine: str = "numpy", seed: int = None,
+                 renderer: str = "vbo", backend: str = "egl", realtime: bool = False) -> dict:
+    """
+    Renders a new simulation or a recorded log to a video file or PNG sequence.
+
+    Args:
+        output (str): Video path, or PNG pattern with a %d field (see ``open_writer``).
+        duration (float): Seconds to render (default 60 for a simulation, the rest of the log for a log).
+        fps (float): Frame rate.
+        size (tuple): Width and height of the frames.
+        log (str): Log to render instead of a new simulation.
+        start (float): Recorded time of the first frame of a log.
+        grid_size (int): Size of each face of a new simulation (default ``main.GRID_SIZE``).
+        engine (str): Engine of a new simulation (see ``simulation.FACE_ENGINES``).
+        seed (int): Master seed of a new simulation.
+        renderer (str): "vbo" or "immediate".
+        backend (str): "egl" or "osmesa".
+        realtime (bool): Pace the frames to the wall clock.
+
+    Returns:
+        dict: Frames, rendered and wall-clock times and the speed relative to real time.
+    """
+    width, height = size
+    wall_start = time.perf_counter()
+    if log is not None:
+        from recording import LogPlayer
+
+        with LogPlayer(log) as player:
+            states = log_frames(player, fps, start, duration, realtime)
+            first = player.faces_at(player.step_at_time(start))
+            frames = _render_to(output, first, states, width, height, fps, renderer, backend)
+    else:
+        duration = 60.0 if duration is None else duration
+        grid_size = main.GRID_SIZE if grid_size is None else grid_size
+        faces = simulation.create_faces(grid_size, engine, seed)
+        for face in faces:
+            face.randomize()
+        states = simulation_frames(faces, duration, fps, realtime=realtime)
+        frames = _render_to(output, faces, states, width, height, fps, renderer, backend)
+
+    wall_time = time.perf_counter() - wall_start
+    rendered = frames / fps
+    return {
+        "output": output,
+        "frames": frames,
+        "duration": rendered,
+        "wall_time": wall_time,
+        "speed": rendered / wall_time if wall_time > 0 else float("inf"),
+    }
+
+
+def _render_to(output, faces, states, width, height, fps, renderer, backend) -> int:
+    writer = open_writer(output, width, height, fps)
+    try:
+        with OffscreenRenderer(faces, width, height, renderer, backend) as offscreen:
+            return render_frames(offscreen, states, writer)
+    finally:
+        writer.close()
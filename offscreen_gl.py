@@ -0,0 +1,195 @@
+"""
+OpenGL objects of the offscreen renderer: a windowless context, a framebuffer object
+and a ring of pixel buffer objects for asynchronous readback.
+
+Import it through ``offscreen.select_platform``, which picks the PyOpenGL platform
+(EGL or OSMesa) before OpenGL is first imported.
+"""
+import ctypes
+
+import numpy as np
+from OpenGL.GL import *
+
+
+class EglContext:
+    """
+    OpenGL context of the EGL platform with no window surface, for GPU (or Mesa
+    llvmpipe) rendering into a framebuffer object.
+    """
+
+    def __init__(self):
+        from OpenGL import EGL
+
+        self._egl = EGL
+        self.display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        if not self.display or not EGL.eglInitialize(self.display, ctypes.pointer(major), ctypes.pointer(minor)):
+            raise RuntimeError("Could not initialize EGL (try EGL_PLATFORM=surfaceless or device).")
+
+        attributes = [EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT, EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                      EGL.EGL_NONE]
+        config = EGL.EGLConfig()
+        count = EGL.EGLint()
+        EGL.eglChooseConfig(self.display, (EGL.EGLint * len(attributes))(*attributes), ctypes.pointer(config), 1,
+                            ctypes.pointer(count))
+        if not count.value:
+            raise RuntimeError("EGL has no configuration for desktop OpenGL.")
+
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, None)
+        if not self.context:
+            raise RuntimeError("Could not create an EGL context.")
+        # Everything is drawn into a framebuffer object, so the context needs no surface
+        if not EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self.context):
+            raise RuntimeError("Could not make the EGL context current (EGL_KHR_surfaceless_context missing).")
+
+    def close(self):
+        EGL = self._egl
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+        EGL.eglDestroyContext(self.display, self.context)
+        EGL.eglTerminate(self.display)
+
+
+class OsMesaContext:
+    """OpenGL context of the OSMesa software renderer, for machines without EGL."""
+
+    def __init__(self, width: int, height: int):
+        from OpenGL import osmesa
+
+        self._osmesa = osmesa
+        self.context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+        if not self.context:
+            raise RuntimeError("Could not create an OSMesa context.")
+        # OSMesa needs a buffer to be current; the frames go to the framebuffer object
+        self._buffer = (ctypes.c_ubyte * (width * height * 4))()
+        if not osmesa.OSMesaMakeCurrent(self.context, self._buffer, GL_UNSIGNED_BYTE, width, height):
+            raise RuntimeError("Could not make the OSMesa context current.")
+
+    def close(self):
+        self._osmesa.OSMesaDestroyContext(self.context)
+
+
+def create_context(backend: str, width: int, height: int):
+    """
+    Creates and makes current a windowless OpenGL context.
+
+    Args:
+        backend (str): "egl" or "osmesa" (must match ``offscreen.select_platform``).
+        width (int): Width of the frames.
+        height (int): Height of the frames.
+
+    Returns:
+        The context (with a ``close`` method).
+    """
+    if backend == "egl":
+        return EglContext()
+    if backend == "osmesa":
+        return OsMesaContext(width, height)
+    raise ValueError(f"Unknown offscreen backend '{backend}'. Use 'egl' or 'osmesa'.")
+
+
+class Framebuffer:
+    """Framebuffer object with an RGBA color and a depth renderbuffer."""
+
+    def __init__(self, width: int, height: int):
+        """
+        Creates the framebuffer.
+
+        Args:
+            width (int): Width in pixels.
+            height (int): Height in pixels.
+        """
+        self.width = width
+        self.height = height
+        self.framebuffer = glGenFramebuffers(1)
+        self.color_buffer, self.depth_buffer = glGenRenderbuffers(2)
+
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.color_buffer)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.color_buffer)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth_buffer)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depth_buffer)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError("The offscreen framebuffer is incomplete.")
+
+    def bind(self):
+        """Directs drawing and reading to this framebuffer."""
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        glViewport(0, 0, self.width, self.height)
+
+    def close(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        glDeleteRenderbuffers(2, [self.color_buffer, self.depth_buffer])
+        glDeleteFramebuffers(1, [self.framebuffer])
+
+
+class PixelReadback:
+    """
+    Ring of pixel buffer objects that reads frames back without waiting for the GPU.
+
+    ``read`` queues the copy of the current frame into the next buffer of the ring
+    (glReadPixels into a bound pack buffer returns at once) and maps the buffer
+    filled ``depth - 1`` frames earlier, whose copy has finished while those frames
+    were drawn. Frames therefore come out ``depth - 1`` calls late; ``flush``
+    returns the ones still in flight.
+    """
+
+    def __init__(self, width: int, height: int, depth: int = 3):
+        """
+        Creates the pixel buffers.
+
+        Args:
+            width (int): Width of the frames.
+            height (int): Height of the frames.
+            depth (int): Number of buffers in the ring (at least 2 to overlap the copies).
+        """
+        if depth < 1:
+            raise ValueError("The readback needs at least one pixel buffer.")
+        self.width = width
+        self.height = height
+        self.depth = depth
+        self.frame_bytes = width * height * 4
+        self.buffers = list(np.atleast_1d(glGenBuffers(depth)))
+        for buffer in self.buffers:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, buffer)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.frame_bytes, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.queued = 0  # Frames read into the ring
+        self.collected = 0  # Frames mapped back
+
+    def read(self):
+        """
+        Queues the copy of the current frame.
+
+        Returns:
+            np.ndarray: The oldest frame of the ring once it is full, as (height, width, 4)
+            RGBA rows from top to bottom, or None while the ring fills.
+        """
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.buffers[self.queued % self.depth])
+        glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.queued += 1
+        if self.queued - self.collected == self.depth:
+            return self._collect()
+        return None
+
+    def flush(self) -> list:
+        """Returns the frames still in the ring, oldest first."""
+        return [self._collect() for _ in range(self.queued - self.collected)]
+
+    def _collect(self) -> np.ndarray:
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.buffers[self.collected % self.depth])
+        address = glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, self.frame_bytes, GL_MAP_READ_BIT)
+        pixels = np.ctypeslib.as_array((ctypes.c_ubyte * self.frame_bytes).from_address(address))
+        # OpenGL rows go from the bottom up; the copy out of the mapping flips them
+        frame = pixels.reshape(self.height, self.width, 4)[::-1].copy()
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.collected += 1
+        return frame
+
+    def close(self):
+        glDeleteBuffers(len(self.buffers), self.buffers)
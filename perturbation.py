@@ -0,0 +1,317 @@
+"""
+Patterned perturbations of the cube: random masks, disks (brushes), stamped patterns
+and waves that travel across the borders of the faces.
+
+A pattern computes the cells it touches on each face as coordinate arrays, and each
+face writes them in one call of ``perturb_cells`` (fancy indexing, bit operations on
+the packed words or dirty tiles, depending on the engine), so the cost of a
+perturbation grows with the number of cells it changes, not with the grid size.
+Random choices draw from the face's stream when it has one (see ``seed_faces``).
+
+``PerturbationSchedule`` applies patterns at given simulation steps and works as the
+``on_tick`` hook of ``simulation.simulate``:
+    schedule = PerturbationSchedule(faces)
+    schedule.add(10, Stamp("glider", 2, 2), faces=[0])
+    schedule.add(50, RandomMask(0.05), every=100)
+    schedule.add(200, Wave(4, "down", width=2))
+    simulation.simulate(faces, steps=6000, on_tick=schedule.on_tick)
+"""
+import heapq
+import itertools
+import random
+
+import numpy as np
+
+from cellular_automata import CUBE_NEIGHBORS
+
+# Stamped patterns, as rows of 0/1 values
+PATTERNS = {
+    "glider": [[0, 1, 0], [0, 0, 1], [1, 1, 1]],
+    "blinker": [[1, 1, 1]],
+    "block": [[1, 1], [1, 1]],
+    "r_pentomino": [[0, 1, 1], [1, 1, 0], [0, 1, 0]],
+    "acorn": [[0, 1, 0, 0, 0, 0, 0], [0, 0, 0, 1, 0, 0, 0], [1, 1, 0, 0, 1, 1, 1]],
+    "diehard": [[0, 0, 0, 0, 0, 0, 1, 0], [1, 1, 0, 0, 0, 0, 0, 0], [0, 1, 0, 0, 0, 1, 1, 1]],
+}
+
+
+def register_pattern(name: str, cells):
+    """
+    Adds a pattern for ``Stamp``.
+
+    Args:
+        name (str): Name of the pattern.
+        cells (array-like): 2D array of 0/1 values.
+    """
+    cells = np.asarray(cells, dtype=np.uint8)
+    if cells.ndim != 2 or not cells.any():
+        raise ValueError("A pattern is a 2D array with at least one live cell.")
+    PATTERNS[name] = cells.tolist()
+
+
+def _face_rng(face) -> np.random.Generator:
+    """Returns the face's stream, or a generator seeded from the global ``random`` module."""
+    return face.rng if face.rng is not None else np.random.default_rng(random.getrandbits(64))
+
+
+def _thin(xs: np.ndarray, ys: np.ndarray, density: float, rng: np.random.Generator) -> tuple:
+    """Keeps each cell with probability ``density``."""
+    if density >= 1:
+        return xs, ys
+    keep = rng.random(xs.size) < density
+    return xs[keep], ys[keep]
+
+
+class RandomMask:
+    """Cells of a face chosen at random with a given density."""
+
+    def __init__(self, density: float, mode: str = "flip"):
+        """
+        Args:
+            density (float): Fraction of the cells of each face to write (0 to 1).
+            mode (str): Write of the cells (see ``cellular_automata.PERTURB_MODES``).
+        """
+        if not 0 <= density <= 1:
+            raise ValueError("The density must be between 0 and 1.")
+        self.density = density
+        self.mode = mode
+        self.steps = 1
+
+    def cells(self, faces: list, face_ids, age: int) -> dict:
+        result = {}
+        for face_id in face_ids:
+            face = faces[face_id]
+            rng = _face_rng(face)
+            area = face.grid_size * face.grid_size
+            # Without replacement, so exactly the drawn number of cells change
+            index = rng.choice(area, size=rng.binomial(area, self.density), replace=False)
+            result[face_id] = (index // face.grid_size, index % face.grid_size)
+        return result
+
+
+class Disk:
+    """Disk of cells around a point of a face, optionally sprayed like a brush."""
+
+    def __init__(self, x: int, y: int, radius: float, density: float = 1.0, mode: str = "flip"):
+        """
+        Args:
+            x (int): Row of the center.
+            y (int): Column of the center.
+            radius (float): Radius in cells (the part outside the face is clipped).
+            density (float): Fraction of the cells of the disk to write.
+            mode (str): Write of the cells (see ``cellular_automata.PERTURB_MODES``).
+        """
+        if radius < 0:
+            raise ValueError("The radius must not be negative.")
+        self.x, self.y, self.radius = x, y, radius
+        self.density = density
+        self.mode = mode
+        self.steps = 1
+
+    def cells(self, faces: list, face_ids, age: int) -> dict:
+        reach = int(self.radius)
+        dx, dy = np.mgrid[-reach:reach + 1, -reach:reach + 1]
+        inside = dx * dx + dy * dy <= self.radius * self.radius
+        result = {}
+        for face_id in face_ids:
+            face = faces[face_id]
+            xs, ys = self.x + dx[inside], self.y + dy[inside]
+            on_face = (xs >= 0) & (xs < face.grid_size) & (ys >= 0) & (ys < face.grid_size)
+            result[face_id] = _thin(xs[on_face], ys[on_face], self.density, _face_rng(face))
+        return result
+
+
+class Stamp:
+    """Pattern of ``PATTERNS`` (or any 0/1 array) stamped at a point of a face."""
+
+    def __init__(self, pattern, x: int, y: int, mode: str = "set"):
+        """
+        Args:
+            pattern (str or array-like): Name in ``PATTERNS`` or 2D array of 0/1 values.
+            x (int): Row of the top-left corner of the pattern.
+            y (int): Column of the top-left corner.
+            mode (str): Write of the live cells of the pattern (see
+                ``cellular_automata.PERTURB_MODES``).
+        """
+        if isinstance(pattern, str):
+            if pattern not in PATTERNS:
+                raise ValueError(f"Unknown pattern '{pattern}'. Available patterns: {', '.join(PATTERNS)}.")
+            pattern = PATTERNS[pattern]
+        self.offsets = np.nonzero(np.asarray(pattern))
+        self.x, self.y = x, y
+        self.mode = mode
+        self.steps = 1
+
+    def cells(self, faces: list, face_ids, age: int) -> dict:
+        xs, ys = self.x + self.offsets[0], self.y + self.offsets[1]
+        result = {}
+        for face_id in face_ids:
+            size = faces[face_id].grid_size
+            on_face = (xs >= 0) & (xs < size) & (ys >= 0) & (ys < size)
+            result[face_id] = (xs[on_face], ys[on_face])
+        return result
+
+
+# Edge of a face opposite each edge ("up" is the first row, "left" the first column)
+_OPPOSITE = {"up": "down", "down": "up", "left": "right", "right": "left"}
+
+
+class Wave:
+    """
+    Band of cells moving across the cube, one position per step, from the border of a
+    face through the neighbor faces of ``CUBE_NEIGHBORS``. The band enters each face
+    through the edge it shares with the face it left and leaves through the opposite
+    edge, so it goes around the cube whatever the orientation of the faces.
+    """
+
+    def __init__(self, face_id: int, direction: str, width: int = 1, speed: int = 1, distance: int = None,
+                 density: float = 1.0, mode: str = "flip"):
+        """
+        Args:
+            face_id (int): Face the wave enters first.
+            direction (str): "up", "down", "left" or "right" on the first face; a wave
+                moving down enters through its first row and continues on the face below.
+            width (int): Thickness of the band in cells.
+            speed (int): Cells the band moves per step.
+            distance (int): Cells travelled before the wave ends (default one lap of
+                four faces).
+            density (float): Fraction of the cells of the band to write.
+            mode (str): Write of the cells (see ``cellular_automata.PERTURB_MODES``).
+        """
+        if face_id not in CUBE_NEIGHBORS:
+            raise ValueError(f"Invalid face {face_id}.")
+        if direction not in CUBE_NEIGHBORS[face_id]:
+            raise ValueError(f"Unknown direction '{direction}'. Use up, down, left or right.")
+        if width < 1 or speed < 1:
+            raise ValueError("The width and speed of a wave must be at least 1.")
+        self.face_id = face_id
+        self.direction = direction
+        self.width = width
+        self.speed = speed
+        self.distance = distance
+        self.density = density
+        self.mode = mode
+        self.steps = None  # Known once the grid size is (see ``cells``)
+
+    def lifetime(self, grid_size: int) -> int:
+        """Returns the number of steps the wave lasts on faces of ``grid_size`` cells."""
+        distance = 4 * grid_size if self.distance is None else self.distance
+        return -(-distance // self.speed)
+
+    def cells(self, faces: list, face_ids, age: int) -> dict:
+        size = faces[self.face_id].grid_size
+        front = age * self.speed
+        positions = np.arange(front, front + self.width)
+        # Face of each position of the band along the chain of neighbors
+        chain = [(self.face_id, _OPPOSITE[self.direction])]  # (face ID, edge the band enters through)
+        while len(chain) <= positions[-1] // size:
+            face_id, entry = chain[-1]
+            following = CUBE_NEIGHBORS[face_id][_OPPOSITE[entry]]
+            edge = next(edge for edge, neighbor in CUBE_NEIGHBORS[following].items() if neighbor == face_id)
+            chain.append((following, edge))
+
+        result = {}
+        across = np.arange(size)
+        for hop in np.unique(positions // size).tolist():
+            face_id, entry = chain[hop]
+            if face_id not in face_ids:
+                continue
+            offsets = positions[positions // size == hop] % size
+            lines = offsets if entry in ("up", "left") else size - 1 - offsets
+            xs, ys = np.repeat(lines, size), np.tile(across, lines.size)
+            if entry in ("left", "right"):
+                xs, ys = ys, xs
+            xs, ys = _thin(xs, ys, self.density, _face_rng(faces[face_id]))
+            if face_id in result:
+                xs, ys = np.concatenate([result[face_id][0], xs]), np.concatenate([result[face_id][1], ys])
+            result[face_id] = (xs, ys)
+        return result
+
+
+def apply_pattern(faces: list, pattern, face_ids=None, age: int = 0) -> int:
+    """
+    Applies a pattern to the faces, one vectorized write per face it touches.
+
+    Args:
+        faces (list): The six faces of the cube.
+        pattern: ``RandomMask``, ``Disk``, ``Stamp``, ``Wave`` or any object with the
+            same ``cells`` and ``mode`` attributes.
+        face_ids (list): Faces the pattern may touch (default all).
+        age (int): Steps since the pattern started (moves a wave).
+
+    Returns:
+        int: Number of cells written.
+    """
+    face_ids = range(len(faces)) if face_ids is None else face_ids
+    written = 0
+    for face_id, (xs, ys) in pattern.cells(faces, set(face_ids), age).items():
+        if len(xs):
+            written += len(faces[face_id].perturb_cells(xs, ys, pattern.mode))
+    return written
+
+
+class PerturbationSchedule:
+    """Patterns applied to the faces at given simulation steps."""
+
+    def __init__(self, faces: list):
+        """
+        Args:
+            faces (list): The six faces of the cube.
+        """
+        self.faces = faces
+        self.step = 0
+        self.cells_written = 0
+        self._pending = []  # Heap of (start step, order, pattern, face IDs, every, remaining count)
+        self._active = []  # (start step, pattern, face IDs, last step) of patterns lasting several steps
+        self._order = itertools.count()
+
+    def add(self, step: int, pattern, faces=None, every: int = None, count: int = None):
+        """
+        Schedules a pattern.
+
+        Args:
+            step (int): Step at which to apply it first (1 is the first step).
+            pattern: Pattern to apply (see ``apply_pattern``).
+            faces (list): Face IDs it may touch (default all).
+            every (int): Steps between repetitions (default once).
+            count (int): Number of applications when repeated (default unlimited).
+        """
+        if step <= self.step:
+            raise ValueError(f"Step {step} has already been run (current step {self.step}).")
+        if every is not None and every < 1:
+            raise ValueError("Repetitions must be at least one step apart.")
+        remaining = 1 if every is None else count
+        heapq.heappush(self._pending, (step, next(self._order), pattern, faces, every, remaining))
+
+    @property
+    def pending(self) -> int:
+        """int: Number of scheduled and running patterns."""
+        return len(self._pending) + len(self._active)
+
+    def advance(self) -> int:
+        """
+        Counts one step and applies the patterns due at it.
+
+        Returns:
+            int: Number of cells written.
+        """
+        self.step += 1
+        while self._pending and self._pending[0][0] <= self.step:
+            step, _, pattern, face_ids, every, remaining = heapq.heappop(self._pending)
+            grid_size = self.faces[0].grid_size
+            steps = pattern.lifetime(grid_size) if pattern.steps is None else pattern.steps
+            self._active.append((self.step, pattern, face_ids, self.step + steps - 1))
+            if every is not None and remaining != 1:
+                heapq.heappush(self._pending, (step + every, next(self._order), pattern, face_ids, every,
+                                               None if remaining is None else remaining - 1))
+
+        written = 0
+        for start, pattern, face_ids, last in self._active:
+            written += apply_pattern(self.faces, pattern, face_ids, self.step - start)
+        self._active = [active for active in self._active if active[3] > self.step]
+        self.cells_written += written
+        return written
+
+    def on_tick(self, faces: list, simulated_time: float):
+        """Hook of ``simulation.simulate``: advances one step after each tick."""
+        self.advance()
@@ -0,0 +1,403 @@
+"""
+Record and replay of cube evolutions.
+
+Log format (little-endian):
+    header:  magic "LQPR", version (u16), grid size (u32), number of faces (u16),
+             keyframe interval (u32), metadata length (u32), metadata (UTF-8 JSON)
+    records: kind (u8), event (u8), face ID (u8), timestamp (f64), activity count (u32),
+             payload length (u32), payload
+
+Grids are stored bit-packed (``np.packbits`` of the row-major cells). A keyframe holds
+the packed grid and previous grid of a face; a delta holds the XOR of the packed grid
+with the grid recorded before, either whole or as runs of changed 8-byte words.
+"""
+import json
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b"LQPR"
+VERSION = 1
+HEADER = struct.Struct("<4sHIHII")
+RECORD = struct.Struct("<BBBdII")
+
+# Record kinds
+KEYFRAME = 0
+XOR_DELTA = 1
+RUN_DELTA = 2
+
+# Events
+START = 0
+UPDATE = 1
+PERTURB = 2
+
+EVENT_NAMES = {START: "start", UPDATE: "update", PERTURB: "perturb"}
+
+NO_CHANGE = struct.pack("<I", 0)  # Run delta without runs
+SMALL_GRID_BYTES = 1024  # Packed grids up to this size (90x90 cells) are always stored as plain XOR deltas
+
+
+def encode_runs(xor: np.ndarray) -> bytes:
+    """
+    Encodes the non-zero 8-byte words of an XOR delta as runs.
+
+    Returns:
+        bytes: Number of runs (u32), run starts and lengths in words (u32) and the
+        changed words of all runs.
+    """
+    words = _as_words(xor)
+    changed = np.flatnonzero(words)
+    if changed.size == 0:
+        return NO_CHANGE
+    breaks = np.flatnonzero(np.diff(changed) > 1)
+    starts = np.concatenate((changed[:1], changed[breaks + 1]))
+    ends = np.concatenate((changed[breaks], changed[-1:])) + 1
+    header = struct.pack("<I", starts.size)
+    return header + starts.astype("<u4").tobytes() + (ends - starts).astype("<u4").tobytes() + words[changed].tobytes()
+
+
+def decode_runs(payload, size: int) -> np.ndarray:
+    """Decodes ``encode_runs`` back to the XOR delta of ``size`` bytes."""
+    words = np.zeros((size + 7) // 8, dtype="<u8")
+    (count,) = struct.unpack_from("<I", payload)
+    if count:
+        starts = np.frombuffer(payload, dtype="<u4", count=count, offset=4).astype(np.int64)
+        lengths = np.frombuffer(payload, dtype="<u4", count=count, offset=4 + 4 * count).astype(np.int64)
+        values = np.frombuffer(payload, dtype="<u8", offset=4 + 8 * count)
+        # Position of every changed word: each run start repeated, plus the offset in the run
+        offsets = np.arange(values.size) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        words[np.repeat(starts, lengths) + offsets] = values
+    return words.view(np.uint8)[:size]
+
+
+def encode_delta(xor: np.ndarray) -> tuple:
+    """
+    Encodes the XOR of two packed grids in the smaller of the two delta forms.
+
+    Returns:
+        tuple: (record kind, payload), with kind ``XOR_DELTA`` or ``RUN_DELTA``.
+    """
+    if not xor.any():
+        return RUN_DELTA, NO_CHANGE
+    if xor.size > SMALL_GRID_BYTES and np.count_nonzero(_as_words(xor)) * 16 < xor.size:
+        return RUN_DELTA, encode_runs(xor)  # Runs only pay off on large grids with few changes
+    return XOR_DELTA, xor.tobytes()
+
+
+def _as_words(data: np.ndarray) -> np.ndarray:
+    """Views bytes as little-endian 8-byte words, zero-padding the last one."""
+    if data.size % 8:
+        padded = np.zeros(data.size + 8 - data.size % 8, dtype=np.uint8)
+        padded[:data.size] = data
+        data = padded
+    return data.view("<u8")
+
+
+def _pack(grid) -> np.ndarray:
+    return np.packbits(np.asarray(grid, dtype=np.uint8))
+
+
+class LogRecorder:
+    """
+    Appends every update and perturbation of the faces to a binary log.
+
+    The recorder registers itself as a listener of the faces. Each face starts with a
+    keyframe; then each change is stored as a delta against the last recorded grid of
+    the face, and a new keyframe is written every ``keyframe_interval`` records of the
+    face so that the player can seek without replaying the whole log. Like the other
+    listeners, it only sees the changes made by ``update`` and ``perturb``.
+    """
+
+    def __init__(self, faces: list, path: str, keyframe_interval: int = 256, clock=None, metadata: dict = None):
+        """
+        Starts recording.
+
+        Args:
+            faces (list): The six faces of the cube (any engine).
+            path (str): Path of the log file (overwritten).
+            keyframe_interval (int): Records of a face between two of its keyframes.
+            clock (callable): Time source of the timestamps (default seconds since the
+                start of the recording).
+            metadata (dict): JSON-serializable information stored in the header.
+        """
+        if keyframe_interval < 1:
+            raise ValueError("keyframe_interval must be at least 1.")
+
+        self.faces = faces
+        self.path = path
+        self.grid_size = faces[0].grid_size
+        self.keyframe_interval = keyframe_interval
+        self._start = time.perf_counter()
+        self.clock = self._elapsed if clock is None else clock
+        self.records = 0
+        self.bytes_written = 0
+
+        self._face_ids = {id(face): face_id for face_id, face in enumerate(faces)}
+        self._packed = [None] * len(faces)  # Last recorded packed grid of each face
+        self._since_keyframe = [0] * len(faces)
+
+        self._file = open(path, "wb", buffering=1 << 20)
+        encoded_metadata = json.dumps(metadata or {}).encode("utf-8")
+        self._write(HEADER.pack(MAGIC, VERSION, self.grid_size, len(faces), keyframe_interval, len(encoded_metadata)))
+        self._write(encoded_metadata)
+
+        for face_id, face in enumerate(faces):
+            self._write_keyframe(face_id, face, START)
+            face.add_listener(self)
+
+    def _elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def on_update(self, face, face_id, rule):
+        self._record(self._face_ids[id(face)], face, UPDATE)
+
+    def on_perturb(self, face, cells):
+        self._record(self._face_ids[id(face)], face, PERTURB)
+
+    def close(self):
+        """Stops listening to the faces and closes the log."""
+        for face in self.faces:
+            face.remove_listener(self)
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _record(self, face_id: int, face, event: int):
+        if self._since_keyframe[face_id] >= self.keyframe_interval:
+            self._write_keyframe(face_id, face, event)
+            return
+
+        packed = _pack(face.grid)
+        kind, payload = encode_delta(packed ^ self._packed[face_id])
+        self._write_record(kind, event, face_id, face.activity_count, payload)
+        self._packed[face_id] = packed
+        self._since_keyframe[face_id] += 1
+
+    def _write_keyframe(self, face_id: int, face, event: int):
+        packed = _pack(face.grid)
+        payload = packed.tobytes() + _pack(face.previous_grid).tobytes()
+        self._write_record(KEYFRAME, event, face_id, face.activity_count, payload)
+        self._packed[face_id] = packed
+        self._since_keyframe[face_id] = 0
+
+    def _write_record(self, kind: int, event: int, face_id: int, activity_count: int, payload: bytes):
+        self._write(RECORD.pack(kind, event, face_id, self.clock(), activity_count, len(payload)) + payload)
+        self.records += 1
+
+    def _write(self, data: bytes):
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+
+class ReplayFace:
+    """State of a face rebuilt from a log, with the attributes read by the renderer and sonification."""
+
+    def __init__(self, grid_size: int):
+        self.grid_size = grid_size
+        self.grid = np.zeros((grid_size, grid_size), dtype=np.uint8)
+        self.previous_grid = np.zeros((grid_size, grid_size), dtype=np.uint8)
+        self.activity_count = 0
+        self.generation = 0
+
+
+class LogPlayer:
+    """
+    Reads a log written by ``LogRecorder`` through a memory map.
+
+    Opening the log only walks the record headers to index them; ``faces_at`` then
+    rebuilds the cube at any step from the nearest keyframes, and ``replay`` streams
+    the states in order without running the rules. A log still being written or cut
+    short by a crash is read up to its last complete record: an empty file or a
+    partial header gives a log without records, and a partial last record is ignored.
+    """
+
+    def __init__(self, path: str):
+        """
+        Opens a log.
+
+        Args:
+            path (str): Path of the log file.
+        """
+        self._file = open(path, "rb")
+        # mmap cannot map an empty file, e.g. a recorder that has not flushed its header yet
+        empty = os.fstat(self._file.fileno()).st_size == 0
+        self._map = b"" if empty else mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < HEADER.size:
+            if not MAGIC.startswith(bytes(self._map[:len(MAGIC)])):
+                raise ValueError(f"'{path}' is not a Liquiprism log.")
+            header = (MAGIC, VERSION, 0, 0, 0, 0)
+        else:
+            header = HEADER.unpack_from(self._map)
+        magic, version, grid_size, face_count, keyframe_interval, metadata_length = header
+        if magic != MAGIC:
+            raise ValueError(f"'{path}' is not a Liquiprism log.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported log version {version}.")
+
+        self.grid_size = grid_size
+        self.face_count = face_count
+        self.keyframe_interval = keyframe_interval
+        metadata_end = HEADER.size + metadata_length
+        complete = metadata_length and metadata_end <= len(self._map)
+        self.metadata = json.loads(bytes(self._map[HEADER.size:metadata_end]).decode("utf-8")) if complete else {}
+        self._packed_size = (grid_size * grid_size + 7) // 8
+
+        records = []
+        offset = metadata_end
+        while offset + RECORD.size <= len(self._map):
+            kind, event, face_id, timestamp, activity_count, length = RECORD.unpack_from(self._map, offset)
+            if offset + RECORD.size + length > len(self._map):
+                break  # Partial last record of an interrupted recording
+            records.append((offset + RECORD.size, length, kind, event, face_id, timestamp, activity_count))
+            offset += RECORD.size + length
+        table = np.array(records, dtype=float).reshape(-1, 7)
+        self._payload_offsets = table[:, 0].astype(np.int64)
+        self._payload_lengths = table[:, 1].astype(np.int64)
+        self.kinds = table[:, 2].astype(np.uint8)
+        self.events = table[:, 3].astype(np.uint8)
+        self.face_ids = table[:, 4].astype(np.uint8)
+        self.timestamps = table[:, 5]
+        self.activity_counts = table[:, 6].astype(np.int64)
+
+    def __len__(self) -> int:
+        """Number of records, initial keyframes included."""
+        return len(self.kinds)
+
+    @property
+    def duration(self) -> float:
+        """float: Timestamp of the last record."""
+        return float(self.timestamps[-1]) if len(self) else 0.0
+
+    def close(self):
+        """Closes the memory map and the file."""
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def step_at_time(self, timestamp: float) -> int:
+        """Returns the number of records with a timestamp up to ``timestamp``."""
+        return int(np.searchsorted(self.timestamps, timestamp, side="right"))
+
+    def faces_at(self, step: int) -> list:
+        """
+        Rebuilds the faces after the first ``step`` records.
+
+        Args:
+            step (int): Number of records applied (0 to ``len(self)``).
+
+        Returns:
+            list: One ``ReplayFace`` per face.
+        """
+        if not 0 <= step <= len(self):
+            raise ValueError(f"Step {step} is outside the log (0 to {len(self)}).")
+
+        faces = [ReplayFace(self.grid_size) for _ in range(self.face_count)]
+        packed = [np.zeros(self._packed_size, dtype=np.uint8) for _ in range(self.face_count)]
+        packed_previous = list(packed)
+        for face_id, face in enumerate(faces):
+            records = np.flatnonzero(self.face_ids[:step] == face_id)
+            keyframes = records[self.kinds[records] == KEYFRAME]
+            if keyframes.size:
+                records = records[records >= keyframes[-1]]
+            for index in records:
+                self._apply(int(index), packed, packed_previous)
+            face.grid = _unpack_grid(packed[face_id], self.grid_size)
+            face.previous_grid = _unpack_grid(packed_previous[face_id], self.grid_size)
+            face.activity_count = int(self.activity_counts[records[-1]]) if records.size else 0
+            face.generation = int(np.count_nonzero(self.face_ids[:step] == face_id))
+        return faces
+
+    def replay(self, start: int = 0, stop: int = None):
+        """
+        Streams the log from ``start``.
+
+        Yields:
+            tuple: (record index, face ID, event name, timestamp, faces) after each
+            record; ``faces`` is the same list of ``ReplayFace`` updated in place.
+        """
+        stop = len(self) if stop is None else stop
+        faces = self.faces_at(start)
+        packed = [_pack(face.grid) for face in faces]
+        packed_previous = [_pack(face.previous_grid) for face in faces]
+        for index in range(start, stop):
+            face_id = self._apply(index, packed, packed_previous)
+            face = faces[face_id]
+            if self.kinds[index] == KEYFRAME:
+                face.previous_grid = _unpack_grid(packed_previous[face_id], self.grid_size)
+            elif self.events[index] == UPDATE:
+                face.previous_grid = face.grid
+            face.grid = _unpack_grid(packed[face_id], self.grid_size)
+            face.activity_count = int(self.activity_counts[index])
+            face.generation += 1
+            yield index, face_id, EVENT_NAMES[int(self.events[index])], float(self.timestamps[index]), faces
+
+    def play(self, visualization=None, sonification=None, start: int = 0, speed: float = 1.0, realtime: bool = True):
+        """
+        Streams the log to a visualization and/or a sonification.
+
+        Args:
+            visualization (CubeVisualization): Rendered after each record.
+            sonification (Sonification): Scanned after each record.
+            start (int): First record.
+            speed (float): Playback speed relative to the recorded timestamps.
+            realtime (bool): Wait for the recorded timestamps instead of playing as fast
+                as possible.
+        """
+        if speed <= 0:
+            raise ValueError("The playback speed must be positive.")
+
+        origin = None
+        for index, face_id, event, timestamp, faces in self.replay(start):
+            if realtime:
+                if origin is None:
+                    origin = time.perf_counter() - timestamp / speed
+                delay = origin + timestamp / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            if visualization is not None:
+                visualization.cellular_automata_list = faces
+                visualization.render()
+            if sonification is not None:
+                sonification.generate_all_midi_events(faces)
+
+    def _apply(self, index: int, packed: list, packed_previous: list) -> int:
+        """
+        Applies one record to the packed grids and previous grids of the faces.
+
+        Returns:
+            int: ID of the face changed by the record.
+        """
+        face_id = int(self.face_ids[index])
+        offset = self._payload_offsets[index]
+        payload = self._map[offset:offset + self._payload_lengths[index]]
+        kind = self.kinds[index]
+        size = self._packed_size
+
+        if kind == KEYFRAME:
+            packed[face_id] = np.frombuffer(payload, dtype=np.uint8, count=size).copy()
+            packed_previous[face_id] = np.frombuffer(payload, dtype=np.uint8, count=size, offset=size).copy()
+        else:
+            xor = np.frombuffer(payload, dtype=np.uint8) if kind == XOR_DELTA else decode_runs(payload, size)
+            if self.events[index] == UPDATE:
+                packed_previous[face_id] = packed[face_id]
+            packed[face_id] = packed[face_id] ^ xor
+        return face_id
+
+
+def _unpack_grid(packed: np.ndarray, grid_size: int) -> np.ndarray:
+    return np.unpackbits(packed, count=grid_size * grid_size).reshape(grid_size, grid_size)
@@ -0,0 +1,177 @@
+import re
+
+import numpy as np
+
+# A cell has at most 8 neighbors on its face plus one per adjacent face (4 when N = 1)
+MAX_NEIGHBORS = 12
+
+# Bit of each position of the 3x3 neighborhood in a packed neighborhood index:
+# bit (dx + 1) * 3 + (dy + 1) holds the cell at offset (dx, dy); bit 4 is the cell itself
+NEIGHBORHOOD_BITS = 9
+
+_RULE_STRING = re.compile(r"^B(?P<birth>\d*)/S(?P<survive>\d*)$", re.IGNORECASE)
+
+
+class Rule:
+    """A cellular automaton rule compiled once to a lookup table."""
+
+    def __init__(self, name: str, table, neighborhood: bool = False, birth_chance: float = None):
+        """
+        Initializes a compiled rule. Use the ``from_*`` constructors to build one.
+
+        Args:
+            name (str): Name of the rule.
+            table (array-like): uint8 lookup table. Indexed by (state, neighbor count)
+                for count rules, or by the packed 3x3 neighborhood bits when
+                ``neighborhood`` is True.
+            neighborhood (bool): Whether ``table`` is indexed by packed neighborhoods.
+            birth_chance (float): If set, a dead cell whose lower neighbor is alive is also
+                born with this probability (the stochastic birth of ``rule_set_2``).
+        """
+        self.name = name
+        self.table = np.asarray(table, dtype=np.uint8)
+        self.neighborhood = neighborhood
+        self.birth_chance = birth_chance
+
+        expected = (2 ** NEIGHBORHOOD_BITS,) if neighborhood else (2, MAX_NEIGHBORS + 1)
+        if self.table.shape != expected:
+            raise ValueError(f"Rule '{name}' table must have shape {expected}, got {self.table.shape}.")
+
+        # Neighbor counts giving birth/survival, used by the bitwise engine
+        self.birth = () if neighborhood else tuple(int(count) for count in np.flatnonzero(self.table[0]))
+        self.survive = () if neighborhood else tuple(int(count) for count in np.flatnonzero(self.table[1]))
+
+        # Nested tuples are faster than array indexing for the per-cell list engine
+        self.lookup = tuple(self.table.tolist()) if neighborhood else tuple(map(tuple, self.table.tolist()))
+
+    def __repr__(self):
+        return f"Rule({self.name!r})"
+
+    @property
+    def is_stochastic(self) -> bool:
+        return self.birth_chance is not None
+
+    @classmethod
+    def from_birth_survive(cls, name: str, birth, survive, birth_chance: float = None):
+        """
+        Compiles a Life-like rule from its birth and survival neighbor counts.
+
+        Args:
+            name (str): Name of the rule.
+            birth (iterable): Neighbor counts for which a dead cell becomes alive.
+            survive (iterable): Neighbor counts for which a living cell stays alive.
+            birth_chance (float): Optional stochastic birth probability (see ``Rule``).
+
+        Returns:
+            Rule: The compiled rule.
+        """
+        table = np.zeros((2, MAX_NEIGHBORS + 1), dtype=np.uint8)
+        for state, counts in ((0, birth), (1, survive)):
+            for count in counts:
+                if not 0 <= count <= MAX_NEIGHBORS:
+                    raise ValueError(f"Neighbor count {count} out of range in rule '{name}'.")
+                table[state, count] = 1
+        return cls(name, table, birth_chance=birth_chance)
+
+    @classmethod
+    def from_string(cls, rule_string: str, name: str = None):
+        """
+        Compiles a rule written in the Life-like "B4/S23" notation.
+
+        Args:
+            rule_string (str): Rule such as "B3/S23" (one digit per neighbor count).
+            name (str): Name of the rule (defaults to the rule string).
+
+        Returns:
+            Rule: The compiled rule.
+        """
+        match = _RULE_STRING.match(rule_string.strip())
+        if match is None:
+            raise ValueError(f"Invalid rule string '{rule_string}', expected the form 'B4/S23'.")
+        birth = [int(digit) for digit in match.group("birth")]
+        survive = [int(digit) for digit in match.group("survive")]
+        return cls.from_birth_survive(name or rule_string.upper(), birth, survive)
+
+    @classmethod
+    def from_predicate(cls, name: str, predicate):
+        """
+        Compiles a general rule from a predicate over the 3x3 neighborhood of a cell.
+
+        The predicate is called once for each of the 512 possible neighborhoods.
+        Cells beyond a face border are the orthogonal neighbors on the adjacent face;
+        diagonal positions across faces are always 0.
+
+        Args:
+            name (str): Name of the rule.
+            predicate (callable): Function taking a 3x3 tuple of 0/1 values, where
+                ``neighborhood[1][1]`` is the cell itself and ``neighborhood[0][1]`` the
+                cell above it, and returning the new state.
+
+        Returns:
+            Rule: The compiled rule.
+        """
+        table = np.zeros(2 ** NEIGHBORHOOD_BITS, dtype=np.uint8)
+        for index in range(table.size):
+            bits = [(index >> k) & 1 for k in range(NEIGHBORHOOD_BITS)]
+            neighborhood = (tuple(bits[0:3]), tuple(bits[3:6]), tuple(bits[6:9]))
+            table[index] = 1 if predicate(neighborhood) else 0
+        return cls(name, table, neighborhood=True)
+
+
+RULES = {}
+
+
+def register_rule(rule: Rule) -> Rule:
+    """
+    Adds a rule to the registry, replacing any rule with the same name.
+
+    Args:
+        rule (Rule): Compiled rule.
+
+    Returns:
+        Rule: The registered rule.
+    """
+    RULES[rule.name] = rule
+    return rule
+
+
+def get_rule(rule) -> Rule:
+    """
+    Resolves a rule from the registry.
+
+    Args:
+        rule (Rule or str): A compiled rule, a registered name or a "B4/S23" string
+            (compiled and registered on first use).
+
+    Returns:
+        Rule: The compiled rule.
+    """
+    if isinstance(rule, Rule):
+        return rule
+    if rule in RULES:
+        return RULES[rule]
+    if isinstance(rule, str) and _RULE_STRING.match(rule.strip()):
+        return register_rule(Rule.from_string(rule, name=rule))
+    raise ValueError(f"Unknown rule '{rule}'. Registered rules: {', '.join(RULES)}.")
+
+
+def resolve_rule(rule=None, use_stochastic_rule: bool = False) -> Rule:
+    """
+    Resolves the rule of an update call, keeping the boolean rule switch working.
+
+    Args:
+        rule (Rule or str): Rule to apply; if None, chosen by ``use_stochastic_rule``.
+        use_stochastic_rule (bool): Use ``rule_set_2`` instead of ``rule_set_1``.
+
+    Returns:
+        Rule: The compiled rule.
+    """
+    if rule is None:
+        rule = "rule_set_2" if use_stochastic_rule else "rule_set_1"
+    return get_rule(rule)
+
+
+# Built-in rules
+register_rule(Rule.from_birth_survive("rule_set_1", birth=[4], survive=[2, 3]))  # Conventional rule
+register_rule(Rule.from_birth_survive("rule_set_2", birth=[], survive=[2, 3], birth_chance=0.33))  # Stochastic rule
+register_rule(Rule.from_string("B3/S23", name="life"))  # Conway's Game of Life
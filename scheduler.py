@@ -0,0 +1,278 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+import main
+from instrumentation import metrics
+
+
+class FaceSnapshot:
+    """Read-only copy of the state of one face, with the attributes read by the renderer and sonification."""
+
+    __slots__ = ("grid", "previous_grid", "grid_size", "activity_count", "generation")
+
+    def __init__(self, face):
+        self.grid = _frozen(face.grid)
+        self.previous_grid = _frozen(face.previous_grid)
+        self.grid_size = face.grid_size
+        self.activity_count = face.activity_count
+        self.generation = face.generation
+
+
+class CubeSnapshot:
+    """Read-only copy of the six faces taken after a simulation tick."""
+
+    __slots__ = ("faces", "generation", "simulated_time")
+
+    def __init__(self, faces: list, generation: int, simulated_time: float):
+        self.faces = tuple(FaceSnapshot(face) for face in faces)
+        self.generation = generation
+        self.simulated_time = simulated_time
+
+
+class SnapshotBuffer:
+    """
+    Double buffer of cube snapshots.
+
+    The simulation thread builds each new snapshot off to the side (the back buffer)
+    and publishes it by swapping a single reference, so readers always get a complete,
+    immutable snapshot without holding a lock while they use it.
+    """
+
+    def __init__(self, faces: list):
+        self._lock = threading.Lock()
+        self._front = CubeSnapshot(faces, 0, 0.0)
+
+    def publish(self, faces: list, simulated_time: float) -> CubeSnapshot:
+        """Takes a snapshot of the faces and makes it the latest one."""
+        back = CubeSnapshot(faces, self._front.generation + 1, simulated_time)
+        with self._lock:
+            self._front = back
+        return back
+
+    def latest(self) -> CubeSnapshot:
+        """Returns the last published snapshot."""
+        with self._lock:
+            return self._front
+
+
+class Scheduler:
+    """
+    Runs the simulation and the MIDI output on their own threads.
+
+    The simulation thread advances a fixed-timestep clock (``timestep`` seconds per
+    tick) and updates each face with ``main.update_faces`` when its interval in
+    ``update_intervals`` has elapsed, then publishes a snapshot. The MIDI thread scans
+    the latest snapshot every ``midi_interval`` seconds. Rendering stays on the thread
+    that owns the OpenGL context and reads snapshots with ``latest_snapshot``.
+
+    Both threads sleep on an event between deadlines, so they idle instead of spinning
+    and ``stop`` wakes them immediately.
+    """
+
+    def __init__(self, faces: list, sonification=None, timestep: float = None, update_intervals=None,
+                 midi_interval: float = None, max_catch_up: int = None, stepper=None, activity_threshold=None,
+                 rule=None, low_activity_rule=None, control=None):
+        """
+        Initializes the scheduler.
+
+        Args:
+            faces (list): The six faces of the cube.
+            sonification (Sonification): MIDI output, or None to run without sound.
+            timestep (float): Duration of a simulation tick in seconds (default
+                ``main.SIMULATION_TIMESTEP``). Face intervals are rounded to whole ticks.
+            update_intervals (list): Update interval of each face (default ``main.UPDATE_INTERVALS``).
+            midi_interval (float): Interval between MIDI scans (default ``main.MIDI_EVENT_INTERVAL``).
+            max_catch_up (int): Maximum number of late ticks run back to back before the
+                clock skips ahead (default ``main.MAX_CATCH_UP``).
+            stepper (FaceStepper): Update semantics of faces due on the same tick (see
+                stepping.py; default sequential).
+            activity_threshold (int): Rule switch threshold (default ``main.ACTIVITY_THRESHOLD``).
+            rule (str): Rule of active faces (default ``main.RULE``).
+            low_activity_rule (str): Rule of quiet faces (default ``main.LOW_ACTIVITY_RULE``).
+            control (ControlPlane): Commands applied at the start of each tick (see control.py).
+
+        ``update_intervals``, ``activity_threshold``, ``rule`` and ``low_activity_rule``
+        are read on every tick, so commands run on the simulation thread may replace them.
+        """
+        self.faces = faces
+        self.sonification = sonification
+        self.timestep = main.SIMULATION_TIMESTEP if timestep is None else timestep
+        self.update_intervals = main.UPDATE_INTERVALS if update_intervals is None else update_intervals
+        self.midi_interval = main.MIDI_EVENT_INTERVAL if midi_interval is None else midi_interval
+        self.max_catch_up = main.MAX_CATCH_UP if max_catch_up is None else max_catch_up
+        self.stepper = stepper
+        self.activity_threshold = main.ACTIVITY_THRESHOLD if activity_threshold is None else activity_threshold
+        self.rule = main.RULE if rule is None else rule
+        self.low_activity_rule = main.LOW_ACTIVITY_RULE if low_activity_rule is None else low_activity_rule
+        self.control = control
+        if control is not None:
+            control.scheduler = self
+
+        if self.timestep <= 0:
+            raise ValueError("The simulation timestep must be positive.")
+
+        self.snapshots = SnapshotBuffer(faces)
+        self._commands = queue.SimpleQueue()
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._errors = []
+
+        self.ticks = 0
+        self.simulated_time = 0.0  # Time of the tick being run
+        self.face_updates = 0
+        self.skipped_ticks = 0
+        self.midi_scans = 0
+
+    @property
+    def running(self) -> bool:
+        """bool: True while the worker threads are running without errors."""
+        return bool(self._threads) and not self._stop_event.is_set()
+
+    def latest_snapshot(self) -> CubeSnapshot:
+        """Returns the last snapshot published by the simulation thread."""
+        return self.snapshots.latest()
+
+    def submit(self, command):
+        """
+        Runs a callable on the simulation thread before the next tick, e.g. a
+        perturbation, so that the faces are never modified while they are stepped.
+
+        Args:
+            command (callable): Function called without arguments.
+        """
+        self._commands.put(command)
+
+    def start(self):
+        """Starts the simulation thread and, if there is a sonification, the MIDI thread."""
+        if self._threads:
+            raise RuntimeError("The scheduler is already running.")
+
+        self._stop_event.clear()
+        targets = [("liquiprism-simulation", self._run_simulation)]
+        if self.sonification is not None:
+            targets.append(("liquiprism-midi", self._run_midi))
+        for name, target in targets:
+            thread = threading.Thread(target=self._guard, args=(target,), name=name, daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stops the worker threads and waits for them to finish.
+
+        Raises:
+            RuntimeError: If a thread does not finish within ``timeout`` seconds or
+                failed with an exception.
+        """
+        self._stop_event.set()
+        threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+            if thread.is_alive():
+                raise RuntimeError(f"Thread '{thread.name}' did not stop within {timeout} s.")
+        if self._errors:
+            error = self._errors[0]
+            self._errors = []
+            raise RuntimeError(f"Scheduler thread failed: {error!r}") from error
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _guard(self, target):
+        """Runs a thread target, recording its exception and stopping the other threads."""
+        try:
+            target()
+        except Exception as e:
+            self._errors.append(e)
+            self._stop_event.set()
+
+    def _run_commands(self):
+        while True:
+            try:
+                command = self._commands.get_nowait()
+            except queue.Empty:
+                return
+            command()
+
+    def _run_simulation(self):
+        update_intervals = intervals = None
+        last_update_times = [0.0] * len(self.faces)
+        start = time.perf_counter()
+        tick = 0
+
+        while not self._stop_event.is_set():
+            self._run_commands()
+
+            tick += 1
+            simulated_time = tick * self.timestep
+            self.simulated_time = simulated_time
+            applied = self.control.apply_due(simulated_time) if self.control is not None else 0
+
+            if self.update_intervals is not update_intervals:
+                # Half a tick of slack rounds each interval to the nearest whole number of ticks
+                update_intervals = self.update_intervals
+                intervals = [interval - self.timestep / 2 for interval in update_intervals]
+            with metrics.timer("update_faces"):
+                updated = main.update_faces(self.faces, last_update_times, simulated_time, intervals,
+                                            self.activity_threshold, self.rule, self.low_activity_rule,
+                                            self.stepper)
+            if updated or applied:
+                self.snapshots.publish(self.faces, simulated_time)
+                if applied:
+                    self.control.published()
+            self.ticks = tick
+            self.face_updates += updated
+
+            delay = start + tick * self.timestep - time.perf_counter()
+            if delay > 0:
+                self._stop_event.wait(delay)
+            elif -delay > self.max_catch_up * self.timestep:
+                # Too far behind: drop the late ticks instead of running them in a burst
+                late_ticks = int(-delay / self.timestep)
+                start += late_ticks * self.timestep
+                self.skipped_ticks += late_ticks
+                metrics.count("skipped_ticks", late_ticks)
+
+    def _run_midi(self):
+        next_scan = time.perf_counter()
+        while not self._stop_event.is_set():
+            self.sonification.generate_all_midi_events(self.snapshots.latest().faces)
+            self.midi_scans += 1
+
+            next_scan += self.midi_interval
+            delay = next_scan - time.perf_counter()
+            if delay > 0:
+                self._stop_event.wait(delay)
+            else:
+                next_scan = time.perf_counter()
+
+
+def wait_for_next_frame(next_frame: float, frame_interval: float) -> float:
+    """
+    Sleeps until the next frame is due, instead of rendering as fast as possible.
+
+    Args:
+        next_frame (float): ``time.perf_counter()`` value at which the frame is due.
+        frame_interval (float): Time between frames in seconds.
+
+    Returns:
+        float: Due time of the following frame.
+    """
+    delay = next_frame - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+        return next_frame + frame_interval
+    return time.perf_counter() + frame_interval  # Late frame: do not try to catch up
+
+
+def _frozen(grid) -> np.ndarray:
+    array = np.array(grid, dtype=np.uint8)
+    array.flags.writeable = False
+    return array
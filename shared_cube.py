@@ -0,0 +1,247 @@
+"""
+Cube whose faces live in shared memory and are stepped by worker processes, for
+faces too large to step within one core's time budget.
+
+Each face has three padded (N + 2, N + 2) buffers in one shared memory block: the
+current state, the previous state and a back buffer. On each step the main process
+copies the border rows and columns of the neighboring faces into the halo of the
+current buffers (O(N), following ``CUBE_NEIGHBORS``), every worker steps a band of
+rows of each due face from the current buffer into the back buffer, and the buffers
+of the due faces rotate. The faces are ``CellularAutomata`` views of the shared
+buffers, so rendering and sonification read them without copies.
+
+Faces due on the same step read their neighbors as they were before the step, as in
+``CubeTensor.step``. The stochastic rule draws from the per-face streams of
+``cellular_automata.seed_faces``: each band jumps to its own rows of the face's
+stream, so the result is the same for any number of workers.
+
+Usage:
+    with SharedCube(4096, workers=8, seed=1) as cube:
+        for face in cube.faces:
+            face.randomize()
+        main.update_faces(cube.faces, last_update_times, current_time)
+"""
+import os
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+from cellular_automata import seed_faces
+from cube_tensor import FaceView, build_halo_indices
+from numpy_automata import apply_rule
+from rules import resolve_rule
+
+BUFFERS = 3  # Current, previous and back buffer of each face
+
+
+def step_band(buffers: np.ndarray, task: tuple) -> tuple:
+    """
+    Steps rows ``start`` to ``stop`` of one face from its current buffer into its back buffer.
+
+    Args:
+        buffers (np.ndarray): (BUFFERS, 6, N + 2, N + 2) shared buffers.
+        task (tuple): (face_id, start, stop, current, back, rule, rng_state), where
+            ``rng_state`` is the state of the face's PCG64 stream before the step (only
+            used by stochastic rules).
+
+    Returns:
+        tuple: (face_id, number of cells of the band that changed).
+    """
+    face_id, start, stop, current, back, rule, rng_state = task
+    grid_size = buffers.shape[-1] - 2
+
+    # One more row on each side, so the rows of the band see their diagonal neighbors
+    # and the cell below them on the face itself
+    first = max(start - 1, 0)
+    last = min(stop + 1, grid_size)
+    window = buffers[current, face_id, first:last + 2]
+
+    draws = None
+    if rule.birth_chance is not None:
+        bit_generator = np.random.PCG64()
+        bit_generator.state = rng_state
+        bit_generator.advance(first * grid_size)  # The face draws one number per cell, row by row
+        draws = np.random.Generator(bit_generator).random((last - first, grid_size))
+
+    new_rows = apply_rule(rule, window, draws=draws)[start - first:stop - first]
+    buffers[back, face_id, 1 + start:1 + stop, 1:-1] = new_rows
+    changed = np.count_nonzero(new_rows != buffers[current, face_id, 1 + start:1 + stop, 1:-1])
+    return face_id, int(changed)
+
+
+def _worker(name: str, shape: tuple, connection):
+    """Worker process: steps the bands it receives until it receives None."""
+    memory = shared_memory.SharedMemory(name=name)
+    buffers = np.ndarray(shape, dtype=np.uint8, buffer=memory.buf)
+    try:
+        while True:
+            tasks = connection.recv()
+            if tasks is None:
+                break
+            try:
+                connection.send([step_band(buffers, task) for task in tasks])
+            except Exception as e:
+                connection.send(e)
+    finally:
+        del buffers
+        memory.close()
+
+
+class SharedCube:
+    """Six faces in shared memory, stepped in bands of rows by a pool of worker processes."""
+
+    def __init__(self, grid_size: int, workers: int = None, seed=None):
+        """
+        Allocates the shared buffers and starts the workers.
+
+        Args:
+            grid_size (int): Size of each face (N).
+            workers (int): Number of worker processes (default one per core).
+            seed (int): Master seed of the per-face random streams (None: fresh entropy).
+        """
+        self.grid_size = grid_size
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        if self.workers < 1:
+            raise ValueError("A shared cube needs at least one worker.")
+
+        side = grid_size + 2
+        shape = (BUFFERS, 6, side, side)
+        self._memory = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+        self.buffers = np.ndarray(shape, dtype=np.uint8, buffer=self._memory.buf)
+        self.buffers[...] = 0
+
+        # Buffer index of the current, previous and back state of each face
+        self.current = np.zeros(6, dtype=np.intp)
+        self.previous = np.ones(6, dtype=np.intp)
+        self.back = np.full(6, 2, dtype=np.intp)
+        self.activity_counts = np.zeros(6, dtype=np.int64)
+
+        destination, source = build_halo_indices(grid_size)
+        self._halo_destination, self._halo_source = destination, source
+        self._halo_destination_faces = destination // (side * side)
+        self._halo_source_faces = source // (side * side)
+
+        self.faces = [SharedCubeFace(self, face_id) for face_id in range(6)]
+        seed_faces(self.faces, seed)
+
+        # Bands of rows of each face, one per worker
+        rows = -(-grid_size // self.workers)
+        self._bands = [(start, min(start + rows, grid_size)) for start in range(0, grid_size, rows)]
+
+        context = get_context()
+        self._connections = []
+        self._processes = []
+        for index in range(self.workers):
+            connection, worker_connection = context.Pipe()
+            process = context.Process(
+                target=_worker, args=(self._memory.name, shape, worker_connection),
+                name=f"liquiprism-face-worker-{index}", daemon=True,
+            )
+            process.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stops the workers and frees the shared memory."""
+        if self._memory is None:
+            return
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for connection in self._connections:
+            connection.close()
+
+        self.buffers = None
+        try:
+            self._memory.close()
+        except BufferError:
+            pass  # Views of the faces are still referenced; the mapping goes with them
+        self._memory.unlink()
+        self._memory = None
+
+    def fill_halo(self):
+        """Copies the borders of the neighboring faces into the halo of every current buffer."""
+        flat = self.buffers.reshape(-1)
+        offsets = self.current * self.buffers[0].size
+        destination = self._halo_destination + offsets[self._halo_destination_faces]
+        flat[destination] = flat[self._halo_source + offsets[self._halo_source_faces]]
+
+    def step(self, face_ids=None, use_stochastic_rule=False, rule=None):
+        """
+        Advances several faces, splitting each one in bands of rows across the workers.
+
+        Args:
+            face_ids (list): IDs of the faces to update (all six by default).
+            use_stochastic_rule (bool or list): Use ``rule_set_2`` instead of ``rule_set_1``,
+                either for every face or per face in ``face_ids``.
+            rule (Rule, str or list): Rule from the registry in ``rules.py``, either for
+                every face or per face in ``face_ids`` (overrides ``use_stochastic_rule``).
+        """
+        if self._memory is None:
+            raise RuntimeError("The shared cube is closed.")
+        face_ids = list(range(6)) if face_ids is None else [int(face_id) for face_id in face_ids]
+        if not face_ids:
+            return
+
+        stochastic = np.broadcast_to(np.asarray(use_stochastic_rule, dtype=bool), (len(face_ids),))
+        rules = rule if isinstance(rule, (list, tuple)) else [rule] * len(face_ids)
+        rules = [resolve_rule(face_rule, face_stochastic) for face_rule, face_stochastic in zip(rules, stochastic)]
+
+        self.fill_halo()
+        tasks = [[] for _ in self._connections]
+        for face_id, face_rule in zip(face_ids, rules):
+            rng_state = self.faces[face_id].rng.bit_generator.state if face_rule.is_stochastic else None
+            for index, (start, stop) in enumerate(self._bands):
+                tasks[index % len(tasks)].append(
+                    (face_id, start, stop, self.current[face_id], self.back[face_id], face_rule, rng_state)
+                )
+
+        busy = [connection for connection, worker_tasks in zip(self._connections, tasks) if worker_tasks]
+        for connection, worker_tasks in zip(self._connections, tasks):
+            if worker_tasks:
+                connection.send(worker_tasks)
+        counts = dict.fromkeys(face_ids, 0)
+        error = None
+        for connection in busy:
+            results = connection.recv()
+            if isinstance(results, Exception):
+                error = results
+                continue
+            for face_id, changed in results:
+                counts[face_id] += changed
+        if error is not None:
+            raise RuntimeError("A shared cube worker failed.") from error
+
+        for face_id, face_rule in zip(face_ids, rules):
+            if face_rule.is_stochastic:
+                self.faces[face_id].rng.bit_generator.advance(self.grid_size * self.grid_size)
+            self.current[face_id], self.previous[face_id], self.back[face_id] = (
+                self.back[face_id], self.current[face_id], self.previous[face_id]
+            )
+            self.activity_counts[face_id] = counts[face_id]
+
+        for face_id, face_rule in zip(face_ids, rules):
+            self.faces[face_id]._notify("on_update", face_id, face_rule)
+
+
+class SharedCubeFace(FaceView):
+    """View of one face of a ``SharedCube`` with the ``CellularAutomata`` interface."""
+
+    def _grid_array(self) -> np.ndarray:
+        return self.cube.buffers[self.cube.current[self.face_id], self.face_id, 1:-1, 1:-1]
+
+    def _previous_array(self) -> np.ndarray:
+        return self.cube.buffers[self.cube.previous[self.face_id], self.face_id, 1:-1, 1:-1]
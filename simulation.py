@@ -0,0 +1,172 @@
+import importlib
+import math
+import time
+
+import numpy as np
+
+import main
+from cellular_automata import seed_faces
+
+# Face engines by name, imported on demand: (module, class)
+FACE_ENGINES = {
+    "list": ("cellular_automata", "CellularAutomata"),
+    "numpy": ("numpy_automata", "NumpyCellularAutomata"),
+    "bitboard": ("bitboard_automata", "BitboardCellularAutomata"),
+    "sparse": ("sparse_automata", "SparseCellularAutomata"),
+    "tensor": ("cube_tensor", "CubeTensor"),
+    "moore": ("topology", "Surface"),
+}
+
+
+def create_faces(grid_size: int, engine: str = "list", seed=None) -> list:
+    """
+    Creates the six faces of a cube with the chosen engine.
+
+    Args:
+        grid_size (int): Size of each face.
+        engine (str): Name of the engine in ``FACE_ENGINES``.
+        seed (int): Master seed of the per-face random streams (see
+            ``cellular_automata.seed_faces``); None keeps the global ``random`` module.
+
+    Returns:
+        list: The six faces, with the ``CellularAutomata`` interface.
+    """
+    if engine not in FACE_ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Available engines: {', '.join(FACE_ENGINES)}.")
+
+    module_name, class_name = FACE_ENGINES[engine]
+    face_class = getattr(importlib.import_module(module_name), class_name)
+    faces = face_class(grid_size).faces if engine in ("tensor", "moore") else [face_class(grid_size=grid_size) for _ in range(6)]
+    if seed is not None:
+        seed_faces(faces, seed)
+    return faces
+
+
+class SimulatedClock:
+    """Clock that jumps straight to the next time a face is due, instead of waiting."""
+
+    def __init__(self, update_intervals: list, start: float = 0.0):
+        """
+        Initializes the clock.
+
+        Args:
+            update_intervals (list): Update interval of each face, in seconds.
+            start (float): Initial time.
+        """
+        self.update_intervals = list(update_intervals)
+        self.current_time = start
+        self.last_update_times = [start] * len(self.update_intervals)
+
+    def next_update_time(self) -> float:
+        """Returns the earliest time at which a face is due, as ``main.update_faces`` checks it."""
+        next_time = min(last + interval for last, interval in zip(self.last_update_times, self.update_intervals))
+        # Step over floating point rounding so that at least one face is really due
+        while not any(
+            next_time - last >= interval for last, interval in zip(self.last_update_times, self.update_intervals)
+        ):
+            next_time = math.nextafter(next_time, math.inf)
+        return next_time
+
+
+def simulate(faces: list, steps: int = None, duration: float = None, update_intervals=None,
+             activity_threshold=None, rule=None, low_activity_rule=None, on_tick=None, clock=None,
+             until: float = None, update_mode: str = "sequential", threads: int = 0) -> dict:
+    """
+    Advances the cube headless, with the per-face cadence of ``main.update_faces`` on a
+    simulated clock.
+
+    Args:
+        faces (list): The six faces of the cube.
+        steps (int): Number of face updates to run.
+        duration (float): Wall-clock time budget in seconds (used if ``steps`` is None).
+        update_intervals (list): Update interval of each face (default ``main.UPDATE_INTERVALS``).
+        activity_threshold (int): Rule switch threshold (default ``main.ACTIVITY_THRESHOLD``).
+        rule (str): Rule of active faces (default ``main.RULE``).
+        low_activity_rule (str): Rule of quiet faces (default ``main.LOW_ACTIVITY_RULE``).
+        on_tick (callable): Optional ``on_tick(faces, simulated_time)`` called after each tick.
+        clock (SimulatedClock): Clock to advance (default a new one from ``update_intervals``).
+        until (float): Simulated time at which to stop (ticks after it are not run).
+        update_mode (str): Semantics of faces due on the same tick, "sequential" or
+            "synchronous" (see stepping.py).
+        threads (int): Threads stepping the faces due together (synchronous mode).
+
+    Returns:
+        dict: Throughput and final state summary.
+    """
+    if steps is None and duration is None and until is None:
+        raise ValueError("Either steps, duration or until must be given.")
+
+    update_intervals = main.UPDATE_INTERVALS if update_intervals is None else update_intervals
+    clock = SimulatedClock(update_intervals) if clock is None else clock
+    grid_size = faces[0].grid_size
+
+    from stepping import FaceStepper
+
+    ticks = 0
+    face_updates = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    with FaceStepper(faces, update_mode, threads) as stepper:
+        while (steps is None or face_updates < steps) and (duration is None or elapsed < duration):
+            next_time = clock.next_update_time()
+            if until is not None and next_time > until:
+                break
+            clock.current_time = next_time
+            face_updates += main.update_faces(
+                faces, clock.last_update_times, clock.current_time, update_intervals, activity_threshold,
+                rule, low_activity_rule, stepper,
+            )
+            ticks += 1
+            if on_tick is not None:
+                on_tick(faces, clock.current_time)
+            elapsed = time.perf_counter() - start
+
+    return {
+        "grid_size": grid_size,
+        "ticks": ticks,
+        "face_updates": face_updates,
+        "simulated_time": clock.current_time,
+        "wall_time": elapsed,
+        "steps_per_sec": face_updates / elapsed if elapsed > 0 else math.inf,
+        "cells_per_sec": face_updates * grid_size * grid_size / elapsed if elapsed > 0 else math.inf,
+        "activity_counts": [face.activity_count for face in faces],
+        "live_cells": [int(np.count_nonzero(np.asarray(face.grid))) for face in faces],
+    }
+
+
+def run(grid_size: int = None, engine: str = "list", seed: int = None, record: str = None, **kwargs) -> dict:
+    """
+    Creates a randomized cube and simulates it headless.
+
+    Args:
+        grid_size (int): Size of each face (default ``main.GRID_SIZE``).
+        engine (str): Name of the engine in ``FACE_ENGINES``.
+        seed (int): Master seed of the per-face streams drawn for the random initial
+            state, the stochastic rule and perturbations.
+        record (str): Path of a log to record the run to (see recording.py), with
+            simulated timestamps.
+        **kwargs: Arguments of ``simulate``.
+
+    Returns:
+        dict: Summary returned by ``simulate``, with the run configuration.
+    """
+    grid_size = main.GRID_SIZE if grid_size is None else grid_size
+    faces = create_faces(grid_size, engine, seed)
+    for face in faces:
+        face.randomize()
+
+    if record is None:
+        summary = simulate(faces, **kwargs)
+    else:
+        from recording import LogRecorder
+
+        update_intervals = kwargs.get("update_intervals")
+        clock = SimulatedClock(main.UPDATE_INTERVALS if update_intervals is None else update_intervals)
+        metadata = {"engine": engine, "seed": seed, "rule": kwargs.get("rule"),
+                    "low_activity_rule": kwargs.get("low_activity_rule")}
+        with LogRecorder(faces, record, clock=lambda: clock.current_time, metadata=metadata) as recorder:
+            summary = simulate(faces, clock=clock, **kwargs)
+        summary.update(record=record, record_bytes=recorder.bytes_written)
+
+    summary.update(engine=engine, seed=seed, update_mode=kwargs.get("update_mode", "sequential"))
+    return summary
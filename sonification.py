@@ -1,10 +1,23 @@
 from mido import Message, open_output
+import numbers
 import time
 
+import numpy as np
+
+from midi_scheduler import MidiScheduler
+from note_mapping import cell_priorities, pitch_lookup, select_onsets
+
+
+def _is_integer(value) -> bool:
+    return isinstance(value, numbers.Integral) and not isinstance(value, bool)
+
+
 class Sonification:
     """Class to generate and send MIDI messages based on cellular automata."""
 
-    def __init__(self, midi_port_name, midi_channels, max_notes=2, velocity=80):
+    def __init__(self, midi_port_name, midi_channels, max_notes=2, velocity=80, output_port=None,
+                 note_duration=0.25, max_voices=8, latency=0.005, scale="chromatic", base_note=60,
+                 transpositions=None, priority="row_major", clock=None):
         """
         Initializes the sonification system.
 
@@ -12,31 +25,143 @@ class Sonification:
             midi_port_name (str): Name of the MIDI output port.
             midi_channels (list): List of MIDI channels for each face.
             max_notes (int): Maximum number of simultaneous notes per face.
+            output_port: Already opened port (any object with ``send`` and ``close``)
+                used instead of opening ``midi_port_name``, e.g. a stand-in port
+                without MIDI hardware.
+            note_duration (float): Length of each note in seconds. Notes are sent by a
+                ``MidiScheduler``; if None, note_on and note_off are sent immediately.
+            max_voices (int): Maximum number of sounding notes per MIDI channel.
+            latency (float): Delay in seconds between a scan and its notes, so that all
+                the notes of a scan are queued before they are due and go out together.
+            scale (str): Scale of the pitches, from ``note_mapping.SCALES``. Cell (x, y)
+                plays scale degree x + y above ``base_note``.
+            base_note (int): MIDI pitch of cell (0, 0).
+            transpositions (list): Semitones added to the pitches of each face.
+            priority (str or array-like): Which onsets play when a face has more than
+                ``max_notes``: a name from ``note_mapping.PRIORITIES`` or an (N, N) array.
+            clock (callable): Time source of the note scheduler, e.g. a simulated clock.
+                With a clock the scheduler has no thread and notes are only sent when
+                ``scheduler.dispatch`` is called.
         """
         self.midi_port_name = midi_port_name
         self.midi_channels = midi_channels
         self.max_notes = max_notes
         self.velocity = velocity
+        self.note_duration = note_duration
+        self.latency = latency
+        self.scale = scale
+        self.base_note = base_note
+        self.transpositions = [0] * len(midi_channels) if transpositions is None else list(transpositions)
+        self.priority = priority
 
-        try:
-            self.output_port = open_output(midi_port_name)
-        except IOError as e:
-            raise RuntimeError(f"Could not open MIDI port '{midi_port_name}': {e}")
+        if len(self.transpositions) != len(midi_channels):
+            raise ValueError("transpositions must have one entry per MIDI channel.")
+        self._pitches = [pitch_lookup(0, scale, base_note, transpose) for transpose in self.transpositions]
+        self._priorities = {}  # grid size -> (N, N) cell priorities
+        self._scanned_generations = {}  # face ID -> face generation at the last scan
+
+        if output_port is not None:
+            self.output_port = output_port
+        else:
+            try:
+                self.output_port = open_output(midi_port_name)
+            except IOError as e:
+                raise RuntimeError(f"Could not open MIDI port '{midi_port_name}': {e}")
+
+        self.scheduler = None
+        if note_duration is not None:
+            if clock is None:
+                self.scheduler = MidiScheduler(self.output_port, max_voices=max_voices)
+            else:
+                self.scheduler = MidiScheduler(self.output_port, max_voices=max_voices, clock=clock, threaded=False)
+
+    def set_mapping(self, scale=None, transpositions=None, priority=None, base_note=None):
+        """
+        Changes how cells map to notes while the sonification runs. The new lookup tables
+        are built first and swapped in by reference, so a scan running on another thread
+        uses either the old or the new mapping.
+
+        Args:
+            scale (str): Scale of the pitches, from ``note_mapping.SCALES``.
+            transpositions (list): Semitones added to the pitches of each face.
+            priority (str or array-like): Which onsets play first (see ``__init__``).
+            base_note (int): MIDI pitch of cell (0, 0).
+        """
+        scale, base_note, transpositions, pitches, priorities = self.prepare_mapping(
+            scale, transpositions, priority, base_note
+        )
+        self.scale, self.base_note, self.transpositions = scale, base_note, transpositions
+        self._pitches = pitches
+        if priority is not None:
+            self.priority = priority
+            self._priorities = priorities
+
+    def prepare_mapping(self, scale=None, transpositions=None, priority=None, base_note=None, grid_size=None):
+        """
+        Builds the lookup tables of a mapping change without applying it, so that an
+        invalid change is rejected before it reaches the thread applying it.
 
-    def generate_midi_event(self, face_id, active_cells):
+        Args:
+            scale, transpositions, priority, base_note: As in ``set_mapping``.
+            grid_size (int): Size of the faces, to build their pitches and priorities
+                now (default on first use).
+
+        Returns:
+            tuple: (scale, base_note, transpositions, pitch tables of each face,
+            priorities by grid size).
+
+        Raises:
+            ValueError: If an argument is invalid.
+        """
+        scale = self.scale if scale is None else scale
+        base_note = self.base_note if base_note is None else base_note
+        if transpositions is not None and not isinstance(transpositions, (list, tuple, np.ndarray)):
+            raise ValueError("transpositions must be a list with one entry per MIDI channel.")
+        transpositions = self.transpositions if transpositions is None else list(transpositions)
+        if not _is_integer(base_note) or not 0 <= base_note <= 127:
+            raise ValueError(f"base_note must be a MIDI pitch from 0 to 127, got {base_note!r}.")
+        if len(transpositions) != len(self.midi_channels):
+            raise ValueError("transpositions must have one entry per MIDI channel.")
+        if not all(_is_integer(transpose) for transpose in transpositions):
+            raise ValueError("transpositions must be whole numbers of semitones.")
+        degrees = 0 if grid_size is None else 2 * grid_size - 1
+        pitches = [pitch_lookup(degrees, scale, base_note, transpose) for transpose in transpositions]
+
+        priorities = {}
+        if priority is not None and grid_size is not None:
+            priorities[grid_size] = cell_priorities(grid_size, priority)
+        elif priority is not None and not isinstance(priority, str):
+            array = np.asarray(priority, dtype=float)
+            size = len(array) if array.ndim else 0
+            priorities[size] = cell_priorities(size, array)
+        elif priority is not None:
+            cell_priorities(1, priority)  # Checks the name
+        return scale, base_note, transpositions, pitches, priorities
+
+    def generate_midi_event(self, face_id, active_cells, start_time=None):
         """
         Generates and sends MIDI messages for a specific face of the cube.
 
         Args:
             face_id (int): Index of the cube face.
             active_cells (list): List of coordinates of active cells [(x, y), ...].
+            start_time (float): Time of the notes on the scheduler clock (default now
+                plus ``latency``). Ignored without a scheduler.
         """
         max_events_per_face = self.max_notes  # Maximum events per face
         # Limit the number of active cells
         active_cells = active_cells[:max_events_per_face]
 
+        if self.scheduler is not None:
+            if start_time is None:
+                start_time = self.scheduler.clock() + self.latency
+            channel = self.midi_channels[face_id]
+            notes = [(channel, self.cell_pitch(face_id, cell[0], cell[1])) for cell in active_cells]
+            self.scheduler.play_many(notes, self.velocity, self.note_duration, start_time)
+            return
+
         for cell in active_cells:
-            note = 60 + cell[0] + cell[1]  # Calculate pitch (C4 as a base)
+            note = self.cell_pitch(face_id, cell[0], cell[1])
             channel = self.midi_channels[face_id]
 
             try:
@@ -49,31 +174,61 @@ class Sonification:
 
         #print(f"MIDI events sent on face {face_id}: {len(active_cells)}")  # Diagnostic
 
+    def cell_pitch(self, face_id, x, y):
+        """
+        Returns the MIDI pitch of a cell of a face.
+
+        Args:
+            face_id (int): Index of the cube face.
+            x (int): Row of the cell.
+            y (int): Column of the cell.
+        """
+        degree = int(x) + int(y)
+        pitches = self._pitches[face_id]
+        if degree >= len(pitches):
+            pitches = self._pitches[face_id] = pitch_lookup(
+                2 * degree + 1, self.scale, self.base_note, self.transpositions[face_id]
+            )
+        return int(pitches[degree])
+
     def generate_all_midi_events(self, faces):
         """
         Generates and sends MIDI messages for all cube faces.
 
+        Only the faces that were updated or perturbed since the last scan (their
+        ``generation`` changed) are scanned, so an unchanged face does not replay its
+        last notes.
+
         Args:
             faces (list): List of CellularAutomata instances.
         """
 
         total_midi_events = 0  # Counter for generated MIDI events
+        # Every note of the scan starts at the same time
+        start_time = self.scheduler.clock() + self.latency if self.scheduler is not None else None
         for face_id, face in enumerate(faces):
-            # Identify cells that changed from OFF → ON
-            active_cells = [
-                (x, y)
-                for x in range(face.grid_size)
-                for y in range(face.grid_size)
-                if face.previous_grid[x][y] == 0 and face.grid[x][y] == 1
-            ]
+            generation = getattr(face, "generation", None)
+            if generation is not None and self._scanned_generations.get(face_id) == generation:
+                continue
+            self._scanned_generations[face_id] = generation
+
+            # Cells that changed from OFF → ON, highest priority first
+            priorities = None
+            if not (isinstance(self.priority, str) and self.priority == "row_major"):
+                priorities = self._priorities.get(face.grid_size)
+                if priorities is None:
+                    priorities = self._priorities[face.grid_size] = cell_priorities(face.grid_size, self.priority)
+            active_cells = select_onsets(face.previous_grid, face.grid, self.max_notes, priorities)
 
             # Count events before sending them
             total_midi_events += len(active_cells)
-            self.generate_midi_event(face_id, active_cells)
+            self.generate_midi_event(face_id, active_cells, start_time)
         #print(f"MIDI events sent in this iteration: {total_midi_events}")  # Diagnostic
         
     def close(self):
-        """Closes the MIDI port."""
+        """Stops the scheduler, silencing the sounding notes, and closes the MIDI port."""
+        if self.scheduler is not None:
+            self.scheduler.close()
         try:
             self.output_port.close()
         except Exception as e:
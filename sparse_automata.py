@@ -0,0 +1,266 @@
+
+import numpy as np
+
+from numpy_automata import NumpyCellularAutomata, apply_rule, face_halo
+from rules import resolve_rule
+
+
+def tile_any(mask: np.ndarray, tile_size: int) -> np.ndarray:
+    """
+    Reduces a cell mask to a tile mask.
+
+    Args:
+        mask (np.ndarray): Boolean (rows, cols) cell mask.
+        tile_size (int): Side of a tile in cells.
+
+    Returns:
+        np.ndarray: Boolean mask with one entry per tile, True if any cell is set.
+    """
+    row_starts = np.arange(0, mask.shape[0], tile_size)
+    col_starts = np.arange(0, mask.shape[1], tile_size)
+    rows = np.logical_or.reduceat(mask, row_starts, axis=0)
+    return np.logical_or.reduceat(rows, col_starts, axis=1)
+
+
+def dilate(mask: np.ndarray) -> np.ndarray:
+    """Grows a boolean tile mask by one tile in the eight directions."""
+    padded = np.pad(mask, 1)
+    grown = np.zeros_like(mask)
+    for dx in (0, 1, 2):
+        for dy in (0, 1, 2):
+            grown |= padded[dx:dx + mask.shape[0], dy:dy + mask.shape[1]]
+    return grown
+
+
+# Cells of a window reached by each cross-face halo, and its bit in a packed neighborhood
+_HALO_SLOTS = {
+    "up": (0, slice(None), 1),
+    "down": (-1, slice(None), 7),
+    "left": (slice(None), 0, 3),
+    "right": (slice(None), -1, 5),
+}
+
+
+def window_rule(rule, window: np.ndarray, halo: dict) -> np.ndarray:
+    """
+    Applies a deterministic rule to a rectangular window of a face.
+
+    Args:
+        rule (Rule): Compiled rule without stochastic births.
+        window (np.ndarray): (h + 2, w + 2) in-face states around the window, with
+            zeros beyond the face borders.
+        halo (dict): Cross-face neighbors of the window cells lying on a face border,
+            keyed by "up", "down", "left" and "right" (missing when the window does
+            not touch that border).
+
+    Returns:
+        np.ndarray: uint8 (h, w) array with the new states.
+    """
+    height, width = window.shape[0] - 2, window.shape[1] - 2
+    grid = window[1:-1, 1:-1]
+
+    if rule.neighborhood:
+        index = np.zeros((height, width), dtype=np.uint16)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                shifted = window[1 + dx:1 + dx + height, 1 + dy:1 + dy + width].astype(np.uint16)
+                index |= shifted << ((dx + 1) * 3 + (dy + 1))
+        for direction, (rows, cols, bit) in _HALO_SLOTS.items():
+            if direction in halo:
+                index[rows, cols] |= halo[direction].astype(np.uint16) << bit
+        return rule.table[index]
+
+    counts = np.zeros((height, width), dtype=np.uint8)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            if dx or dy:
+                counts += window[1 + dx:1 + dx + height, 1 + dy:1 + dy + width]
+    for direction, (rows, cols, _) in _HALO_SLOTS.items():
+        if direction in halo:
+            counts[rows, cols] += halo[direction]
+    return rule.table[grid, counts]
+
+
+class SparseCellularAutomata(NumpyCellularAutomata):
+    """
+    NumPy face that only re-evaluates the tiles that can change.
+
+    The face is split into square tiles. After a step, only tiles next to a tile that
+    changed (or was marked dirty) and border tiles whose cross-face halo changed are
+    evaluated again, so the cost of a deterministic step scales with activity rather
+    than with grid area. Stochastic rules, rule switches and the first step evaluate
+    the whole face. ``grid``, ``previous_grid`` and ``activity_count`` match
+    ``NumpyCellularAutomata`` exactly.
+
+    Writes through ``perturb`` or by assigning ``grid`` are tracked; code writing single
+    cells of ``grid`` directly must call ``mark_dirty`` afterwards. ``grid`` and
+    ``previous_grid`` are double buffers reused between steps, so copy them to keep a
+    state for longer than one step.
+    """
+
+    def __init__(self, grid_size: int, tile_size: int = 32):
+        """
+        Initializes an empty cellular automaton grid.
+
+        Args:
+            grid_size (int): Grid size (e.g., 10 for a 10x10 grid).
+            tile_size (int): Side of a tile in cells.
+        """
+        self.tile_size = tile_size
+        self.tiles = -(-grid_size // tile_size)
+
+        # Front and back buffers with a ring of zeros, so windows never need padding
+        self._padded_grid = np.zeros((grid_size + 2, grid_size + 2), dtype=np.uint8)
+        self._padded_previous = np.zeros_like(self._padded_grid)
+        self._changed = np.zeros((self.tiles, self.tiles), dtype=bool)  # Tiles changed or dirty
+        self._halo = None  # Cross-face neighbors seen by the last step
+        self._last_rule = None
+        self._full_step = True
+        super().__init__(grid_size)
+
+    @property
+    def grid(self):
+        return self._padded_grid[1:-1, 1:-1]
+
+    @grid.setter
+    def grid(self, value):
+        self._padded_grid[1:-1, 1:-1] = value
+        self.mark_all_dirty()
+
+    @property
+    def previous_grid(self):
+        return self._padded_previous[1:-1, 1:-1]
+
+    @previous_grid.setter
+    def previous_grid(self, value):
+        self._padded_previous[1:-1, 1:-1] = value
+        self.mark_all_dirty()
+
+    def mark_all_dirty(self):
+        """Forces the next step to evaluate the whole face."""
+        self._full_step = True
+
+    def mark_dirty(self, x: int, y: int, height: int = 1, width: int = 1):
+        """
+        Marks a region written outside ``update`` so the next step re-evaluates it.
+
+        Args:
+            x (int): First row of the region.
+            y (int): First column of the region.
+            height (int): Number of rows.
+            width (int): Number of columns.
+        """
+        size = self.tile_size
+        self._changed[x // size:(x + height - 1) // size + 1, y // size:(y + width - 1) // size + 1] = True
+
+    def perturb(self, intensity=3):
+        """
+        Applies a perturbation to the system by randomly altering some cells.
+
+        Args:
+            intensity (int): Number of cells to be modified.
+        """
+        grid = self.grid
+        cells = self._perturbed_cells(intensity)
+        for x, y in cells:
+            grid[x][y] = 1 if grid[x][y] == 0 else 0  # Invert cell state
+            self.mark_dirty(x, y)
+        self._notify("on_perturb", cells)
+
+    def _write_cells(self, xs: np.ndarray, ys: np.ndarray, mode: str):
+        super()._write_cells(xs, ys, mode)
+        self._changed[xs // self.tile_size, ys // self.tile_size] = True  # Dirty tiles of the cells only
+
+    def update(self, face_id: int, all_faces: list, use_stochastic_rule: bool = False, rule=None):
+        """
+        Updates the grid according to the rules, considering the connections with other faces.
+
+        Args:
+            face_id (int): ID of the current face.
+            all_faces (list): List of all cube faces.
+            use_stochastic_rule (bool): Use ``rule_set_2`` instead of ``rule_set_1``.
+            rule (Rule or str): Rule from the registry in ``rules.py`` (overrides
+                ``use_stochastic_rule``).
+        """
+        rule = resolve_rule(rule, use_stochastic_rule)
+        halo = {direction: edge.copy() for direction, edge in face_halo(face_id, all_faces).items()}
+
+        if self._full_step or rule.is_stochastic or rule is not self._last_rule:
+            padded = self._padded_grid.copy()
+            padded[0, 1:-1] = halo["up"]
+            padded[-1, 1:-1] = halo["down"]
+            padded[1:-1, 0] = halo["left"]
+            padded[1:-1, -1] = halo["right"]
+            new_grid = apply_rule(rule, padded, None if self.rng is None else [self.rng])
+            changed = new_grid != self.grid
+            self.activity_count = int(np.count_nonzero(changed))
+            self._changed = tile_any(changed, self.tile_size)
+            self._padded_previous[1:-1, 1:-1] = new_grid
+        else:
+            self._sparse_step(rule, halo)
+
+        # Swap the buffers: the back buffer now holds the new state
+        self._padded_grid, self._padded_previous = self._padded_previous, self._padded_grid
+        self._halo = halo
+        self._last_rule = None if rule.is_stochastic else rule
+        self._full_step = False
+        self._notify("on_update", face_id, rule)
+
+    def _sparse_step(self, rule, halo: dict):
+        """Evaluates only the tiles that can change and writes them into the back buffer."""
+        size = self.tile_size
+        last = self.tiles - 1
+        active = dilate(self._changed)
+
+        # Border tiles whose cross-face neighbors changed since the last step
+        for direction, edge in halo.items():
+            moved = np.flatnonzero(edge != self._halo[direction]) // size
+            if direction == "up":
+                active[0, moved] = True
+            elif direction == "down":
+                active[last, moved] = True
+            elif direction == "left":
+                active[moved, 0] = True
+            else:
+                active[moved, last] = True
+
+        # The back buffer holds the state before the last step: bring it up to date
+        grid = self.grid
+        new_grid = self.previous_grid
+        for tile_x, tile_y in np.argwhere(self._changed):
+            rows = slice(tile_x * size, (tile_x + 1) * size)
+            cols = slice(tile_y * size, (tile_y + 1) * size)
+            new_grid[rows, cols] = grid[rows, cols]
+
+        changed_tiles = np.zeros_like(self._changed)
+        self.activity_count = 0
+
+        # Evaluate runs of consecutive active tiles on each tile row as one window
+        for tile_x in np.flatnonzero(active.any(axis=1)):
+            columns = np.flatnonzero(active[tile_x])
+            run_starts = np.flatnonzero(np.diff(columns, prepend=-2) != 1)
+            run_ends = np.append(run_starts[1:], columns.size) - 1
+            for first, final in zip(columns[run_starts], columns[run_ends]):
+                x0, x1 = tile_x * size, min((tile_x + 1) * size, self.grid_size)
+                y0, y1 = first * size, min((final + 1) * size, self.grid_size)
+
+                window_halo = {}
+                if tile_x == 0:
+                    window_halo["up"] = halo["up"][y0:y1]
+                if tile_x == last:
+                    window_halo["down"] = halo["down"][y0:y1]
+                if first == 0:
+                    window_halo["left"] = halo["left"][x0:x1]
+                if final == last:
+                    window_halo["right"] = halo["right"][x0:x1]
+
+                # Rows/columns x0..x1 + 1 of the padded buffer surround the window
+                new_window = window_rule(rule, self._padded_grid[x0:x1 + 2, y0:y1 + 2], window_halo)
+                diff = new_window != grid[x0:x1, y0:y1]
+                self.activity_count += int(np.count_nonzero(diff))
+                changed_tiles[tile_x, first:final + 1] = np.logical_or.reduceat(
+                    diff.any(axis=0), np.arange(0, y1 - y0, size)
+                )
+                new_grid[x0:x1, y0:y1] = new_window
+
+        self._changed = changed_tiles
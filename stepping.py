@@ -0,0 +1,185 @@
+"""
+Update semantics of the faces due on the same tick.
+
+- "sequential" (the original behavior): due faces update one after the other, in
+  face order, so a face stepped later already sees the new state of the faces
+  stepped before it on the same tick.
+- "synchronous": every due face reads its neighbors from a snapshot of their borders
+  taken before the tick and builds its new grid in a back buffer, which replaces its
+  grid when the face is done. The result does not depend on the order of the faces,
+  so they can be stepped concurrently by a thread pool (the NumPy kernels of the
+  numpy, sparse and bitboard engines release the GIL on large grids). Stochastic
+  rules stay reproducible in threads on seeded faces (see
+  ``cellular_automata.seed_faces``); unseeded faces share the global ``random``
+  module, whose draws then interleave in thread order.
+"""
+import copy
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+
+from bitboard_automata import BitboardCellularAutomata
+
+UPDATE_MODES = ("sequential", "synchronous")
+
+
+class FrozenBorders:
+    """
+    Stand-in neighbor face holding a copy of the four borders of a face, which are
+    the only cells its neighbors read (the interior stays zero).
+    """
+
+    def __init__(self, grid_size: int):
+        """
+        Initializes an empty snapshot.
+
+        Args:
+            grid_size (int): Size of the face.
+        """
+        self.grid_size = grid_size
+        self.grid = np.zeros((grid_size, grid_size), dtype=np.uint8)
+
+    def capture(self, face):
+        """
+        Copies the borders of a face, in O(N).
+
+        Args:
+            face: Face with the ``CellularAutomata`` interface.
+
+        Returns:
+            FrozenBorders: This snapshot.
+        """
+        grid = face.grid
+        if isinstance(grid, list):
+            self.grid[0] = grid[0]
+            self.grid[-1] = grid[-1]
+            self.grid[:, 0] = [row[0] for row in grid]
+            self.grid[:, -1] = [row[-1] for row in grid]
+        else:
+            grid = np.asarray(grid)
+            self.grid[0] = grid[0]
+            self.grid[-1] = grid[-1]
+            self.grid[:, 0] = grid[:, 0]
+            self.grid[:, -1] = grid[:, -1]
+        return self
+
+
+class _DeferredNotifications:
+    """Listener collecting the notifications of a face stepped in a worker thread."""
+
+    def __init__(self):
+        self.events = []
+
+    def on_update(self, face, *args):
+        self.events.append(("on_update", args))
+
+    def on_perturb(self, face, *args):
+        self.events.append(("on_perturb", args))
+
+
+class FaceStepper:
+    """Steps the due faces of a cube with sequential or synchronous semantics."""
+
+    def __init__(self, faces: list, mode: str = "sequential", workers: int = 0):
+        """
+        Initializes the stepper.
+
+        Args:
+            faces (list): The six faces of the cube.
+            mode (str): One of ``UPDATE_MODES``.
+            workers (int): Threads stepping due faces concurrently (0 or 1: the calling
+                thread). Needs the synchronous mode.
+        """
+        if mode not in UPDATE_MODES:
+            raise ValueError(f"Unknown update mode '{mode}'. Available modes: {', '.join(UPDATE_MODES)}.")
+        if workers > 1 and mode != "synchronous":
+            raise ValueError("Stepping faces in parallel needs the synchronous update mode.")
+
+        self.faces = faces
+        self.mode = mode
+        self.workers = workers
+        self._borders = [FrozenBorders(face.grid_size) for face in faces]
+        self._executor = (
+            ThreadPoolExecutor(workers, thread_name_prefix="liquiprism-face") if workers > 1 else None
+        )
+
+        # Faces of a CubeTensor are stepped by the tensor, which is already synchronous
+        cube = getattr(faces[0], "cube", None)
+        self._cube = cube if all(getattr(face, "cube", None) is cube for face in faces) else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stops the worker threads."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def freeze(self) -> list:
+        """
+        Takes the snapshot of every face read by a synchronous tick.
+
+        Returns:
+            list: One stand-in face per face, with the ``grid`` borders of that face.
+        """
+        frozen = []
+        for face, borders in zip(self.faces, self._borders):
+            if isinstance(face, BitboardCellularAutomata):
+                # Bitboards read each other's packed words directly
+                snapshot = copy.copy(face)
+                snapshot.words = face.words.copy()
+                frozen.append(snapshot)
+            else:
+                frozen.append(borders.capture(face))
+        return frozen
+
+    def step(self, face_ids: list, rules: list):
+        """
+        Updates several faces on the same tick.
+
+        Args:
+            face_ids (list): IDs of the due faces, in face order.
+            rules (list): Rule of each due face.
+        """
+        if self.mode == "sequential":
+            for face_id, rule in zip(face_ids, rules):
+                self.faces[face_id].update(face_id, self.faces, rule=rule)
+            return
+
+        if self._cube is not None:
+            self._cube.step(face_ids, rule=list(rules))
+            return
+
+        frozen = self.freeze()
+        if self._executor is None or len(face_ids) < 2:
+            for face_id, rule in zip(face_ids, rules):
+                self.faces[face_id].update(face_id, frozen, rule=rule)
+            return
+
+        # Listeners are called from this thread, in face order, once every face is done
+        deferred = {}
+        for face_id in face_ids:
+            face = self.faces[face_id]
+            deferred[face_id] = (face.listeners, _DeferredNotifications())
+            face.listeners = (deferred[face_id][1],)
+        try:
+            futures = [
+                self._executor.submit(self.faces[face_id].update, face_id, frozen, rule=rule)
+                for face_id, rule in zip(face_ids, rules)
+            ]
+            wait(futures)
+            for future in futures:
+                future.result()
+        finally:
+            for face_id, (listeners, notifications) in deferred.items():
+                face = self.faces[face_id]
+                face.listeners = listeners
+                for event, args in notifications.events:
+                    for listener in listeners:
+                        callback = getattr(listener, event, None)
+                        if callback is not None:
+                            callback(face, *args)
@@ -0,0 +1,265 @@
+"""
+Parameter sweeps of headless cube simulations over a process pool.
+
+Each run is described by a dict of parameters (see ``DEFAULT_PARAMETERS``). The
+summary statistics of every finished run are appended to ``<output>.csv`` and its
+time series are saved to ``<output>_series/<run_id>.npz``; runs already in the CSV
+are skipped, so an interrupted sweep resumes where it stopped.
+
+Usage:
+    python -m liquiprism sweep --output results/sweep --grid-size 5 8 --seeds 0 1 2
+"""
+import csv
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import main
+import simulation
+
+DEFAULT_PARAMETERS = {
+    "grid_size": main.GRID_SIZE,
+    "activity_threshold": main.ACTIVITY_THRESHOLD,
+    "update_intervals": tuple(main.UPDATE_INTERVALS),
+    "perturb_intensity": 0,  # Cells flipped on every face at each perturbation (0: none)
+    "perturb_interval": 30.0,  # Simulated seconds between perturbations
+    "rule": main.RULE,
+    "low_activity_rule": main.LOW_ACTIVITY_RULE,
+    "engine": "numpy",
+    "duration": 300.0,  # Simulated seconds
+    "seed": 0,
+}
+
+MAX_CYCLE_STATES = 1 << 20  # Cube states remembered by the cycle detection of a run
+
+STATISTICS = [
+    "ticks", "face_updates", "wall_time", "mean_activity", "final_activity", "live_cells",
+    "midi_notes", "midi_rate", "quiescence_time", "cycle_length",
+]
+
+
+def parameter_grid(parameters: dict, seeds=(0,)) -> list:
+    """
+    Expands lists of values into every combination of parameters and seeds.
+
+    Args:
+        parameters (dict): Parameter name -> list of values (names from ``DEFAULT_PARAMETERS``).
+        seeds (iterable): Seeds run for every combination.
+
+    Returns:
+        list: One complete parameter dict per run.
+    """
+    unknown = set(parameters) - set(DEFAULT_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {', '.join(sorted(unknown))}.")
+
+    names = list(parameters)
+    runs = []
+    for values in itertools.product(*(parameters[name] for name in names)):
+        for seed in seeds:
+            run = dict(DEFAULT_PARAMETERS)
+            run.update(zip(names, values))
+            run["update_intervals"] = tuple(float(interval) for interval in run["update_intervals"])
+            run["seed"] = seed
+            runs.append(run)
+    return runs
+
+
+def run_id(parameters: dict) -> str:
+    """Returns a stable identifier of a run from its parameters."""
+    encoded = json.dumps(parameters, sort_keys=True, default=list).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+class _MidiCounter:
+    """Stand-in MIDI port that counts note-ons."""
+
+    def __init__(self):
+        self.notes = 0
+
+    def send(self, message):
+        if message.type == "note_on":
+            self.notes += 1
+
+    def close(self):
+        pass
+
+
+def run_one(parameters: dict) -> tuple:
+    """
+    Runs one simulation and measures it.
+
+    The activity of each face is sampled after every tick; the MIDI notes are those
+    ``Sonification`` would send with a scan every ``main.MIDI_EVENT_INTERVAL``; the
+    quiescence time is the first time every face's last update changed nothing; the
+    cycle length is the simulated time between the first two visits of the same
+    cube state (grids and activity counts, which choose the next rules) at the same
+    point of the update schedule since the last perturbation. States are remembered
+    by a 128-bit digest, up to ``MAX_CYCLE_STATES`` of them.
+
+    Args:
+        parameters (dict): Complete run parameters.
+
+    Returns:
+        tuple: (summary dict, dict of time series arrays).
+    """
+    from sonification import Sonification
+
+    faces = simulation.create_faces(parameters["grid_size"], parameters["engine"], parameters["seed"])
+    for face in faces:
+        face.randomize()
+
+    clock = simulation.SimulatedClock(parameters["update_intervals"])
+    counter = _MidiCounter()
+    sonification = Sonification("sweep", main.MIDI_CHANNELS, output_port=counter, note_duration=None)
+    times, activity = [], []
+    seen_states = {}
+    measures = {"quiescence_time": None, "cycle_length": None}
+    next_scan = main.MIDI_EVENT_INTERVAL
+    next_perturbation = parameters["perturb_interval"]
+
+    def on_tick(faces, current_time):
+        nonlocal next_scan, next_perturbation
+        while current_time >= next_scan:
+            sonification.generate_all_midi_events(faces)
+            next_scan += main.MIDI_EVENT_INTERVAL
+        if parameters["perturb_intensity"] and current_time >= next_perturbation:
+            main.perturb_faces(faces, parameters["perturb_intensity"])
+            next_perturbation += parameters["perturb_interval"]
+            seen_states.clear()  # States before the perturbation do not lead to the states after it
+
+        counts = [face.activity_count for face in faces]
+        times.append(current_time)
+        activity.append(counts)
+        settled = current_time >= max(parameters["update_intervals"])  # Every face has updated
+        if measures["quiescence_time"] is None and settled and not any(counts):
+            measures["quiescence_time"] = current_time
+
+        if measures["cycle_length"] is None:
+            phase = tuple(round(current_time - last, 9) for last in clock.last_update_times)
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(np.packbits(np.array([np.asarray(face.grid, dtype=np.uint8) for face in faces])).tobytes())
+            digest.update(repr((counts, phase)).encode("ascii"))
+            state = digest.digest()
+            first_visit = seen_states.get(state)
+            if first_visit is not None:
+                measures["cycle_length"] = current_time - first_visit
+            elif len(seen_states) < MAX_CYCLE_STATES:
+                seen_states[state] = current_time
+
+    summary = simulation.simulate(
+        faces,
+        until=parameters["duration"],
+        update_intervals=parameters["update_intervals"],
+        activity_threshold=parameters["activity_threshold"],
+        rule=parameters["rule"],
+        low_activity_rule=parameters["low_activity_rule"],
+        on_tick=on_tick,
+        clock=clock,
+    )
+    sonification.close()
+
+    activity = np.array(activity, dtype=np.int64).reshape(-1, len(faces))
+    totals = activity.sum(axis=1)
+    statistics = {
+        "ticks": summary["ticks"],
+        "face_updates": summary["face_updates"],
+        "wall_time": summary["wall_time"],
+        "mean_activity": float(totals.mean()) if totals.size else 0.0,
+        "final_activity": int(totals[-1]) if totals.size else 0,
+        "live_cells": sum(summary["live_cells"]),
+        "midi_notes": counter.notes,
+        "midi_rate": counter.notes / parameters["duration"] if parameters["duration"] else 0.0,
+        **measures,
+    }
+    series = {"time": np.array(times), "activity": activity}
+    return statistics, series
+
+
+def _format(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (tuple, list)):
+        return " ".join(str(item) for item in value)
+    return str(value)
+
+
+def completed_runs(csv_path: str) -> set:
+    """
+    Returns the IDs of the runs already written to a sweep CSV, dropping a partially
+    written last line left by an interruption.
+    """
+    if not os.path.exists(csv_path):
+        return set()
+
+    with open(csv_path, "rb+") as file:
+        data = file.read()
+        if data and not data.endswith(b"\n"):
+            file.truncate(data.rfind(b"\n") + 1)
+
+    with open(csv_path, newline="") as file:
+        return {row["run_id"] for row in csv.DictReader(file)}
+
+
+def run_sweep(runs: list, output: str, workers: int = None, on_result=None) -> int:
+    """
+    Runs every parameter set not already in the output, across a process pool.
+
+    Args:
+        runs (list): Parameter dicts, e.g. from ``parameter_grid``.
+        output (str): Path prefix of the results (``.csv`` file and ``_series`` directory).
+        workers (int): Number of worker processes (default all cores).
+        on_result (callable): Optional ``on_result(run_id, parameters, statistics)``
+            called as each run finishes.
+
+    Returns:
+        int: Number of runs executed (runs found in the output are skipped).
+    """
+    csv_path = output + ".csv"
+    series_dir = output + "_series"
+    os.makedirs(series_dir, exist_ok=True)
+    if os.path.dirname(csv_path):
+        os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+
+    done = completed_runs(csv_path)
+    pending = {run_id(parameters): parameters for parameters in runs}
+    pending = {identifier: parameters for identifier, parameters in pending.items() if identifier not in done}
+    if not pending:
+        return 0
+
+    columns = ["run_id", *DEFAULT_PARAMETERS, *STATISTICS]
+    write_header = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+    with open(csv_path, "a", newline="") as file, ProcessPoolExecutor(max_workers=workers) as executor:
+        writer = csv.writer(file)
+        if write_header:
+            writer.writerow(columns)
+            file.flush()
+
+        futures = {executor.submit(run_one, parameters): identifier for identifier, parameters in pending.items()}
+        try:
+            for future in as_completed(futures):
+                identifier = futures[future]
+                statistics, series = future.result()
+
+                # The series are in place before the CSV row marks the run as done
+                temporary = os.path.join(series_dir, f"{identifier}.tmp.npz")
+                np.savez_compressed(temporary, **series)
+                os.replace(temporary, os.path.join(series_dir, f"{identifier}.npz"))
+
+                parameters = pending[identifier]
+                writer.writerow(
+                    [identifier, *(_format(parameters[name]) for name in DEFAULT_PARAMETERS),
+                     *(_format(statistics[name]) for name in STATISTICS)]
+                )
+                file.flush()
+                if on_result is not None:
+                    on_result(identifier, parameters, statistics)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return len(pending)
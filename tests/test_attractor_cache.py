@@ -0,0 +1,82 @@
+import copy
+import random
+
+import numpy as np
+
+from attractor_cache import AttractorCache
+from cellular_automata import CellularAutomata
+from numpy_automata import NumpyCellularAutomata
+from rules import Rule, register_rule
+
+
+def make_cube(face_class, seed):
+    random.seed(seed)
+    faces = [face_class(grid_size=5) for _ in range(6)]
+    for face in faces:
+        face.randomize()
+    return faces
+
+
+def test_replayed_cycle_matches_computed_steps():
+    for face_class in (CellularAutomata, NumpyCellularAutomata):
+        faces = make_cube(face_class, seed=4)
+        reference = copy.deepcopy(faces)
+        cache = AttractorCache(faces)
+        for tick in range(60):
+            due = [face_id for face_id in range(6) if tick % (face_id % 2 + 1) == 0]
+            cache.step(due)
+            for face_id in due:
+                reference[face_id].update(face_id, reference)
+            for face, reference_face in zip(faces, reference):
+                assert np.array_equal(np.array(face.grid), np.array(reference_face.grid))
+                assert np.array_equal(np.array(face.previous_grid), np.array(reference_face.previous_grid))
+                assert face.activity_count == reference_face.activity_count
+        assert cache.cycle_length is not None
+        assert cache.hits > 0
+        assert cache.transient_length + cache.cycle_length <= 60
+
+
+def test_still_life_cycle_metrics():
+    faces = [NumpyCellularAutomata(grid_size=6) for _ in range(6)]
+    faces[0].grid[2:4, 2:4] = 1  # Block: a still life
+    cache = AttractorCache(faces)
+    for _ in range(3):
+        cache.step()
+    assert cache.cycle_length == 1
+    assert cache.transient_length == 0
+    assert cache.face_cycle_lengths[0] == 1
+    assert cache.hits == 2
+
+
+def test_perturb_and_stochastic_steps_invalidate():
+    faces = [NumpyCellularAutomata(grid_size=6) for _ in range(6)]
+    cache = AttractorCache(faces)
+    cache.step()
+    cache.step()
+    assert cache.cycle_length == 1
+    faces[0].perturb(intensity=1)
+    cache.step()
+    assert cache.tick == 1
+    assert cache.cycle_length is None
+    cache.step(use_stochastic_rule=True)
+    assert cache.tick == 0
+    assert cache.metrics["cached_transitions"] == 0
+
+
+def test_rule_registered_again_under_the_same_name_misses():
+    faces = [NumpyCellularAutomata(grid_size=6) for _ in range(6)]
+    faces[0].grid[2, 1:4] = 1  # Blinker
+    cache = AttractorCache(faces)
+    register_rule(Rule.from_birth_survive("cache_test_rule", birth=[3], survive=[2, 3]))
+    for _ in range(3):
+        cache.step([0], rule="cache_test_rule")
+    assert cache.hits == 1
+
+    # Same name, different table: the blinker dies instead of oscillating
+    register_rule(Rule.from_birth_survive("cache_test_rule", birth=[3], survive=[]))
+    reference = [NumpyCellularAutomata(grid_size=6) for _ in range(6)]
+    reference[0].grid[...] = faces[0].grid
+    cache.step([0], rule="cache_test_rule")
+    reference[0].update(0, reference, rule="cache_test_rule")
+    assert np.array_equal(faces[0].grid, reference[0].grid)
+    assert cache.hits == 1
@@ -0,0 +1,25 @@
+import json
+
+import benchmarks
+
+
+def test_report_is_json_and_compares_to_itself():
+    report = benchmarks.run_benchmarks(sizes=[5, 300], engines=["list", "numpy"], rules=["rule_set_1"], min_time=0.001)
+    report = json.loads(json.dumps(report))
+
+    measured = [result for result in report["results"] if "median_s" in result]
+    skipped = [result for result in report["results"] if "skipped" in result]
+    assert {result["name"] for result in measured} >= {"update", "get_neighbors"}
+    assert any(result["engine"] == "list" and result["grid_size"] == 300 for result in skipped)
+
+    comparison = benchmarks.compare(report, report)
+    assert len(comparison) == len(measured)
+    assert not any(case["regression"] for case in comparison)
+
+
+def test_slower_case_is_a_regression():
+    baseline = {"results": [{"name": "update", "engine": "numpy", "rule": "rule_set_1", "grid_size": 5, "median_s": 1.0}]}
+    current = {"results": [{"name": "update", "engine": "numpy", "rule": "rule_set_1", "grid_size": 5, "median_s": 1.5}]}
+    (case,) = benchmarks.compare(baseline, current, tolerance=0.1)
+    assert case["regression"]
+    assert case["ratio"] == 1.5
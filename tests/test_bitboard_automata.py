@@ -0,0 +1,61 @@
+import random
+
+import numpy as np
+
+from bitboard_automata import BitboardCellularAutomata, pack_grid, unpack_grid
+from cellular_automata import CellularAutomata
+from numpy_automata import NumpyCellularAutomata
+
+
+def make_cubes(face_class, grid_size, seed):
+    random.seed(seed)
+    reference = [NumpyCellularAutomata(grid_size=grid_size) for _ in range(6)]
+    faces = [face_class(grid_size=grid_size) for _ in range(6)]
+    for face, reference_face in zip(faces, reference):
+        reference_face.randomize()
+        face.grid = reference_face.grid
+    return reference, faces
+
+
+def test_pack_roundtrip():
+    grid = np.random.default_rng(0).integers(0, 2, size=(70, 70), dtype=np.uint8)
+    assert np.array_equal(unpack_grid(pack_grid(grid, 70), 70), grid)
+
+
+def test_rule_sets_match_numpy_engine():
+    for grid_size in (1, 5, 63, 64, 65, 130):
+        for use_stochastic_rule in (False, True):
+            reference, faces = make_cubes(BitboardCellularAutomata, grid_size, seed=grid_size)
+            for _ in range(4):
+                state = random.getstate()
+                for face_id, face in enumerate(reference):
+                    face.update(face_id, reference, use_stochastic_rule)
+                random.setstate(state)
+                for face_id, face in enumerate(faces):
+                    face.update(face_id, faces, use_stochastic_rule)
+            for face, reference_face in zip(faces, reference):
+                assert np.array_equal(np.asarray(face.grid), reference_face.grid)
+                assert np.array_equal(np.asarray(face.previous_grid), reference_face.previous_grid)
+                assert face.activity_count == reference_face.activity_count
+
+
+def test_accessors_and_mixed_engines():
+    random.seed(5)
+    faces = [BitboardCellularAutomata(grid_size=5) for _ in range(3)]
+    faces += [CellularAutomata(grid_size=5) for _ in range(3)]
+    for face in faces:
+        face.randomize()
+    before = faces[0].grid[2][3]
+    faces[0].grid[2][3] = 1 - before
+    assert faces[0].grid[2][3] == 1 - before
+    assert faces[0].grid[-1][1:3] == list(np.asarray(faces[0].grid)[-1, 1:3])
+    faces[0].perturb(intensity=4)
+
+    reference = [NumpyCellularAutomata(grid_size=5) for _ in range(6)]
+    for face, reference_face in zip(faces, reference):
+        reference_face.grid = np.asarray(face.grid, dtype=np.uint8)
+    for face_id in range(6):
+        faces[face_id].update(face_id, faces)
+        reference[face_id].update(face_id, reference)
+    for face, reference_face in zip(faces, reference):
+        assert np.array_equal(np.asarray(face.grid, dtype=np.uint8), reference_face.grid)
@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+import simulation
+from broadcast import FRAME, BroadcastClient, BroadcastServer, read_frame
+from recording import KEYFRAME
+
+
+def make_faces(grid_size=12, engine="numpy", seed=0):
+    faces = simulation.create_faces(grid_size, engine, seed)
+    for face in faces:
+        face.randomize()
+    return faces
+
+
+def step(faces, count):
+    for _ in range(count):
+        for face_id, face in enumerate(faces):
+            face.update(face_id, faces, rule="B3/S23")
+
+
+async def receive_until_synced(client, faces, timeout=10.0):
+    """Applies frames until the client holds the current state of every face."""
+    deadline = time.perf_counter() + timeout
+    while not all(
+        grid is not None and np.array_equal(grid, np.asarray(face.grid)) for grid, face in zip(client.grids, faces)
+    ):
+        await asyncio.wait_for(client.receive(), deadline - time.perf_counter())
+
+
+@pytest.mark.parametrize("engine", ["list", "numpy", "bitboard"])
+def test_clients_follow_the_faces(engine):
+    faces = make_faces(engine=engine)
+
+    async def watch(port):
+        async with BroadcastClient("127.0.0.1", port) as client:
+            await receive_until_synced(client, faces)  # Keyframes on connection
+            await asyncio.to_thread(step, faces, 5)
+            await receive_until_synced(client, faces)  # Deltas
+            return client.sequences
+
+    with BroadcastServer(faces, port=0) as server:
+        sequences = asyncio.run(watch(server.port))
+    assert sequences == [5] * 6
+
+
+def test_late_joiner_starts_from_a_keyframe():
+    faces = make_faces()
+    with BroadcastServer(faces, port=0) as server:
+        step(faces, 3)
+
+        async def join():
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            frames = [await read_frame(reader) for _ in range(6)]
+            writer.close()
+            return frames
+
+        frames = asyncio.run(join())
+    assert [frame[0] for frame in frames] == [KEYFRAME] * 6
+    assert [frame[3] for frame in frames] == [3] * 6
+    for frame, face in zip(frames, faces):
+        grid = np.unpackbits(np.frombuffer(frame[6], dtype=np.uint8), count=12 * 12).reshape(12, 12)
+        assert np.array_equal(grid, np.asarray(face.grid))
+
+
+def test_deltas_are_smaller_than_keyframes():
+    faces = make_faces(grid_size=256)
+    for face in faces:
+        face.grid = np.zeros((256, 256), dtype=np.uint8)
+    with BroadcastServer(faces, port=0) as server:
+        sizes = []
+
+        async def watch():
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            for _ in range(6):
+                kind, *_, payload = await read_frame(reader)
+                sizes.append((kind, len(payload)))
+            await asyncio.to_thread(faces[0].perturb, 3)
+            kind, *_, payload = await read_frame(reader)
+            sizes.append((kind, len(payload)))
+            writer.close()
+
+        asyncio.run(watch())
+    keyframe_size = sizes[0][1]
+    assert keyframe_size == 256 * 256 // 8
+    assert sizes[-1][0] != KEYFRAME and sizes[-1][1] < keyframe_size // 50
+
+
+def test_slow_client_is_resynced_without_blocking_the_simulation():
+    faces = make_faces(grid_size=256)
+
+    async def run(server):
+        slow_reader, slow_writer = await asyncio.open_connection("127.0.0.1", server.port)
+        async with BroadcastClient("127.0.0.1", server.port) as fast:
+            await receive_until_synced(fast, faces)
+            # The slow client reads nothing while megabytes of deltas are published
+            await asyncio.to_thread(step, faces, 100)
+            await receive_until_synced(fast, faces)
+            assert fast.sequences == [100] * 6
+
+        dropped = sum(client.dropped for client in server.clients)
+        slow = BroadcastClient("127.0.0.1", server.port)
+        slow._reader, slow._writer = slow_reader, slow_writer
+        await receive_until_synced(slow, faces)  # Through a keyframe replacing the dropped deltas
+        await slow.close()
+        return dropped
+
+    with BroadcastServer(faces, port=0, queue_size=8, keyframe_interval=0) as server:
+        dropped = asyncio.run(run(server))
+    assert dropped > 0
+    assert server.frames_published == 6 * 100
+
+
+def test_many_clients_share_the_encoding():
+    faces = make_faces()
+
+    async def watch_all(port, count):
+        clients = [BroadcastClient("127.0.0.1", port) for _ in range(count)]
+        await asyncio.gather(*(client.connect() for client in clients))
+        await asyncio.gather(*(receive_until_synced(client, faces) for client in clients))
+        await asyncio.to_thread(step, faces, 2)
+        await asyncio.gather(*(receive_until_synced(client, faces) for client in clients))
+        await asyncio.gather(*(client.close() for client in clients))
+
+    with BroadcastServer(faces, port=0) as server:
+        asyncio.run(watch_all(server.port, 100))
+        assert server.frames_published == 12  # One encoded frame per change, whatever the number of clients
+
+
+def test_frame_header_layout():
+    assert FRAME.size == 24
+    with pytest.raises(ValueError):
+        BroadcastServer(make_faces(), queue_size=0)
@@ -0,0 +1,172 @@
+import json
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import simulation
+from benchmarks import FakeOutputPort
+from control import Command, ControlPlane, UdpListener, encode_osc, parse_datagram, perturb_region, send_command
+from scheduler import Scheduler
+from sonification import Sonification
+
+
+def make_scheduler(engine="numpy", **kwargs):
+    faces = simulation.create_faces(8, engine, seed=0)
+    for face in faces:
+        face.randomize()
+    control = ControlPlane(kwargs.pop("sonification", None))
+    return Scheduler(faces, control=control, **kwargs), control
+
+
+def test_commands_are_validated_when_sent():
+    _, control = make_scheduler()
+    for name, arguments in [
+        ("explode", {}),
+        ("perturb", {"face": 6}),
+        ("perturb", {"strength": 3}),
+        ("perturb", {"region": [0, 0, 0, 4]}),
+        ("perturb", {"intensity": 65}),  # More than the face area
+        ("perturb", {"intensity": 2.5}),
+        ("rule", {"rule": "no_such_rule"}),
+        ("interval", {"interval": 0.5}),
+        ("mapping", {"scale": "major"}),  # No sonification
+    ]:
+        with pytest.raises(ValueError):
+            control.send(name, **arguments)
+    with pytest.raises(ValueError):
+        Command("mapping", {"scale": "no_such_scale"})
+
+
+def test_commands_apply_at_their_tick():
+    scheduler, control = make_scheduler()
+    control.send("threshold", threshold=3, at=1.0)
+    control.send("rule", rule="B3/S23")
+    control.send("interval", face=2, interval=0.25, at=0.5)
+
+    assert control.apply_due(0.05) == 1
+    assert scheduler.rule == "B3/S23" and scheduler.activity_threshold != 3
+    intervals = scheduler.update_intervals
+    assert control.apply_due(0.5) == 1
+    assert scheduler.update_intervals is not intervals and scheduler.update_intervals[2] == 0.25
+    assert control.apply_due(0.95) == 0
+    assert control.apply_due(1.0) == 1 and scheduler.activity_threshold == 3
+    assert control.applied_commands == 3
+
+
+@pytest.mark.parametrize("engine", ["list", "numpy", "bitboard", "sparse"])
+def test_region_perturbation_stays_in_the_region(engine):
+    faces = simulation.create_faces(16, engine, seed=1)
+    face = faces[0]
+    before = np.array(face.grid, dtype=np.uint8)
+    cells = perturb_region(face, 4, 6, 3, 2, 20)
+    changed = np.argwhere(np.array(face.grid, dtype=np.uint8) != before)
+    assert len(cells) == 20
+    assert all(4 <= x < 7 and 6 <= y < 8 for x, y in cells)
+    assert all(4 <= x < 7 and 6 <= y < 8 for x, y in changed)
+    assert len(changed) > 0
+
+
+def test_running_scheduler_applies_commands_and_measures_latency():
+    scheduler, control = make_scheduler(timestep=0.005, update_intervals=[0.01] * 6)
+    with scheduler:
+        command = control.send("rule", rule="B36/S23", low_activity_rule="B36/S23")
+        perturbed = control.send("perturb", face=3, intensity=4, region=[0, 0, 2, 2])
+        deadline = time.perf_counter() + 2
+        while perturbed.published is None and time.perf_counter() < deadline:
+            time.sleep(0.005)
+    assert scheduler.rule == "B36/S23" and scheduler.low_activity_rule == "B36/S23"
+    assert command.sent <= command.applied <= command.published
+    latency = control.latency()
+    assert latency["apply"]["count"] == 2 and latency["effect"]["count"] == 2
+    assert latency["effect"]["max_ms"] < 2000
+
+
+def test_mapping_command_changes_the_pitches():
+    sonification = Sonification("test", list(range(6)), output_port=FakeOutputPort())
+    scheduler, control = make_scheduler(sonification=sonification)
+    pitch = sonification.cell_pitch(0, 0, 1)
+    control.send("mapping", base_note=48, transpositions=[0, 0, 0, 0, 0, 7])
+    control.apply_due(0.05)
+    assert sonification.cell_pitch(0, 0, 1) == pitch - 12
+    assert sonification.cell_pitch(5, 0, 1) == pitch - 12 + 7
+    sonification.close()
+
+
+def test_bad_mapping_is_rejected_and_cannot_stop_the_scheduler():
+    sonification = Sonification("test", list(range(6)), output_port=FakeOutputPort())
+    scheduler, control = make_scheduler(sonification=sonification, timestep=0.005, update_intervals=[0.01] * 6)
+    for arguments in [{"transpositions": [1, 2]}, {"base_note": "C4"}, {"base_note": 200},
+                      {"transpositions": [0.5] * 6}, {"priority": [[1, 2], [3, 4]]}, {"priority": "loudest"}]:
+        with pytest.raises(ValueError):
+            control.send("mapping", **arguments)
+    control.send("mapping", priority=np.ones((8, 8)))  # Built for the size of the faces
+    assert control.apply_due(0.0) == 1 and sonification.priority.shape == (8, 8)
+
+    def fail(**arguments):
+        raise RuntimeError("MIDI port lost")
+
+    sonification.set_mapping = fail
+    with scheduler:
+        # A command that fails anyway is dropped without stopping the simulation
+        broken = control.send("mapping", base_note=48)
+        control.send("perturb", face=1, region=[0, 0, 2, 2])
+        deadline = time.perf_counter() + 2
+        while broken.error is None and time.perf_counter() < deadline:
+            time.sleep(0.005)
+        time.sleep(0.05)
+        assert scheduler.running
+    assert control.rejected_commands == 1 and broken.applied is None
+    assert control.applied_commands >= 2
+    sonification.close()
+
+
+def test_documented_datagrams_parse():
+    import control
+    lines = [line.strip() for line in control.__doc__.splitlines() if line.strip().startswith(("{", "/"))]
+    assert len(lines) == 5
+    for line in lines:
+        if line.startswith("{"):
+            parse_datagram(line.encode())
+            continue
+        address, tags, *values = line.split("  ")[0].split()
+        values = [int(value) if tag == "i" else value for tag, value in zip(tags[1:], values)]
+        parse_datagram(encode_osc(address, *values))
+
+
+def test_datagrams():
+    command = parse_datagram(json.dumps({"command": "perturb", "face": 1, "sent": 5.0, "at": 2.0}).encode())
+    assert (command.name, command.arguments, command.sent, command.at) == ("perturb", {"face": 1}, 5.0, 2.0)
+
+    command = parse_datagram(encode_osc("/liquiprism/perturb", -1, 6, 0, 0, 2, 2))
+    assert command.arguments == {"face": None, "intensity": 6, "region": [0, 0, 2, 2]}
+    command = parse_datagram(encode_osc("/liquiprism/interval", 4, 0.75))
+    assert command.arguments == {"face": 4, "interval": 0.75}
+    command = parse_datagram(encode_osc("/liquiprism/rule", "B3/S23"))
+    assert command.arguments == {"rule": "B3/S23"}
+
+    for data in [b"[1, 2]", encode_osc("/other/perturb"), encode_osc("/liquiprism/threshold", "many"),
+                 b"/liquiprism/perturb\x00,i\x00\x00", b"/liquiprism/rule\x00\x00\x00\x00,s\x00\x00abc"]:
+        with pytest.raises(ValueError):
+            parse_datagram(data)
+
+
+def test_udp_listener_queues_commands_and_rejects_invalid_ones():
+    scheduler, control = make_scheduler()
+    with UdpListener(control, port=0) as listener:
+        send_command("threshold", port=listener.port, threshold=4)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+            sender.settimeout(2)
+            for data in [b'{"command": "threshold"}', b"/liquiprism/perturb\x00,i\x00\x00"]:
+                sender.sendto(data, ("127.0.0.1", listener.port))
+                assert "error" in json.loads(sender.recvfrom(1024)[0])
+        assert listener._thread.is_alive()
+        send_command("threshold", port=listener.port, threshold=4)
+        deadline = time.perf_counter() + 2
+        while not control.apply_due(0.05) and time.perf_counter() < deadline:
+            time.sleep(0.005)
+    assert scheduler.activity_threshold == 4
+    assert listener.rejected == 2
+    assert not any(thread.name == "liquiprism-control" for thread in threading.enumerate())
@@ -0,0 +1,41 @@
+import numpy as np
+
+from cube_geometry import FACE_COLORS, cell_colors, cell_quads, grid_lines
+
+
+def test_quads_lie_on_the_cube_faces():
+    grid_size = 4
+    vertices = cell_quads(grid_size).reshape(6, grid_size * grid_size * 4, 3)
+
+    assert vertices.dtype == np.float32
+    assert np.allclose(vertices[0][:, 2], 0.5)    # Front
+    assert np.allclose(vertices[1][:, 2], -0.5)   # Back
+    assert np.allclose(vertices[2][:, 1], 0.5)    # Top
+    assert np.allclose(vertices[3][:, 1], -0.5)   # Bottom
+    assert np.allclose(vertices[4][:, 0], -0.5)   # Left
+    assert np.allclose(vertices[5][:, 0], 0.5)    # Right
+    assert np.abs(vertices).max() <= 0.5 + 1e-6
+
+
+def test_front_face_matches_immediate_mode_layout():
+    grid_size = 5
+    size = 1 / grid_size
+    front = cell_quads(grid_size)[: grid_size * grid_size * 4]
+    # Cell (i, j) starts at (i * size - 0.5, j * size - 0.5), as in CubeVisualization.draw_face
+    i, j = 2, 3
+    first_corner = front[(i * grid_size + j) * 4]
+    assert np.allclose(first_corner, [i * size - 0.5, j * size - 0.5, 0.5])
+
+
+def test_grid_lines_count():
+    grid_size = 3
+    assert grid_lines(grid_size).shape == (6 * 2 * (grid_size + 1) * 2, 3)
+
+
+def test_cell_colors():
+    grid = np.array([[1, 0], [0, 0]], dtype=np.uint8)
+    colors = cell_colors(grid, FACE_COLORS[0])
+
+    assert colors.shape == (4 * 4, 3)
+    assert (colors[:4] == [255, 0, 0]).all()
+    assert (colors[4:] == 255).all()
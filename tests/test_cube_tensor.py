@@ -0,0 +1,40 @@
+import copy
+import random
+
+import numpy as np
+
+from cellular_automata import CellularAutomata
+from cube_tensor import CubeTensor
+
+
+def make_cubes(grid_size, seed):
+    random.seed(seed)
+    list_faces = [CellularAutomata(grid_size=grid_size) for _ in range(6)]
+    for face in list_faces:
+        face.randomize()
+    cube = CubeTensor(grid_size)
+    for face, list_face in zip(cube.faces, list_faces):
+        face.grid = list_face.grid
+    return list_faces, cube
+
+
+def test_sequential_face_updates_match_list_engine():
+    list_faces, cube = make_cubes(7, seed=1)
+    for _ in range(10):
+        for face_id in range(6):
+            list_faces[face_id].update(face_id, list_faces)
+            cube.faces[face_id].update(face_id, cube.faces)
+    for list_face, face in zip(list_faces, cube.faces):
+        assert np.array_equal(np.array(list_face.grid), face.grid)
+        assert np.array_equal(np.array(list_face.previous_grid), face.previous_grid)
+        assert list_face.activity_count == face.activity_count
+
+
+def test_batched_step_reads_neighbors_before_the_step():
+    list_faces, cube = make_cubes(6, seed=2)
+    for _ in range(5):
+        frozen = copy.deepcopy(list_faces)
+        for face_id, face in enumerate(list_faces):
+            face.update(face_id, frozen[:face_id] + [face] + frozen[face_id + 1:])
+        cube.step()
+        assert np.array_equal(np.array([face.grid for face in list_faces]), cube.grids)
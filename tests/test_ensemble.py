@@ -0,0 +1,87 @@
+import numpy as np
+
+from cube_tensor import CubeTensor
+from ensemble import Ensemble, splitmix64
+
+
+def tensor_copy(ensemble, cube):
+    tensor = CubeTensor(ensemble.grid_size)
+    tensor.grids[...] = ensemble.grids[cube]
+    tensor.activity_counts[:] = ensemble.activity_counts[cube]
+    return tensor
+
+
+def test_batched_step_matches_cube_tensor():
+    ensemble = Ensemble(4, 6, rule="rule_set_1", low_activity_rule="life", activity_threshold=[0, 0, 100, 100])
+    ensemble.randomize()
+    tensors = [tensor_copy(ensemble, cube) for cube in range(4)]
+    for _ in range(5):
+        ensemble.step()
+        for cube, tensor in enumerate(tensors):
+            # Faces at or above the threshold keep the active rule
+            tensor.step(rule="rule_set_1" if cube < 2 else "life")
+            assert np.array_equal(ensemble.grids[cube], tensor.grids)
+            assert np.array_equal(ensemble.previous[cube], tensor.previous)
+            assert np.array_equal(ensemble.activity_counts[cube], tensor.activity_counts)
+
+
+def test_rule_switch_per_face():
+    ensemble = Ensemble(1, 5, rule="life", low_activity_rule="B/S", activity_threshold=3)
+    ensemble.randomize()
+    ensemble.activity_counts[0] = [0, 5, 0, 5, 0, 5]
+    ensemble.step()
+    # B/S kills every cell of the quiet faces
+    assert ensemble.live_cells[0, ::2].sum() == 0
+    assert ensemble.live_cells[0, 1::2].sum() > 0
+
+
+def test_cubes_do_not_depend_on_the_batch():
+    parameters = dict(rule="rule_set_1", low_activity_rule="rule_set_2", perturb_intensity=4, perturb_interval=5.0)
+    batch = Ensemble(3, 5, seeds=[5, 6, 7], **parameters)
+    alone = Ensemble(1, 5, seeds=[6], **parameters)
+    for ensemble in (batch, alone):
+        ensemble.randomize()
+        ensemble.run(30.0)
+    assert np.array_equal(batch.grids[1], alone.grids[0])
+    assert np.array_equal(batch.activity_counts[1], alone.activity_counts[0])
+    assert not np.array_equal(batch.grids[0], batch.grids[2])
+
+
+def test_cadence_and_onsets():
+    ensemble = Ensemble(2, 5, update_intervals=[0.5, 1, 1.5, 2, 2.5, 3])
+    ensemble.randomize()
+    assert list(ensemble.advance()[0]) == [True, False, False, False, False, False]
+    assert ensemble.current_time == 0.5
+    assert list(ensemble.advance()[1]) == [True, True, False, False, False, False]
+
+    onsets = ensemble.onsets
+    assert np.array_equal(onsets[:, :2], ensemble.grids[:, :2] > ensemble.previous[:, :2])
+    assert not onsets[:, 2:].any()
+    assert ensemble.run(3.0) == 4  # 1.5, 2, 2.5, 3
+
+
+def test_scheduled_perturbations():
+    # B/S clears every face at each step, so only the perturbation after the last step is left
+    ensemble = Ensemble(2, 8, update_intervals=[1.0] * 6, rule="B/S", low_activity_rule="B/S",
+                        perturb_intensity=[3, 0], perturb_interval=1.0)
+    ensemble.randomize()
+    ensemble.run(2.0)
+    assert ensemble.live_cells[1].sum() == 0
+    assert 0 < ensemble.live_cells[0].sum() <= 6 * 3
+    assert ensemble.next_perturbation[0] == 3.0
+    assert ensemble.next_perturbation[1] == np.inf
+
+
+def test_cube_faces_and_random_numbers():
+    ensemble = Ensemble(2, 4)
+    ensemble.randomize()
+    ensemble.step()
+    faces = ensemble.cube_faces(1)
+    assert np.array_equal(faces[3].grid, ensemble.grids[1, 3])
+    faces[3].grid[0, 0] ^= 1
+    assert faces[3].grid[0, 0] != ensemble.grids[1, 3, 0, 0]
+
+    draws = splitmix64(np.uint64(7), np.arange(10000, dtype=np.uint64))
+    assert 0 <= draws.min() and draws.max() < 1
+    assert abs(draws.mean() - 0.5) < 0.02
+    assert np.array_equal(draws, splitmix64(np.uint64(7), np.arange(10000, dtype=np.uint64)))
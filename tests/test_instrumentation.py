@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from instrumentation import (
+    Instrumentation, JsonLinesReporter, ProfilerToggle, RollingStats, SamplingProfiler, format_hud,
+)
+
+
+def test_rolling_stats_percentiles_cover_the_last_window():
+    stats = RollingStats(window=100)
+    for value in range(200):
+        stats.add(value / 1000)  # 0 to 199 ms; only 100 to 199 are kept
+
+    summary = stats.summary()
+    kept = np.arange(100, 200)
+    assert summary["count"] == 200
+    assert summary["p50_ms"] == pytest.approx(np.percentile(kept, 50))
+    assert summary["p99_ms"] == pytest.approx(np.percentile(kept, 99))
+    assert summary["max_ms"] == pytest.approx(199)
+
+
+def test_disabled_instrumentation_records_nothing():
+    metrics = Instrumentation(enabled=False)
+    with metrics.timer("update_faces"):
+        pass
+    metrics.count("skipped_ticks")
+
+    snapshot = metrics.snapshot()
+    assert snapshot["timers"] == {}
+    assert snapshot["counters"] == {}
+
+
+def test_timers_counters_and_instrumented_methods():
+    class Port:
+        def __init__(self):
+            self.sent = []
+
+        def send(self, message):
+            self.sent.append(message)
+
+    metrics = Instrumentation(enabled=True)
+    port = Port()
+    metrics.instrument(port, "send", "midi_send")
+    for note in range(5):
+        port.send(note)
+    with metrics.timer("update_faces"):
+        time.sleep(0.002)
+    metrics.count("skipped_ticks", 3)
+
+    snapshot = metrics.snapshot()
+    assert port.sent == [0, 1, 2, 3, 4]
+    assert snapshot["timers"]["midi_send"]["count"] == 5
+    assert snapshot["timers"]["update_faces"]["p50_ms"] >= 2
+    assert snapshot["counters"] == {"skipped_ticks": 3}
+
+    lines = format_hud(snapshot)
+    assert any(line.startswith("midi_send") for line in lines)
+    assert any(line.startswith("skipped_ticks") for line in lines)
+
+
+def test_json_lines_reporter_writes_snapshots(tmp_path):
+    metrics = Instrumentation(enabled=True)
+    metrics.record("render", 0.01)
+    path = tmp_path / "metrics.jsonl"
+
+    with JsonLinesReporter(metrics, str(path), interval=0.01):
+        time.sleep(0.05)
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) >= 2
+    assert lines[-1]["timers"]["render"]["p50_ms"] == pytest.approx(10)
+
+
+def test_sampling_profiler_sees_other_threads(tmp_path):
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop, name="busy")
+    worker.start()
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    time.sleep(0.1)
+    profiler.stop()
+    stop.set()
+    worker.join()
+
+    path = tmp_path / "profile.folded"
+    profiler.save(str(path))
+    stacks = path.read_text().splitlines()
+    assert any(line.startswith("busy;") and "busy_loop" in line for line in stacks)
+
+
+def test_profiler_toggle_saves_a_profile(tmp_path):
+    toggle = ProfilerToggle("cprofile", str(tmp_path / "profile"))
+    toggle.toggle()
+    assert toggle.running
+    sum(range(1000))
+    message = toggle.toggle()
+
+    assert not toggle.running
+    assert os.path.exists(tmp_path / "profile.prof")
+    assert "profile.prof" in message
+    with pytest.raises(ValueError):
+        ProfilerToggle("perf")
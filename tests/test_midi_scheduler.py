@@ -0,0 +1,82 @@
+import time
+
+from midi_scheduler import MidiScheduler
+
+
+class RecordingPort:
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.messages = []
+
+    def send(self, message):
+        self.messages.append((self.clock(), message))
+
+    def close(self):
+        pass
+
+
+def summary(port):
+    return [(message.type, message.channel, message.note) for _, message in port.messages]
+
+
+def test_note_off_is_sent_after_duration():
+    port = RecordingPort()
+    scheduler = MidiScheduler(port)
+    start = time.perf_counter() + 0.01
+    scheduler.play(0, 60, 80, 0.05, start)
+    time.sleep(0.15)
+    scheduler.close()
+
+    (on_time, on), (off_time, off) = port.messages
+    assert (on.type, off.type) == ("note_on", "note_off")
+    assert on_time >= start
+    assert off_time >= start + 0.05  # The note-on may be late, the note-off is timed from the scheduled start
+    assert scheduler.jitter()["events"] == 2
+    assert scheduler.jitter()["max_ms"] < 50
+
+
+def test_voice_limit_steals_oldest_note():
+    port = RecordingPort()
+    scheduler = MidiScheduler(port, max_voices=2, threaded=False)
+    scheduler.play(0, 60, 80, 1.0, start=0.0)
+    scheduler.play(0, 62, 80, 1.0, start=0.1)
+    scheduler.play(0, 64, 80, 1.0, start=0.2)
+    scheduler.play(1, 60, 80, 1.0, start=0.2)  # Other channel, own voices
+    for now in (0.0, 0.1, 0.2, 2.0):
+        scheduler.dispatch(now)
+
+    assert summary(port) == [
+        ("note_on", 0, 60),
+        ("note_on", 0, 62),
+        ("note_off", 0, 60),  # Stolen
+        ("note_on", 0, 64),
+        ("note_on", 1, 60),
+        ("note_off", 0, 62),
+        ("note_off", 0, 64),
+        ("note_off", 1, 60),
+    ]
+    assert scheduler.stolen == 1
+
+
+def test_repeated_pitch_extends_the_sounding_note():
+    port = RecordingPort()
+    scheduler = MidiScheduler(port, threaded=False)
+    scheduler.play(0, 60, 80, 0.5, start=0.0)
+    scheduler.play(0, 60, 80, 0.5, start=0.3)
+    scheduler.dispatch(0.0)
+    scheduler.dispatch(0.3)
+    scheduler.dispatch(0.5)  # First note-off is dropped
+    assert summary(port) == [("note_on", 0, 60)]
+    scheduler.dispatch(0.8)
+    assert summary(port) == [("note_on", 0, 60), ("note_off", 0, 60)]
+    assert scheduler.deduplicated == 1
+
+
+def test_events_due_together_form_one_batch_and_close_silences():
+    port = RecordingPort()
+    scheduler = MidiScheduler(port, threaded=False)
+    scheduler.play_many([(0, 60), (1, 61), (2, 62)], 80, 10.0, start=1.0)
+    assert scheduler.dispatch(1.0) == 3
+    assert scheduler.batches == 1
+    scheduler.close()
+    assert [message.type for _, message in port.messages[3:]] == ["note_off"] * 3
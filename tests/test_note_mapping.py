@@ -0,0 +1,70 @@
+import random
+
+import numpy as np
+import pytest
+
+import simulation
+from benchmarks import FakeOutputPort
+from note_mapping import cell_priorities, pitch_lookup, register_scale, select_onsets
+from sonification import Sonification
+
+
+def list_scan(previous_grid, grid):
+    size = len(grid)
+    return [(x, y) for x in range(size) for y in range(size) if previous_grid[x][y] == 0 and grid[x][y] == 1]
+
+
+def test_onsets_match_the_list_scan():
+    rng = np.random.default_rng(4)
+    previous, grid = rng.integers(0, 2, size=(2, 16, 16))
+    expected = list_scan(previous, grid)
+
+    assert select_onsets(previous, grid) == expected
+    assert select_onsets(previous, grid, 3) == expected[:3]
+    row_major = cell_priorities(16, "row_major")
+    assert select_onsets(previous, grid, 3, row_major) == expected[:3]
+
+
+def test_top_k_by_priority():
+    previous = np.zeros((4, 4), dtype=np.uint8)
+    grid = np.zeros((4, 4), dtype=np.uint8)
+    grid[0, 0] = grid[1, 2] = grid[3, 3] = grid[2, 1] = 1
+
+    high = select_onsets(previous, grid, 2, cell_priorities(4, "high_pitch"))
+    assert high == [(3, 3), (1, 2)]  # (1, 2) and (2, 1) tie: row-major first
+    center = select_onsets(previous, grid, 2, cell_priorities(4, "center"))
+    assert center == [(1, 2), (2, 1)]
+    assert len(select_onsets(previous, grid, 0, cell_priorities(4, "center"))) == 0
+
+
+def test_pitch_lookup():
+    assert list(pitch_lookup(5)) == [60, 61, 62, 63, 64]
+    assert list(pitch_lookup(9, "major", transpose=2)) == [62, 64, 66, 67, 69, 71, 73, 74, 76]
+    assert pitch_lookup(200).max() == 127
+    register_scale("fifths", [0, 7])
+    assert list(pitch_lookup(4, "fifths")) == [60, 67, 72, 79]
+    with pytest.raises(ValueError):
+        pitch_lookup(4, "unknown")
+
+
+def test_sonification_scans_only_changed_faces():
+    random.seed(2)
+    faces = simulation.create_faces(6, "numpy")
+    for face in faces:
+        face.randomize()
+    port = FakeOutputPort()
+    sonification = Sonification("test", list(range(6)), output_port=port, note_duration=None,
+                                 transpositions=[0, 12, 0, 0, 0, 0])
+
+    sonification.generate_all_midi_events(faces)
+    first_scan = port.messages
+    assert first_scan > 0
+    sonification.generate_all_midi_events(faces)
+    assert port.messages == first_scan  # Nothing stepped
+
+    faces[1].update(1, faces)
+    sonification.generate_all_midi_events(faces)
+    expected = list_scan(faces[1].previous_grid, faces[1].grid)[:2]
+    assert port.messages == first_scan + 2 * len(expected)
+    assert [sonification.cell_pitch(1, x, y) for x, y in expected] == [72 + x + y for x, y in expected]
+    sonification.close()
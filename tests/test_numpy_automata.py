@@ -0,0 +1,56 @@
+import random
+
+import numpy as np
+
+from cellular_automata import CellularAutomata
+from numpy_automata import NumpyCellularAutomata
+
+
+def make_cube(face_class, grid_size, seed):
+    random.seed(seed)
+    faces = [face_class(grid_size=grid_size) for _ in range(6)]
+    for face in faces:
+        face.randomize()
+    return faces
+
+
+def run_cube(faces, steps, use_stochastic_rule):
+    for _ in range(steps):
+        for face_id, face in enumerate(faces):
+            face.update(face_id, faces, use_stochastic_rule)
+
+
+def assert_same_cube(list_faces, numpy_faces):
+    for list_face, numpy_face in zip(list_faces, numpy_faces):
+        assert np.array_equal(np.array(list_face.grid), numpy_face.grid)
+        assert np.array_equal(np.array(list_face.previous_grid), numpy_face.previous_grid)
+        assert list_face.activity_count == numpy_face.activity_count
+
+
+def test_rule_set_1_matches_list_engine():
+    for grid_size in (1, 2, 5, 8):
+        list_faces = make_cube(CellularAutomata, grid_size, seed=grid_size)
+        numpy_faces = make_cube(NumpyCellularAutomata, grid_size, seed=grid_size)
+        run_cube(list_faces, 10, use_stochastic_rule=False)
+        run_cube(numpy_faces, 10, use_stochastic_rule=False)
+        assert_same_cube(list_faces, numpy_faces)
+
+
+def test_rule_set_2_matches_list_engine_with_same_seed():
+    list_faces = make_cube(CellularAutomata, 6, seed=3)
+    numpy_faces = make_cube(NumpyCellularAutomata, 6, seed=3)
+    random.seed(42)
+    run_cube(list_faces, 5, use_stochastic_rule=True)
+    random.seed(42)
+    run_cube(numpy_faces, 5, use_stochastic_rule=True)
+    assert_same_cube(list_faces, numpy_faces)
+
+
+def test_corner_has_no_diagonal_cross_face_neighbors():
+    faces = [NumpyCellularAutomata(grid_size=3) for _ in range(6)]
+    # Diagonal of face 0's top-left corner on the upper face: only orthogonal links count
+    faces[4].grid[-1] = [0, 1, 0]
+    faces[0].grid[0][0] = 1
+    faces[0].grid[1][1] = 1
+    faces[0].update(0, faces)
+    assert faces[0].grid[0][0] == 0
@@ -0,0 +1,38 @@
+import time
+
+from mido import MidiFile, tick2second
+
+import offline_render
+
+
+def test_render_file_is_faster_than_real_time(tmp_path):
+    path = tmp_path / "render.mid"
+    start = time.perf_counter()
+    summary = offline_render.render_file(str(path), 120, grid_size=8, engine="numpy", seed=3, note_duration=0.3)
+    assert time.perf_counter() - start < 10
+    assert summary["messages"] > 0
+
+    midi_file = MidiFile(str(path))
+    assert 119 < midi_file.length <= 121
+    tempo = midi_file.tracks[0][0].tempo
+    note_ons = note_offs = 0
+    for track in midi_file.tracks[1:]:
+        seconds = 0.0
+        sounding = {}
+        for message in track:
+            assert message.time >= 0
+            seconds += tick2second(message.time, midi_file.ticks_per_beat, tempo)
+            if message.type == "note_on":
+                note_ons += 1
+                sounding[message.note] = seconds
+            elif message.type == "note_off":
+                note_offs += 1
+                assert seconds - sounding.pop(message.note) <= 0.3 + 0.01
+    assert note_ons == note_offs
+
+
+def test_same_seed_renders_same_file(tmp_path):
+    paths = [tmp_path / "a.mid", tmp_path / "b.mid"]
+    for path in paths:
+        offline_render.render_file(str(path), 30, seed=8)
+    assert paths[0].read_bytes() == paths[1].read_bytes()
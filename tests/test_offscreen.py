@@ -0,0 +1,103 @@
+import os
+import struct
+import subprocess
+import sys
+import zlib
+
+import numpy as np
+import pytest
+
+import main
+import simulation
+from offscreen import PngSequenceWriter, log_frames, simulation_frames, write_png
+from recording import LogPlayer, LogRecorder
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_png(path):
+    """Decodes the unfiltered RGBA PNG files written by ``write_png``."""
+    with open(path, "rb") as file:
+        data = file.read()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    width, height = struct.unpack(">II", data[16:24])
+    length = struct.unpack(">I", data[33:37])[0]
+    assert data[37:41] == b"IDAT"
+    rows = np.frombuffer(zlib.decompress(data[41:41 + length]), dtype=np.uint8).reshape(height, -1)
+    assert not rows[:, 0].any()
+    return rows[:, 1:].reshape(height, width, 4)
+
+
+def test_png_sequence_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (6, 9, 4), dtype=np.uint8) for _ in range(5)]
+    writer = PngSequenceWriter(str(tmp_path / "frames" / "frame_%03d.png"), workers=2)
+    for frame in frames:
+        writer.write(frame)
+    writer.close()
+
+    for index, frame in enumerate(frames):
+        assert np.array_equal(read_png(tmp_path / "frames" / f"frame_{index:03d}.png"), frame)
+    with pytest.raises(ValueError):
+        PngSequenceWriter(str(tmp_path / "frame.png"))
+    with pytest.raises(ValueError):
+        write_png(str(tmp_path / "rgb.png"), np.zeros((2, 2, 3), dtype=np.uint8))
+
+
+def test_simulation_frames_match_the_simulated_clock():
+    faces = simulation.create_faces(6, "numpy", seed=3)
+    reference = simulation.create_faces(6, "numpy", seed=3)
+    for face, other in zip(faces, reference):
+        face.randomize()
+        other.randomize()
+
+    states = [[face.grid.copy() for face in state] for state in simulation_frames(faces, 4.0, 2)]
+    assert len(states) == 8
+
+    clock = simulation.SimulatedClock(main.UPDATE_INTERVALS)
+    for frame, state in enumerate(states):
+        simulation.simulate(reference, until=frame / 2, clock=clock)
+        assert all(np.array_equal(grid, face.grid) for grid, face in zip(state, reference))
+
+
+def test_log_frames_sample_the_recorded_timeline(tmp_path):
+    faces = simulation.create_faces(6, "numpy", seed=4)
+    for face in faces:
+        face.randomize()
+    clock = simulation.SimulatedClock(main.UPDATE_INTERVALS)
+    path = tmp_path / "session.lqp"
+    with LogRecorder(faces, str(path), clock=lambda: clock.current_time):
+        simulation.simulate(faces, until=6.0, clock=clock)
+
+    with LogPlayer(str(path)) as player:
+        states = [[face.grid.copy() for face in state] for state in log_frames(player, 2, start=1.0, duration=4.0)]
+        assert len(states) == 8
+        for frame, state in enumerate(states):
+            expected = player.faces_at(player.step_at_time(1.0 + frame / 2))
+            assert all(np.array_equal(grid, face.grid) for grid, face in zip(state, expected))
+
+
+def test_offscreen_render_writes_every_frame(tmp_path):
+    # In a subprocess, since the OpenGL platform is chosen once per process
+    # Only a missing context skips the test; any error of the rendering itself fails it
+    script = (
+        "import sys, offscreen\n"
+        "try:\n"
+        "    offscreen.select_platform('egl')\n"
+        "    import offscreen_gl\n"
+        "    offscreen_gl.create_context('egl', 64, 48).close()\n"
+        "except (ImportError, RuntimeError) as e:\n"
+        "    print('UNAVAILABLE', e)\n"
+        "    sys.exit()\n"
+        f"print(offscreen.render_video({str(tmp_path / 'f_%02d.png')!r}, duration=1, fps=6, size=(64, 48), seed=1))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, timeout=300)
+    if result.stdout.startswith("UNAVAILABLE"):
+        pytest.skip(f"No windowless OpenGL context: {result.stdout.strip()}")
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    frames = sorted(os.listdir(tmp_path))
+    assert frames == [f"f_{index:02d}.png" for index in range(6)]
+    image = read_png(tmp_path / frames[-1])
+    assert image.shape == (48, 64, 4)
+    assert (image[..., :3] == 0).all(axis=-1).any()  # Grid lines were drawn over the white background
@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+
+import simulation
+from cellular_automata import CUBE_NEIGHBORS
+from perturbation import (PATTERNS, Disk, PerturbationSchedule, RandomMask, Stamp, Wave, apply_pattern,
+                          register_pattern)
+
+
+def grids(faces):
+    return [np.asarray(face.grid, dtype=np.uint8) for face in faces]
+
+
+@pytest.mark.parametrize("engine", ["list", "numpy", "bitboard", "sparse", "tensor"])
+def test_perturb_cells_matches_across_engines(engine):
+    reference = simulation.create_faces(70, "numpy", seed=2)
+    faces = simulation.create_faces(70, engine, seed=2)
+    for face, other in zip(faces, reference):
+        face.randomize()
+        other.randomize()
+
+    xs, ys = [0, 69, 3, 3, 64, 64], [0, 69, 63, 63, 63, 65]  # Repeated cell and cells sharing a packed word
+    events = []
+
+    class Listener:
+        def on_perturb(self, face, cells):
+            events.append(cells)
+
+    faces[1].add_listener(Listener())
+    for mode in ("flip", "set", "clear", "flip"):
+        assert faces[1].perturb_cells(xs, ys, mode) == reference[1].perturb_cells(xs, ys, mode)
+        assert all(np.array_equal(a, b) for a, b in zip(grids(faces), grids(reference)))
+    assert events[0] == [(0, 0), (3, 63), (64, 63), (64, 65), (69, 69)]
+
+    with pytest.raises(ValueError):
+        faces[0].perturb_cells([70], [0])
+    with pytest.raises(ValueError):
+        faces[0].perturb_cells([0], [0], mode="toggle")
+
+
+def test_sparse_faces_step_perturbed_tiles():
+    # A quiescent sparse face only steps dirty tiles, so a perturbation must mark them
+    reference = simulation.create_faces(64, "numpy")
+    faces = simulation.create_faces(64, "sparse")
+    for step in range(12):
+        if step == 4:
+            apply_pattern(reference, Stamp("r_pentomino", 30, 40), [2])
+            apply_pattern(faces, Stamp("r_pentomino", 30, 40), [2])
+        if step == 8:
+            apply_pattern(reference, Disk(60, 3, 3), [5])
+            apply_pattern(faces, Disk(60, 3, 3), [5])
+        for face_id in range(6):
+            reference[face_id].update(face_id, reference, rule="B3/S23")
+            faces[face_id].update(face_id, faces, rule="B3/S23")
+        assert [face.activity_count for face in faces] == [face.activity_count for face in reference]
+    assert all(np.array_equal(a, b) for a, b in zip(grids(faces), grids(reference)))
+    assert faces[2].activity_count > 0
+
+
+def test_patterns():
+    faces = simulation.create_faces(32, "numpy", seed=5)
+
+    assert apply_pattern(faces, Disk(0, 0, 2), [0]) == 6  # Quarter disk clipped by the corner
+    assert apply_pattern(faces, Stamp("glider", 30, 30), [1]) == 1
+    assert apply_pattern(faces, Stamp("acorn", 10, 10), [2]) == np.sum(PATTERNS["acorn"])
+    assert grids(faces)[2][12, 10:17].tolist() == [1, 1, 0, 0, 1, 1, 1]
+
+    written = apply_pattern(faces, RandomMask(0.25), [3])
+    assert written == grids(faces)[3].sum() and 150 < written < 370
+    same = simulation.create_faces(32, "numpy", seed=5)
+    apply_pattern(same, RandomMask(0.25), [3])
+    assert np.array_equal(grids(same)[3], grids(faces)[3])  # Drawn from the face's stream
+
+    register_pattern("dot", [[1]])
+    assert apply_pattern(faces, Stamp("dot", 5, 5, mode="clear"), [4]) == 1
+    for make in (lambda: Stamp("nothing", 0, 0), lambda: RandomMask(2), lambda: Wave(0, "north"),
+                 lambda: register_pattern("empty", [[0]])):
+        with pytest.raises(ValueError):
+            make()
+
+
+def test_wave_crosses_face_borders():
+    faces = simulation.create_faces(8, "numpy")
+    wave = Wave(0, "right", width=3, speed=2)
+    apply_pattern(faces, wave, age=3)  # Columns 6 and 7 of face 0, then column 0 of its right neighbor
+    state = grids(faces)
+    assert state[0][:, 6:].all() and state[0].sum() == 16
+    right = CUBE_NEIGHBORS[0]["right"]
+    assert state[right][:, 0].all() and state[right].sum() == 8
+
+    faces = simulation.create_faces(8, "numpy")
+    apply_pattern(faces, Wave(4, "up"), age=9)  # One row into face 2, from its first row bordering face 4
+    above = CUBE_NEIGHBORS[4]["up"]
+    assert grids(faces)[above][1].all() and grids(faces)[above].sum() == 8
+    assert Wave(4, "up").lifetime(8) == 32
+
+
+@pytest.mark.parametrize("start, direction", [(0, "down"), (0, "up"), (4, "down"), (1, "up"), (5, "left")])
+def test_wave_laps_enter_each_face_on_the_shared_edge(start, direction):
+    size = 6
+    edges = {"up": (slice(0, 1), slice(None)), "down": (slice(size - 1, size), slice(None)),
+             "left": (slice(None), slice(0, 1)), "right": (slice(None), slice(size - 1, size))}
+    visited = []
+    for hop in range(4):
+        faces = simulation.create_faces(size, "numpy")
+        apply_pattern(faces, Wave(start, direction), age=hop * size)  # First line of the band on each face
+        (face_id,) = [face_id for face_id, grid in enumerate(grids(faces)) if grid.any()]
+        grid = grids(faces)[face_id]
+        (edge,) = [edge for edge, index in edges.items() if grid[index].all() and grid.sum() == size]
+        if hop:
+            assert CUBE_NEIGHBORS[face_id][edge] == visited[-1]
+        visited.append(face_id)
+    assert len(set(visited)) == 4
+    assert CUBE_NEIGHBORS[start][direction] == visited[1]
+
+
+def test_schedule_applies_patterns_at_their_steps():
+    faces = simulation.create_faces(8, "numpy")
+    schedule = PerturbationSchedule(faces)
+    schedule.add(3, Stamp("block", 0, 0, mode="flip"), faces=[0], every=2, count=3)
+    schedule.add(2, Wave(1, "down", distance=16), faces=[1])
+    history = []
+    for _ in range(20):
+        schedule.advance()
+        history.append([int(grid.sum()) for grid in grids(faces)])
+
+    assert [state[0] for state in history[:9]] == [0, 0, 4, 4, 0, 0, 4, 4, 4]
+    assert history[1][1] == 8 and history[8][1] == 64 and history[16][1] == 64
+    assert schedule.pending == 0
+    with pytest.raises(ValueError):
+        schedule.add(20, RandomMask(0.1))
+
+    faces = simulation.create_faces(8, "numpy", seed=1)
+    schedule = PerturbationSchedule(faces)
+    schedule.add(1, RandomMask(0.5))
+    simulation.simulate(faces, steps=6, update_intervals=[1] * 6, on_tick=schedule.on_tick)
+    assert schedule.step == 1 and schedule.cells_written > 0
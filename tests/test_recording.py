@@ -0,0 +1,125 @@
+import random
+
+import numpy as np
+import pytest
+
+import simulation
+from recording import LogPlayer, LogRecorder, decode_runs, encode_runs
+
+
+class StateLog:
+    """Listener storing the state of every face after each record."""
+
+    def __init__(self, faces):
+        self.faces = faces
+        self.states = [self.capture()]
+
+    def capture(self):
+        return [(np.array(face.grid, dtype=np.uint8), np.array(face.previous_grid, dtype=np.uint8),
+                 face.activity_count) for face in self.faces]
+
+    def on_update(self, face, face_id, rule):
+        self.states.append(self.capture())
+
+    def on_perturb(self, face, cells):
+        self.states.append(self.capture())
+
+
+def test_runs_round_trip():
+    rng = np.random.default_rng(0)
+    xor = np.zeros(1000, dtype=np.uint8)
+    xor[rng.choice(1000, 50, replace=False)] = rng.integers(1, 256, 50)
+    assert np.array_equal(decode_runs(encode_runs(xor), 1000), xor)
+    assert not decode_runs(encode_runs(np.zeros(8, dtype=np.uint8)), 8).any()
+
+
+@pytest.mark.parametrize("engine", ["list", "numpy"])
+def test_player_rebuilds_every_step(tmp_path, engine):
+    random.seed(5)
+    faces = simulation.create_faces(12, engine)
+    for face in faces:
+        face.randomize()
+    path = tmp_path / "session.lqp"
+    recorder = LogRecorder(faces, str(path), keyframe_interval=4, metadata={"engine": engine})
+    log = StateLog(faces)
+    for face in faces:
+        face.add_listener(log)
+
+    for tick in range(30):
+        face_id = tick % 6
+        faces[face_id].update(face_id, faces, rule="rule_set_2")
+        if tick == 10:
+            faces[2].perturb(intensity=7)
+    recorder.close()
+
+    with LogPlayer(str(path)) as player:
+        assert player.metadata == {"engine": engine}
+        assert len(player) == 6 + len(log.states) - 1
+        for step in (6, 17, len(player)):
+            rebuilt = player.faces_at(step)
+            for face, (grid, previous_grid, activity_count) in zip(rebuilt, log.states[max(0, step - 6)]):
+                assert np.array_equal(face.grid, grid)
+                assert np.array_equal(face.previous_grid, previous_grid)
+                assert face.activity_count == activity_count
+
+        for index, face_id, event, timestamp, rebuilt in player.replay(start=6):
+            expected = log.states[index - 5]
+            for face, (grid, previous_grid, _) in zip(rebuilt, expected):
+                assert np.array_equal(face.grid, grid)
+                assert np.array_equal(face.previous_grid, previous_grid)
+
+
+def test_player_reads_empty_and_interrupted_logs(tmp_path):
+    path = tmp_path / "session.lqp"
+    path.write_bytes(b"")
+    with LogPlayer(str(path)) as player:
+        assert len(player) == 0 and player.duration == 0.0 and player.metadata == {}
+
+    faces = simulation.create_faces(10, "numpy", seed=1)
+    for face in faces:
+        face.randomize()
+    with LogRecorder(faces, str(path), metadata={"run": 1}):
+        for face_id in range(6):
+            faces[face_id].update(face_id, faces)
+    data = path.read_bytes()
+    with LogPlayer(str(path)) as player:
+        complete = len(player)
+        expected = [face.grid.copy() for face in player.faces_at(complete - 1)]
+
+    path.write_bytes(data[:-3])  # Killed while writing the last record
+    with LogPlayer(str(path)) as player:
+        assert len(player) == complete - 1 and player.metadata == {"run": 1}
+        assert all(np.array_equal(face.grid, grid) for face, grid in zip(player.faces_at(len(player)), expected))
+    for length in (2, 10):  # Partial header
+        path.write_bytes(data[:length])
+        with LogPlayer(str(path)) as player:
+            assert len(player) == 0
+
+    path.write_bytes(b"not a log")
+    with pytest.raises(ValueError):
+        LogPlayer(str(path))
+
+
+def test_quiet_session_is_small(tmp_path):
+    faces = simulation.create_faces(64, "numpy")
+    faces[0].grid[10:12, 10:12] = 1  # A still block
+    path = tmp_path / "quiet.lqp"
+    with LogRecorder(faces, str(path), keyframe_interval=1000) as recorder:
+        for _ in range(100):
+            for face_id, face in enumerate(faces):
+                face.update(face_id, faces, rule="life")
+    keyframes = 6 * 2 * 64 * 64 // 8
+    assert recorder.bytes_written < keyframes + 600 * 40
+
+
+def test_recorded_hour_is_small(tmp_path):
+    path = tmp_path / "hour.lqp"
+    updates_per_hour = sum(round(3600 / interval) for interval in (0.5, 1, 1.5, 2, 2.5, 3))
+    summary = simulation.run(grid_size=5, engine="numpy", seed=1, steps=updates_per_hour, record=str(path))
+    assert summary["record_bytes"] < 1_000_000
+
+    with LogPlayer(str(path)) as player:
+        assert player.duration == pytest.approx(3600)
+        assert player.metadata["seed"] == 1
+        last = player.faces_at(len(player))
+        assert [int(face.grid.sum()) for face in last] == summary["live_cells"]
@@ -0,0 +1,64 @@
+import random
+
+import numpy as np
+import pytest
+
+from bitboard_automata import BitboardCellularAutomata
+from cellular_automata import CellularAutomata
+from cube_tensor import CubeTensor
+from numpy_automata import NumpyCellularAutomata
+from rules import RULES, Rule, get_rule, register_rule
+
+
+def make_faces(grid_size, seed):
+    random.seed(seed)
+    reference = [CellularAutomata(grid_size=grid_size) for _ in range(6)]
+    for face in reference:
+        face.randomize()
+    cube = CubeTensor(grid_size)
+    backends = [
+        [NumpyCellularAutomata(grid_size=grid_size) for _ in range(6)],
+        [BitboardCellularAutomata(grid_size=grid_size) for _ in range(6)],
+        cube.faces,
+    ]
+    for faces in backends:
+        for face, reference_face in zip(faces, reference):
+            face.grid = np.array(reference_face.grid, dtype=np.uint8)
+    return reference, backends
+
+
+def test_rule_string_parsing():
+    rule = Rule.from_string("b36/s23")
+    assert rule.birth == (3, 6)
+    assert rule.survive == (2, 3)
+    assert get_rule("rule_set_1").birth == (4,)
+    with pytest.raises(ValueError):
+        Rule.from_string("B9/S23x")
+    with pytest.raises(ValueError):
+        get_rule("no_such_rule")
+
+
+def test_builtin_rules_match_rule_methods():
+    face = CellularAutomata(grid_size=1)
+    for state in (0, 1):
+        for count in range(9):
+            neighbors = [1] * count
+            assert RULES["rule_set_1"].lookup[state][count] == face.rule_set_1(state, neighbors)
+
+
+def test_every_backend_applies_the_same_rule():
+    majority = register_rule(Rule.from_predicate("majority", lambda n: sum(map(sum, n)) >= 5))
+    for rule in ("rule_set_1", "rule_set_2", "B36/S23", majority):
+        reference, backends = make_faces(9, seed=7)
+        for _ in range(3):
+            state = random.getstate()
+            for face_id, face in enumerate(reference):
+                face.update(face_id, reference, rule=rule)
+            for faces in backends:
+                random.setstate(state)
+                for face_id, face in enumerate(faces):
+                    face.update(face_id, faces, rule=rule)
+        for faces in backends:
+            for face, reference_face in zip(faces, reference):
+                assert np.array_equal(np.asarray(face.grid, dtype=np.uint8), np.array(reference_face.grid))
+                assert face.activity_count == reference_face.activity_count
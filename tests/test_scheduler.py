@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+import simulation
+from benchmarks import FakeOutputPort
+from scheduler import Scheduler
+from sonification import Sonification
+
+
+def test_threads_step_faces_and_stop_cleanly():
+    faces = simulation.create_faces(5, "numpy")
+    for face in faces:
+        face.randomize()
+    sonification = Sonification("test", list(range(6)), output_port=FakeOutputPort())
+    scheduler = Scheduler(faces, sonification, timestep=0.01, update_intervals=[0.02, 0.04, 0.06, 0.08, 0.1, 0.12],
+                          midi_interval=0.02)
+
+    with scheduler:
+        time.sleep(0.3)
+        snapshot = scheduler.latest_snapshot()
+        assert scheduler.running
+    sonification.close()
+    assert not scheduler.running
+    assert not any(thread.name.startswith("liquiprism-") for thread in threading.enumerate())
+
+    assert scheduler.ticks > 0 and scheduler.face_updates > 0 and scheduler.midi_scans > 0
+    assert snapshot.generation > 0
+    assert len(snapshot.faces) == 6
+    with pytest.raises(ValueError):
+        snapshot.faces[0].grid[0, 0] = 1  # Snapshots are read-only
+
+
+def test_intervals_are_counted_in_ticks():
+    faces = simulation.create_faces(4, "numpy")
+    scheduler = Scheduler(faces, timestep=0.001, update_intervals=[0.001, 0.002, 0.003, 0.004, 0.005, 0.006])
+    counts = [0] * 6
+
+    class Counter:
+        def on_update(self, face, face_id, rule):
+            counts[face_id] += 1
+
+    for face in faces:
+        face.add_listener(Counter())
+    done = threading.Event()
+    scheduler.submit(lambda: None)
+    scheduler.start()
+    time.sleep(0.1)
+    scheduler.submit(done.set)
+    assert done.wait(1)
+    scheduler.stop()
+
+    # Face i updates every (i + 1) ticks
+    assert counts[0] >= 6 * counts[5]
+    assert counts[0] - 1 <= 2 * counts[1] <= counts[0] + 1
+
+
+def test_thread_error_is_raised_on_stop():
+    faces = simulation.create_faces(4, "numpy")
+    scheduler = Scheduler(faces, timestep=0.001)
+    scheduler.start()
+
+    def fail():
+        raise KeyError("boom")
+
+    scheduler.submit(fail)
+    deadline = time.perf_counter() + 1
+    while scheduler.running and time.perf_counter() < deadline:
+        time.sleep(0.005)
+    assert not scheduler.running
+    with pytest.raises(RuntimeError):
+        scheduler.stop()
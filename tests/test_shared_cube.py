@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+import main
+import simulation
+from shared_cube import SharedCube
+from stepping import FaceStepper
+
+
+def run_ticks(faces, stepper=None, ticks=24):
+    clock = simulation.SimulatedClock([0.5, 0.5, 1, 1, 1.5, 1.5])
+    for _ in range(ticks):
+        now = clock.next_update_time()
+        main.update_faces(faces, clock.last_update_times, now, clock.update_intervals, 10,
+                          "rule_set_1", "rule_set_2", stepper)
+    return np.array([np.array(face.grid) for face in faces])
+
+
+def numpy_reference(grid_size, seed, synchronous=True):
+    faces = simulation.create_faces(grid_size, "numpy", seed)
+    for face in faces:
+        face.randomize()
+    with FaceStepper(faces, "synchronous" if synchronous else "sequential") as stepper:
+        return run_ticks(faces, stepper)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_matches_synchronous_numpy_faces(workers):
+    with SharedCube(13, workers=workers, seed=6) as cube:
+        for face in cube.faces:
+            face.randomize()
+        with FaceStepper(cube.faces, "synchronous") as stepper:
+            grids = run_ticks(cube.faces, stepper)
+    assert np.array_equal(grids, numpy_reference(13, 6))
+
+
+def test_faces_update_one_at_a_time():
+    with SharedCube(9, workers=2, seed=2) as cube:
+        for face in cube.faces:
+            face.randomize()
+        assert np.array_equal(run_ticks(cube.faces), numpy_reference(9, 2, synchronous=False))
+
+
+def test_faces_are_views_of_the_shared_buffers():
+    with SharedCube(8, workers=2, seed=1) as cube:
+        face = cube.faces[2]
+        face.randomize()
+        before = face.grid.copy()
+        assert np.shares_memory(face.grid, cube.buffers)
+
+        cube.step([2], rule="life")
+        assert np.array_equal(face.previous_grid, before)
+        assert face.activity_count == np.count_nonzero(face.grid != before)
+        assert np.shares_memory(face.grid, cube.buffers)
+    with pytest.raises(RuntimeError):
+        cube.step()
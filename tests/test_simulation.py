@@ -0,0 +1,47 @@
+import json
+import subprocess
+import sys
+
+import simulation
+
+
+def test_simulate_cli_is_headless():
+    code = (
+        "import sys, liquiprism\n"
+        "liquiprism.cli(['simulate', '--steps', '50', '--seed', '3', '--json'])\n"
+        "print(sorted(name for name in ('pygame', 'OpenGL', 'mido') if name in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    summary_line, modules_line = result.stdout.strip().splitlines()
+    summary = json.loads(summary_line)
+    assert summary["face_updates"] >= 50
+    assert summary["seed"] == 3
+    assert modules_line == "[]"
+
+
+def test_same_seed_gives_same_run_on_every_engine():
+    summaries = [
+        simulation.run(grid_size=8, engine=engine, seed=11, steps=60, rule="rule_set_1", low_activity_rule="rule_set_1")
+        for engine in ("list", "numpy", "sparse", "tensor")  # Same random initial state
+    ]
+    for summary in summaries[1:]:
+        assert summary["live_cells"] == summaries[0]["live_cells"]
+        assert summary["activity_counts"] == summaries[0]["activity_counts"]
+
+
+class UpdateCounter:
+    def __init__(self):
+        self.updates = [0] * 6
+
+    def on_update(self, face, face_id, rule):
+        self.updates[face_id] += 1
+
+
+def test_simulated_clock_honors_intervals():
+    faces = simulation.create_faces(5, "numpy")
+    counter = UpdateCounter()
+    for face in faces:
+        face.add_listener(counter)
+    summary = simulation.simulate(faces, steps=147, update_intervals=[0.5, 1, 1.5, 2, 2.5, 3])
+    assert summary["simulated_time"] == 30.0
+    assert counter.updates == [60, 30, 20, 15, 12, 10]
@@ -0,0 +1,58 @@
+import random
+
+import numpy as np
+
+from numpy_automata import NumpyCellularAutomata
+from rules import Rule
+from sparse_automata import SparseCellularAutomata
+
+
+def make_cubes(grid_size, tile_size, seed):
+    random.seed(seed)
+    reference = [NumpyCellularAutomata(grid_size=grid_size) for _ in range(6)]
+    faces = [SparseCellularAutomata(grid_size=grid_size, tile_size=tile_size) for _ in range(6)]
+    for face, reference_face in zip(faces, reference):
+        reference_face.grid = (np.random.default_rng(seed).random((grid_size, grid_size)) < 0.1).astype(np.uint8)
+        face.grid = reference_face.grid
+    return reference, faces
+
+
+def assert_same_cube(reference, faces):
+    for face, reference_face in zip(faces, reference):
+        assert np.array_equal(face.grid, reference_face.grid)
+        assert np.array_equal(face.previous_grid, reference_face.previous_grid)
+        assert face.activity_count == reference_face.activity_count
+
+
+def test_sparse_steps_match_dense_engine():
+    majority = Rule.from_predicate("majority", lambda n: sum(map(sum, n)) >= 5)
+    schedule = ["rule_set_1"] * 6 + ["rule_set_2"] + ["B3/S23"] * 5 + [majority] * 3
+    for grid_size, tile_size in ((18, 4), (20, 5), (7, 32)):
+        reference, faces = make_cubes(grid_size, tile_size, seed=grid_size)
+        for step, rule in enumerate(schedule):
+            if step % 4 == 3:
+                state = random.getstate()
+                reference[step % 6].perturb(intensity=3)
+                random.setstate(state)
+                faces[step % 6].perturb(intensity=3)
+            # Faces are stepped at different rates, as in main.update_faces
+            due = [face_id for face_id in range(6) if step % (face_id % 3 + 1) == 0]
+            state = random.getstate()
+            for face_id in due:
+                reference[face_id].update(face_id, reference, rule=rule)
+            random.setstate(state)
+            for face_id in due:
+                faces[face_id].update(face_id, faces, rule=rule)
+            assert_same_cube(reference, faces)
+
+
+def test_quiescent_face_evaluates_no_tiles():
+    faces = [SparseCellularAutomata(grid_size=64, tile_size=16) for _ in range(6)]
+    faces[0].grid[10:12, 10:12] = 1  # Still life block
+    for face_id, face in enumerate(faces):
+        face.update(face_id, faces)
+    for face_id, face in enumerate(faces):
+        face.update(face_id, faces)
+    assert not faces[0]._changed.any()
+    assert faces[0].activity_count == 0
+    assert faces[0].grid[10:12, 10:12].all()
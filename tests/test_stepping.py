@@ -0,0 +1,83 @@
+import threading
+
+import numpy as np
+import pytest
+
+import main
+import simulation
+from stepping import FaceStepper
+
+ENGINES = ["list", "numpy", "bitboard", "sparse", "tensor"]
+
+
+def seeded_cube(engine, grid_size=10, seed=6):
+    faces = simulation.create_faces(grid_size, engine, seed)
+    for face in faces:
+        face.randomize()
+    return faces
+
+
+def run_ticks(faces, stepper=None, ticks=30):
+    clock = simulation.SimulatedClock([0.5, 0.5, 1, 1, 1.5, 1.5])
+    for _ in range(ticks):
+        now = clock.next_update_time()
+        main.update_faces(faces, clock.last_update_times, now, clock.update_intervals, 10,
+                          "rule_set_1", "rule_set_2", stepper)
+    return np.array([np.asarray(face.grid) for face in faces])
+
+
+def test_sequential_stepper_keeps_the_original_order():
+    with FaceStepper(seeded_cube("numpy"), "sequential") as stepper:
+        assert np.array_equal(run_ticks(stepper.faces, stepper), run_ticks(seeded_cube("numpy")))
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_synchronous_updates_match_on_every_engine(engine):
+    with FaceStepper(seeded_cube("tensor"), "synchronous") as reference:
+        expected = run_ticks(reference.faces, reference)  # CubeTensor.step reads the state before the tick
+    with FaceStepper(seeded_cube(engine), "synchronous") as stepper:
+        assert np.array_equal(run_ticks(stepper.faces, stepper), expected)
+
+
+def test_synchronous_updates_do_not_depend_on_face_order():
+    faces = seeded_cube("numpy")
+    reversed_faces = seeded_cube("numpy")
+    with FaceStepper(faces, "synchronous") as stepper, FaceStepper(reversed_faces, "synchronous") as other:
+        stepper.step([0, 1, 2, 3, 4, 5], ["rule_set_2"] * 6)
+        other.step([5, 4, 3, 2, 1, 0], ["rule_set_2"] * 6)
+    for face, other_face in zip(faces, reversed_faces):
+        assert np.array_equal(face.grid, other_face.grid)
+        assert np.array_equal(face.previous_grid, other_face.previous_grid)
+
+
+@pytest.mark.parametrize("engine", ["numpy", "bitboard", "sparse"])
+def test_thread_pool_matches_one_thread(engine):
+    with FaceStepper(seeded_cube(engine, 64), "synchronous") as stepper:
+        expected = run_ticks(stepper.faces, stepper)
+    with FaceStepper(seeded_cube(engine, 64), "synchronous", workers=3) as stepper:
+        assert np.array_equal(run_ticks(stepper.faces, stepper), expected)
+
+
+def test_listeners_are_called_in_face_order_on_the_calling_thread():
+    class Listener:
+        def __init__(self):
+            self.calls = []
+
+        def on_update(self, face, face_id, rule):
+            self.calls.append((face_id, threading.current_thread()))
+
+    faces = seeded_cube("numpy", 32)
+    listener = Listener()
+    for face in faces:
+        face.add_listener(listener)
+    with FaceStepper(faces, "synchronous", workers=3) as stepper:
+        stepper.step([1, 3, 4], ["rule_set_1"] * 3)
+    assert listener.calls == [(face_id, threading.current_thread()) for face_id in (1, 3, 4)]
+    assert all(face.listeners == (listener,) for face in faces)
+
+
+def test_parallel_stepping_needs_the_synchronous_mode():
+    with pytest.raises(ValueError):
+        FaceStepper(seeded_cube("numpy"), "sequential", workers=2)
+    with pytest.raises(ValueError):
+        FaceStepper(seeded_cube("numpy"), "parallel")
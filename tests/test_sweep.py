@@ -0,0 +1,60 @@
+import csv
+
+import numpy as np
+import pytest
+
+import sweep
+
+
+def read_rows(path):
+    with open(path, newline="") as file:
+        return list(csv.DictReader(file))
+
+
+def test_parameter_grid():
+    runs = sweep.parameter_grid({"grid_size": [5, 8], "rule": ["rule_set_1", "life"]}, seeds=[0, 1])
+    assert len(runs) == 8
+    assert {run["grid_size"] for run in runs} == {5, 8}
+    assert len({sweep.run_id(run) for run in runs}) == 8
+    with pytest.raises(ValueError):
+        sweep.parameter_grid({"speed": [1]})
+
+
+def test_run_one_measures_settling():
+    parameters = dict(sweep.DEFAULT_PARAMETERS, grid_size=4, rule="life", low_activity_rule="life",
+                      update_intervals=(0.5,) * 6, duration=20.0)
+    statistics, series = sweep.run_one(parameters)
+    assert series["activity"].shape == (statistics["ticks"], 6)
+    # Life on a random 4x4 cube settles quickly into a still or periodic state
+    assert statistics["cycle_length"] is not None
+    assert statistics["midi_rate"] == statistics["midi_notes"] / 20.0
+    assert sweep.run_one(parameters)[0]["midi_notes"] == statistics["midi_notes"]
+
+
+def test_cycle_detection_restarts_after_perturbations(monkeypatch):
+    parameters = dict(sweep.DEFAULT_PARAMETERS, grid_size=4, rule="life", low_activity_rule="life",
+                      update_intervals=(0.5,) * 6, duration=20.0)
+    assert sweep.run_one(parameters)[0]["cycle_length"] is not None
+    # A perturbation every tick forgets the states before it, so no state is seen twice
+    perturbed = dict(parameters, perturb_intensity=3, perturb_interval=0.5)
+    assert sweep.run_one(perturbed)[0]["cycle_length"] is None
+    monkeypatch.setattr(sweep, "MAX_CYCLE_STATES", 0)
+    assert sweep.run_one(parameters)[0]["cycle_length"] is None
+
+
+def test_sweep_writes_results_and_resumes(tmp_path):
+    output = str(tmp_path / "results" / "sweep")
+    runs = sweep.parameter_grid({"grid_size": [4], "duration": [10.0], "perturb_intensity": [0, 3]}, seeds=[0, 1])
+    assert sweep.run_sweep(runs[:2], output, workers=2) == 2
+
+    # Simulate an interruption in the middle of a row
+    with open(output + ".csv", "a") as file:
+        file.write("deadbeef,4,10")
+    assert sweep.run_sweep(runs, output, workers=2) == 2
+    assert sweep.run_sweep(runs, output, workers=2) == 0
+
+    rows = read_rows(output + ".csv")
+    assert sorted(row["run_id"] for row in rows) == sorted(sweep.run_id(run) for run in runs)
+    for row in rows:
+        series = np.load(tmp_path / "results" / "sweep_series" / f"{row['run_id']}.npz")
+        assert len(series["time"]) == int(row["ticks"])
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+import simulation
+from rules import Rule, get_rule
+from topology import (CUBE_FRAMES, OFFSETS, Surface, cube_topology, get_topology, plane_topology, step_cells,
+                      torus_topology)
+
+
+def life_reference(grid):
+    """B3/S23 on a plane surrounded by dead cells."""
+    padded = np.pad(grid, 1)
+    counts = sum(np.roll(np.roll(padded, dx, 0), dy, 1) for dx, dy in OFFSETS)[1:-1, 1:-1]
+    return ((counts == 3) | (grid == 1) & (counts == 2)).astype(np.uint8)
+
+
+def sticker_centers(grid_size):
+    """3D centers of the cells of every cube face."""
+    xs, ys = np.divmod(np.arange(grid_size * grid_size), grid_size)
+    centers = [grid_size * np.array(origin) + np.outer(xs + 0.5, rows) + np.outer(ys + 0.5, columns)
+               for origin, rows, columns in CUBE_FRAMES]
+    return np.concatenate(centers)
+
+
+@pytest.mark.parametrize("grid_size", [1, 2, 5, 9])
+def test_cube_table_is_a_symmetric_moore_neighborhood(grid_size):
+    topology = cube_topology(grid_size)
+    table = topology.table
+    sources = np.repeat(np.arange(topology.cells), len(OFFSETS))
+    edges = {(int(a), int(b)) for a, b in zip(sources, table.ravel()) if b != topology.cells}
+    assert all((b, a) in edges for a, b in edges)
+    assert not any(a == b for a, b in edges)
+
+    degrees = np.bincount(topology.degree, minlength=9)
+    if grid_size == 1:
+        assert degrees[4] == 6  # Only the four faces around each cell
+    else:
+        assert degrees[7] == 24 and degrees[8] == topology.cells - 24  # Three cells meet at each of the 8 corners
+
+    # Neighbors touch on the surface: at most a cell diagonal apart, however the faces are oriented
+    centers = sticker_centers(grid_size)
+    a, b = np.array(sorted(edges)).T
+    assert np.linalg.norm(centers[a] - centers[b], axis=1).max() <= np.sqrt(2) + 1e-9
+
+
+def test_cube_edges_are_matched_in_orientation():
+    topology = cube_topology(4)
+    # The left column of the top face runs along the top row of the left face
+    for x in range(4):
+        assert (3, 0, x) in topology.neighbors(4, x, 0)
+    # Corners have a diagonal neighbor on each of the two other faces meeting there
+    assert topology.neighbors(0, 0, 0) == [(4, 3, 0), (4, 3, 1), (3, 0, 3), (0, 0, 1), (3, 1, 3), (0, 1, 0), (0, 1, 1)]
+
+    indptr, indices = topology.to_csr()
+    assert indptr[-1] == indices.size == topology.degree.sum()
+    cell = topology.index(0, 0, 0)
+    assert indices[indptr[cell]:indptr[cell + 1]].tolist() == [i for i in topology.table[cell] if i != topology.cells]
+
+
+def test_plane_and_torus_match_life():
+    rng = np.random.default_rng(0)
+    grid = rng.integers(0, 2, (20, 30), dtype=np.uint8)
+    topology = plane_topology(20, 30)
+    state = np.append(grid.ravel(), 0).astype(np.uint8)
+    life = get_rule("B3/S23")
+    life_predicate = Rule.from_predicate(
+        "life_predicate", lambda n: (sum(map(sum, n)) - n[1][1]) == 3 or n[1][1] and (sum(map(sum, n)) - n[1][1]) == 2
+    )
+    for _ in range(10):
+        expected = life_reference(grid)
+        assert np.array_equal(step_cells(topology, state, life).reshape(20, 30), expected)
+        assert np.array_equal(step_cells(topology, state, life_predicate).reshape(20, 30), expected)
+        grid = expected
+        state[:-1] = grid.ravel()
+
+    # A glider crosses the wrapped borders and comes back after 4 generations per cell
+    surface = Surface(torus_topology(12))
+    surface.grids[0, :3, :3] = [[0, 1, 0], [0, 0, 1], [1, 1, 1]]
+    start = surface.grids.copy()
+    for generation in range(4 * 12):
+        surface.step(rule="B3/S23")
+        assert surface.grids.sum() == 5
+    assert np.array_equal(surface.grids, start)
+
+
+def test_moore_engine_runs_like_the_other_cube_engines():
+    faces = simulation.create_faces(16, "moore", seed=3)
+    for face in faces:
+        face.randomize()
+    assert get_topology("cube", 16) is faces[0].cube.topology  # Compiled once
+
+    copy = Surface(16)
+    copy.grids[...] = faces[0].cube.grids
+    faces[2].update(2, faces, rule="B36/S23")
+    copy.step([2], rule="B36/S23")
+    assert np.array_equal(copy.grids, faces[0].cube.grids)
+    assert faces[2].activity_count == copy.activity_counts[2] > 0
+
+    first = simulation.run(16, "moore", seed=4, steps=60, update_mode="synchronous")
+    second = simulation.run(16, "moore", seed=4, steps=60, update_mode="synchronous")
+    assert first["live_cells"] == second["live_cells"]  # Stochastic births drawn from the face streams
+
+    with pytest.raises(ValueError):
+        faces[0].update(1, faces)
+    with pytest.raises(ValueError):
+        get_topology("sphere", 4)
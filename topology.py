@@ -0,0 +1,323 @@
+"""
+Neighbor tables of general topologies, compiled once and stepped with one gather.
+
+A topology is a surface made of square faces of R x C cells. Its cells are numbered
+face by face in row-major order (cell (f, x, y) is ``(f * R + x) * C + y``) and
+``Topology.table`` holds the 8 Moore neighbors of every cell, one column per offset of
+``OFFSETS``. A neighbor that does not exist (beyond the border of a plane, or the
+missing eighth neighbor of a cube corner) is the index ``cells``, a dead cell kept at
+the end of the state array. Stepping is then a gather of the state through the table
+and a sum (or bit packing) along its rows, with no per-cell Python branching whatever
+the topology.
+
+Topologies (see ``TOPOLOGIES``):
+    cube: the six faces of ``CUBE_FRAMES``, each cell seeing the full Moore
+        neighborhood across edges, with the edges matched in the right orientation.
+        Faces keep the adjacency of ``CUBE_NEIGHBORS``, but the rows and columns of the
+        top and bottom faces follow the geometry of a real cube.
+    torus: one face whose borders wrap around.
+    plane: one face with dead cells beyond its borders.
+
+Usage:
+    faces = simulation.create_faces(128, "moore")  # Orientation-correct cube
+    surface = Surface(get_topology("torus", 256))
+"""
+import functools
+import random
+
+import numpy as np
+
+from cube_tensor import FaceView, step_by_rule
+
+# Offsets (dx, dy) of the columns of a neighbor table, and their bit in a packed
+# neighborhood index (bit (dx + 1) * 3 + (dy + 1), as in numpy_automata.pack_neighborhoods)
+OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+_BITS = np.array([1 << ((dx + 1) * 3 + (dy + 1)) for dx, dy in OFFSETS], dtype=np.uint16)
+_BELOW = OFFSETS.index((1, 0))
+
+# Each cube face as (corner of its first cell, direction of its rows, direction of its
+# columns) in a cube of side 1, with x to the right, y up and z towards the viewer. The
+# outward normal of a face is rows x columns.
+CUBE_FRAMES = (
+    ((0, 1, 1), (0, -1, 0), (1, 0, 0)),  # 0: front
+    ((1, 1, 1), (0, -1, 0), (0, 0, -1)),  # 1: right
+    ((1, 1, 0), (0, -1, 0), (-1, 0, 0)),  # 2: back
+    ((0, 1, 0), (0, -1, 0), (0, 0, 1)),  # 3: left
+    ((0, 1, 0), (0, 0, 1), (1, 0, 0)),  # 4: top, first row along the back edge
+    ((0, 0, 1), (0, 0, -1), (1, 0, 0)),  # 5: bottom, first row along the front edge
+)
+
+
+class Topology:
+    """Flat neighbor table of a surface made of square faces."""
+
+    def __init__(self, name: str, face_count: int, rows: int, columns: int, table: np.ndarray):
+        """
+        Initializes a compiled topology. Use ``get_topology`` or the builders of
+        ``TOPOLOGIES`` to create one.
+
+        Args:
+            name (str): Name of the topology.
+            face_count (int): Number of faces.
+            rows (int): Rows of each face.
+            columns (int): Columns of each face.
+            table (np.ndarray): (cells, 8) neighbor indices, ``cells`` for none.
+        """
+        self.name = name
+        self.face_count = face_count
+        self.rows = rows
+        self.columns = columns
+        self.cells = face_count * rows * columns
+        table = np.asarray(table)
+        if table.shape != (self.cells, len(OFFSETS)):
+            raise ValueError(f"The neighbor table must have shape {(self.cells, len(OFFSETS))}.")
+        # Stored offset by offset, so a step gathers each neighbor from one contiguous index array
+        self.by_offset = np.ascontiguousarray(table.T, dtype=np.int32 if self.cells < 2 ** 31 else np.int64)
+        self.degree = np.count_nonzero(self.table != self.cells, axis=1)  # Existing neighbors of each cell
+
+    def __repr__(self):
+        return f"Topology({self.name!r}, {self.face_count} x {self.rows} x {self.columns})"
+
+    def index(self, face_id: int, x: int, y: int) -> int:
+        """Returns the flat index of a cell."""
+        return (face_id * self.rows + x) * self.columns + y
+
+    def neighbors(self, face_id: int, x: int, y: int) -> list:
+        """
+        Lists the neighbors of a cell (for inspection; stepping uses ``table``).
+
+        Returns:
+            list: (face ID, x, y) of each existing neighbor, in the order of ``OFFSETS``.
+        """
+        face_cells = self.rows * self.columns
+        return [(int(i // face_cells), int(i % face_cells // self.columns), int(i % self.columns))
+                for i in self.table[self.index(face_id, x, y)] if i != self.cells]
+
+    @property
+    def table(self) -> np.ndarray:
+        """np.ndarray: (cells, 8) neighbor indices, one column per offset of ``OFFSETS`` (a view of ``by_offset``)."""
+        return self.by_offset.T
+
+    def to_csr(self) -> tuple:
+        """
+        Converts the table to compressed sparse rows, without the missing neighbors.
+
+        Returns:
+            tuple: (indptr, indices) arrays; the neighbors of cell i are
+            ``indices[indptr[i]:indptr[i + 1]]``.
+        """
+        indptr = np.zeros(self.cells + 1, dtype=np.int64)
+        np.cumsum(self.degree, out=indptr[1:])
+        table = self.table
+        return indptr, table[table != self.cells]
+
+
+def cube_topology(grid_size: int) -> Topology:
+    """
+    Compiles the cube of ``CUBE_FRAMES`` with N x N faces.
+
+    Each cell is a square on the surface of a cube of side N. A neighbor offset that
+    leaves the face through an edge is folded over the edge onto the adjacent face; an
+    offset leaving through two edges at once points at a cube corner, where three faces
+    meet and the diagonal neighbor does not exist.
+    """
+    n = grid_size
+    origins, row_axes, column_axes = (np.array(part, dtype=np.int64) for part in zip(*CUBE_FRAMES))
+    normals = np.cross(row_axes, column_axes)
+    # Face of each outward normal, keyed by 2 * axis + (1 if the normal points up the axis)
+    face_of_normal = np.zeros(6, dtype=np.int64)
+    for face_id, normal in enumerate(normals):
+        axis = int(np.flatnonzero(normal)[0])
+        face_of_normal[2 * axis + (normal[axis] > 0)] = face_id
+    face_cells = n * n
+    sentinel = 6 * face_cells
+
+    xs, ys = np.divmod(np.arange(face_cells), n)
+    # Only the cells along the edges have neighbors on other faces
+    edge = np.flatnonzero((xs == 0) | (xs == n - 1) | (ys == 0) | (ys == n - 1))
+    table = np.empty((6, face_cells, len(OFFSETS)), dtype=np.int64)
+    for face_id in range(6):
+        for column, (dx, dy) in enumerate(OFFSETS):
+            table[face_id, :, column] = face_id * face_cells + (xs + dx) * n + ys + dy
+
+        # Twice the coordinates of the edge cells, so that centers and half steps are integers
+        centers = (2 * n * origins[face_id] + np.outer(2 * xs[edge] + 1, row_axes[face_id])
+                   + np.outer(2 * ys[edge] + 1, column_axes[face_id]))
+        normal_axis = int(np.flatnonzero(normals[face_id])[0])
+        for column, (dx, dy) in enumerate(OFFSETS):
+            points = centers + 2 * dx * row_axes[face_id] + 2 * dy * column_axes[face_id]
+            below, above = points < 0, points > 2 * n
+            outside = below | above
+            crossed = outside.sum(axis=1)
+
+            # Fold the points that left through one edge onto the face beyond it
+            folded = np.flatnonzero(crossed == 1)
+            axes = outside[folded].argmax(axis=1)
+            sides = np.where(above[folded, axes], 1, -1)
+            points[folded, axes] = np.where(sides > 0, 2 * n, 0)
+            points[folded, normal_axis] -= normals[face_id, normal_axis]  # Half a cell into the cube
+
+            targets = np.full(edge.size, face_id)
+            targets[folded] = face_of_normal[2 * axes + (sides > 0)]
+            neighbors = np.full(edge.size, sentinel)
+            for target in np.unique(targets).tolist():
+                cells = np.flatnonzero((targets == target) & (crossed < 2))
+                relative = points[cells] - 2 * n * origins[target]
+                tx = (relative @ row_axes[target]) // 2
+                ty = (relative @ column_axes[target]) // 2
+                neighbors[cells] = target * face_cells + tx * n + ty
+            table[face_id, edge, column] = neighbors
+    return Topology("cube", 6, n, n, table.reshape(-1, len(OFFSETS)))
+
+
+def _grid_topology(name: str, rows: int, columns: int, wrap: bool) -> Topology:
+    xs, ys = np.divmod(np.arange(rows * columns), columns)
+    cells = rows * columns
+    table = np.empty((cells, len(OFFSETS)), dtype=np.int64)
+    for column, (dx, dy) in enumerate(OFFSETS):
+        nx, ny = xs + dx, ys + dy
+        if wrap:
+            table[:, column] = (nx % rows) * columns + ny % columns
+        else:
+            inside = (nx >= 0) & (nx < rows) & (ny >= 0) & (ny < columns)
+            table[:, column] = np.where(inside, nx * columns + ny, cells)
+    return Topology(name, 1, rows, columns, table)
+
+
+def torus_topology(rows: int, columns: int = None) -> Topology:
+    """Compiles one face whose opposite borders are joined."""
+    return _grid_topology("torus", rows, rows if columns is None else columns, wrap=True)
+
+
+def plane_topology(rows: int, columns: int = None) -> Topology:
+    """Compiles one face surrounded by dead cells."""
+    return _grid_topology("plane", rows, rows if columns is None else columns, wrap=False)
+
+
+TOPOLOGIES = {
+    "cube": cube_topology,
+    "torus": torus_topology,
+    "plane": plane_topology,
+}
+
+
+@functools.lru_cache(maxsize=16)
+def get_topology(name: str, *size: int) -> Topology:
+    """
+    Compiles a topology of ``TOPOLOGIES`` once per size.
+
+    Args:
+        name (str): Name of the topology.
+        *size (int): Grid size of the cube, or rows (and columns) of a torus or plane.
+
+    Returns:
+        Topology: The compiled topology (shared between calls).
+    """
+    if name not in TOPOLOGIES:
+        raise ValueError(f"Unknown topology '{name}'. Available topologies: {', '.join(TOPOLOGIES)}.")
+    return TOPOLOGIES[name](*size)
+
+
+def step_cells(topology: Topology, state: np.ndarray, rule, face_ids=None, rngs=None) -> np.ndarray:
+    """
+    Computes the next state of the cells of some faces by gathering their neighbors
+    through the table, one offset at a time.
+
+    Args:
+        topology (Topology): Compiled topology.
+        state (np.ndarray): uint8 states of the ``topology.cells`` cells followed by one
+            dead cell.
+        rule (Rule): Compiled rule (see ``rules.py``). The stochastic birth of
+            ``rule_set_2`` looks at the neighbor at offset (1, 0).
+        face_ids (list): Faces to step (default all).
+        rngs (list): Optional ``numpy.random.Generator`` of each face in ``face_ids``;
+            without them the stochastic births draw from the global ``random`` module.
+
+    Returns:
+        np.ndarray: uint8 new states of the cells of ``face_ids``, face by face.
+    """
+    face_ids = range(topology.face_count) if face_ids is None else face_ids
+    face_cells = topology.rows * topology.columns
+    new_state = np.empty(len(face_ids) * face_cells, dtype=np.uint8)
+    for position, face_id in enumerate(face_ids):
+        cells = slice(face_id * face_cells, (face_id + 1) * face_cells)
+        center = state[cells]
+        neighbors = [state.take(column[cells]) for column in topology.by_offset]
+        if rule.neighborhood:
+            index = center.astype(np.uint16) << 4
+            for bit, neighbor in zip(_BITS.tolist(), neighbors):
+                index |= neighbor.astype(np.uint16) * bit
+            new_face = rule.table.take(index)
+        else:
+            counts = neighbors[0].copy()
+            for neighbor in neighbors[1:]:
+                counts += neighbor
+            # Flat lookup of (state, count), faster than indexing the 2D table
+            new_face = rule.table.take(center * np.uint8(rule.table.shape[1]) + counts)
+
+        if rule.birth_chance is not None:
+            candidates = np.flatnonzero((center == 0) & (neighbors[_BELOW] == 1))
+            if rngs is not None:
+                draws = rngs[position].random(face_cells)[candidates]
+            else:
+                draws = np.array([random.random() for _ in range(candidates.size)])
+            new_face[candidates[draws < rule.birth_chance]] = 1
+        new_state[position * face_cells:(position + 1) * face_cells] = new_face
+    return new_state
+
+
+class Surface:
+    """All faces of a topology stored in one flat array and stepped over its neighbor table."""
+
+    def __init__(self, topology):
+        """
+        Initializes an empty surface.
+
+        Args:
+            topology (Topology or int): Compiled topology, or the grid size of a cube.
+        """
+        if not isinstance(topology, Topology):
+            topology = get_topology("cube", topology)
+        if topology.rows != topology.columns:
+            raise ValueError("Faces with the CellularAutomata interface must be square.")
+        self.topology = topology
+        self.grid_size = topology.rows
+        self.state = np.zeros(topology.cells + 1, dtype=np.uint8)  # The last cell stays dead
+        self.previous = np.zeros((topology.face_count, self.grid_size, self.grid_size), dtype=np.uint8)
+        self.activity_counts = np.zeros(topology.face_count, dtype=np.int64)
+
+        # Face objects compatible with the CellularAutomata interface
+        self.faces = [SurfaceFace(self, face_id) for face_id in range(topology.face_count)]
+
+    @property
+    def grids(self):
+        """np.ndarray: (faces, N, N) view of the state of every face."""
+        return self.state[:-1].reshape(self.topology.face_count, self.grid_size, self.grid_size)
+
+    def step(self, face_ids=None, use_stochastic_rule=False, rule=None):
+        """
+        Advances several faces at once; they all read their neighbors as they were
+        before the step.
+
+        Args:
+            face_ids (list): IDs of the faces to update (all by default).
+            use_stochastic_rule (bool or list): Use ``rule_set_2`` instead of ``rule_set_1``,
+                either for every face or per face in ``face_ids``.
+            rule (Rule, str or list): Rule from the registry in ``rules.py``, either for
+                every face or per face in ``face_ids`` (overrides ``use_stochastic_rule``).
+        """
+        def kernel(face_rule, group, rngs):
+            new_state = step_cells(self.topology, self.state, face_rule, group.tolist(), rngs)
+            return new_state.reshape(len(group), self.grid_size, self.grid_size)
+
+        step_by_rule(self, face_ids, use_stochastic_rule, rule, kernel)
+
+
+class SurfaceFace(FaceView):
+    """View of one face of a ``Surface`` with the ``CellularAutomata`` interface."""
+
+    def _grid_array(self) -> np.ndarray:
+        return self.cube.grids[self.face_id]
+
+    def _previous_array(self) -> np.ndarray:
+        return self.cube.previous[self.face_id]
@@ -0,0 +1,101 @@
+import numpy as np
+from OpenGL.GL import *
+
+from cube_geometry import cell_colors, cell_quads, grid_lines
+from cube_visualization import CubeVisualization
+
+
+class VBOCubeVisualization(CubeVisualization):
+    """
+    Retained-mode version of ``CubeVisualization``.
+
+    The cell quads and the grid lines are built once in vertex buffer objects. Each
+    frame only the colors of the faces whose grid changed are uploaded with
+    glBufferSubData, and the cube is drawn with two glDrawArrays calls.
+    """
+
+    def __init__(self, cellular_automata_list, size=(800, 600), window=True):
+        """
+        Initializes the 3D visualization of the cube.
+
+        Args:
+            cellular_automata_list (list): List of CellularAutomata instances (one for each face).
+            size (tuple): Width and height of the image, in pixels.
+            window (bool): Open a pygame window (see ``CubeVisualization``).
+        """
+        super().__init__(cellular_automata_list, size, window)
+
+        vertices = cell_quads(self.grid_size)
+        lines = grid_lines(self.grid_size)
+        self.vertices_per_face = len(vertices) // 6
+        self.quad_vertex_count = len(vertices)
+        self.line_vertex_count = len(lines)
+
+        self.vertex_buffer, self.color_buffer, self.line_buffer = glGenBuffers(3)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.line_buffer)
+        glBufferData(GL_ARRAY_BUFFER, lines.nbytes, lines, GL_STATIC_DRAW)
+
+        # Colors start as dead cells and are filled on the first frame
+        self._uploaded_grids = [None] * 6
+        colors = np.full((self.quad_vertex_count, 3), 255, dtype=np.uint8)
+        glBindBuffer(GL_ARRAY_BUFFER, self.color_buffer)
+        glBufferData(GL_ARRAY_BUFFER, colors.nbytes, colors, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        # Push the cells back so the grid lines drawn at the same depth stay visible
+        glPolygonOffset(1.0, 1.0)
+
+    def upload_changed_faces(self) -> int:
+        """
+        Uploads the colors of the faces whose grid changed since the last upload.
+
+        Returns:
+            int: Number of faces uploaded.
+        """
+        uploaded = 0
+        glBindBuffer(GL_ARRAY_BUFFER, self.color_buffer)
+        for face_idx, face in enumerate(self.cellular_automata_list):
+            grid = np.asarray(face.grid, dtype=np.uint8)
+            if self._uploaded_grids[face_idx] is not None and np.array_equal(grid, self._uploaded_grids[face_idx]):
+                continue
+            colors = cell_colors(grid, self.face_colors[face_idx])
+            glBufferSubData(GL_ARRAY_BUFFER, face_idx * colors.nbytes, colors.nbytes, colors)
+            self._uploaded_grids[face_idx] = grid.copy()
+            uploaded += 1
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        return uploaded
+
+    def draw_cube(self):
+        """Draws the complete cube from the vertex buffers."""
+        self.upload_changed_faces()
+
+        glEnableClientState(GL_VERTEX_ARRAY)
+
+        # Cells (filled)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, self.color_buffer)
+        glColorPointer(3, GL_UNSIGNED_BYTE, 0, None)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glVertexPointer(3, GL_FLOAT, 0, None)
+        glEnable(GL_POLYGON_OFFSET_FILL)
+        glDrawArrays(GL_QUADS, 0, self.quad_vertex_count)
+        glDisable(GL_POLYGON_OFFSET_FILL)
+        glDisableClientState(GL_COLOR_ARRAY)
+
+        # Borders (black lines)
+        glColor3f(0, 0, 0)
+        glLineWidth(2)
+        glBindBuffer(GL_ARRAY_BUFFER, self.line_buffer)
+        glVertexPointer(3, GL_FLOAT, 0, None)
+        glDrawArrays(GL_LINES, 0, self.line_vertex_count)
+
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glDisableClientState(GL_VERTEX_ARRAY)
+
+    def close(self):
+        """Releases the vertex buffers."""
+        glDeleteBuffers(3, [self.vertex_buffer, self.color_buffer, self.line_buffer])